@@ -0,0 +1,190 @@
+import itertools
+import threading
+import time
+from flask import Blueprint, current_app, request, jsonify
+from config import Config
+
+admission_bp = Blueprint('admission', __name__)
+
+# Workload classes, highest priority first. Interactive CRUD is admitted
+# ahead of analytic scans whenever both are waiting.
+INTERACTIVE = 'interactive'
+ANALYTIC = 'analytic'
+PRIORITY = {INTERACTIVE: 0, ANALYTIC: 1}
+
+# Decorator marking a route's queries with a workload class (default interactive)
+def workload(name):
+    def decorator(view):
+        view.workload = name
+        return view
+    return decorator
+
+# Workload class of the route handling an endpoint
+def route_workload(endpoint):
+    view = current_app.view_functions.get(endpoint)
+    return getattr(view, 'workload', INTERACTIVE)
+
+class Overloaded(Exception):
+    """Raised when the admission queue is too deep to take another request."""
+
+    def __init__(self, retry_after):
+        super().__init__("Too many queries queued for the warehouse")
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """
+    Limits how many queries run against the warehouse at once, globally and
+    per user, and queues the rest.
+
+    Waiting queries are granted slots by workload class, then to the user
+    with the fewest queries running, then in arrival order, so one planner's
+    burst cannot starve everyone else. Analytic queries may only use
+    analytic_limit of the global slots, leaving the rest for interactive ones.
+    """
+
+    def __init__(self, global_limit, user_limit, analytic_limit, queue_limit):
+        self.global_limit = global_limit
+        self.user_limit = user_limit
+        self.analytic_limit = analytic_limit
+        self.queue_limit = queue_limit
+        self._cond = threading.Condition()
+        self._sequence = itertools.count()
+        self._waiting = []
+        self._running = {}
+        self._running_by_class = {INTERACTIVE: 0, ANALYTIC: 0}
+        self._average_seconds = 1.0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _running_total(self):
+        return sum(self._running_by_class.values())
+
+    def _eligible(self, ticket):
+        if self._running_total() >= self.global_limit:
+            return False
+        if self._running.get(ticket["user"], 0) >= self.user_limit:
+            return False
+        return ticket["workload"] != ANALYTIC or self._running_by_class[ANALYTIC] < self.analytic_limit
+
+    # Hand free slots to waiting queries in priority/fairness order
+    def _grant(self):
+        order = sorted(self._waiting, key=lambda t: (
+            PRIORITY[t["workload"]], self._running.get(t["user"], 0), t["sequence"]
+        ))
+        for ticket in order:
+            if self._eligible(ticket):
+                self._take(ticket)
+                self._waiting.remove(ticket)
+                ticket["granted"] = True
+        self._cond.notify_all()
+
+    def _take(self, ticket):
+        self._running[ticket["user"]] = self._running.get(ticket["user"], 0) + 1
+        self._running_by_class[ticket["workload"]] += 1
+        self.admitted += 1
+
+    def _queue_depth(self, workload):
+        # Interactive queries jump the analytic ones, so only count their own class
+        if workload == INTERACTIVE:
+            return sum(1 for t in self._waiting if t["workload"] == INTERACTIVE)
+        return len(self._waiting)
+
+    def retry_after(self):
+        """Seconds a rejected client should wait, from the queue depth and recent query times."""
+        with self._cond:
+            return max(1, round(len(self._waiting) * self._average_seconds / self.global_limit))
+
+    def check(self, workload):
+        """Raise Overloaded if a new request of this class should be turned away."""
+        with self._cond:
+            if self._queue_depth(workload) < self.queue_limit:
+                return
+            self.rejected += 1
+        raise Overloaded(self.retry_after())
+
+    def acquire(self, user, workload, deadline=None):
+        """Wait for a slot; returns False if deadline (monotonic) passes first."""
+        with self._cond:
+            ticket = {"user": user, "workload": workload, "sequence": next(self._sequence), "granted": False}
+            if not self._waiting and self._eligible(ticket):
+                self._take(ticket)
+                return True
+            self._waiting.append(ticket)
+            self._grant()
+            while not ticket["granted"]:
+                timeout = None if deadline is None else deadline - time.monotonic()
+                if timeout is not None and timeout <= 0:
+                    self._waiting.remove(ticket)
+                    self.timed_out += 1
+                    return False
+                self._cond.wait(timeout)
+            return True
+
+    def release(self, user, workload, seconds):
+        with self._cond:
+            self._running[user] -= 1
+            if not self._running[user]:
+                del self._running[user]
+            self._running_by_class[workload] -= 1
+            self._average_seconds = 0.9 * self._average_seconds + 0.1 * seconds
+            self._grant()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "running": dict(self._running_by_class),
+                "waiting": {
+                    workload: sum(1 for t in self._waiting if t["workload"] == workload)
+                    for workload in PRIORITY
+                },
+                "users": len(self._running),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timedOut": self.timed_out,
+                "averageQuerySeconds": round(self._average_seconds, 3)
+            }
+
+# Shared admission controller for all warehouse queries in this process
+admission_controller = AdmissionController(
+    Config.ADMISSION_GLOBAL_LIMIT,
+    Config.ADMISSION_USER_LIMIT,
+    Config.ADMISSION_ANALYTIC_LIMIT,
+    Config.ADMISSION_QUEUE_LIMIT
+)
+
+# Endpoints that never reach the warehouse and are never turned away
+EXEMPT_ENDPOINTS = {'static', 'index', 'dashboard'}
+EXEMPT_BLUEPRINTS = {'admission', 'dashboard', 'events', 'fragment_cache', 'jobs', 'metrics', 'slow_queries', 'warehouses'}
+
+def is_exempt(endpoint):
+    return endpoint is None or endpoint in EXEMPT_ENDPOINTS or endpoint.split('.')[0] in EXEMPT_BLUEPRINTS
+
+# Turn requests away with 429 while the queue is past ADMISSION_QUEUE_LIMIT
+def init_admission(app):
+    app.register_blueprint(admission_bp)
+
+    @app.before_request
+    def admit_request():
+        if not Config.ADMISSION_ENABLED or is_exempt(request.endpoint):
+            return None
+        try:
+            admission_controller.check(route_workload(request.endpoint))
+        except Overloaded as e:
+            response = jsonify({"success": False, "message": str(e)})
+            response.status_code = 429
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response
+        return None
+
+# Route to get the admission controller's queue and counters
+@admission_bp.route('/admission/stats', methods=['GET'])
+def admission_stats():
+    # slow_queries imports this module (through metrics), so import it here
+    from slow_queries import admin_denied
+
+    denied = admin_denied()
+    if denied:
+        return denied
+
+    return jsonify({"success": True, "stats": admission_controller.stats()})
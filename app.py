@@ -8,10 +8,37 @@ from cluster import cluster_bp
 from floorplan import floorplan_bp
 from position import position_bp
 from performance import performance_bp
+from simulation import simulation_bp
+from fragment_cache import fragment_cache_bp
+from events import events_bp
+from warehouses import warehouses_bp
+from slow_queries import slow_queries_bp
+from assets import init_assets
+from compression import init_compression
+from db import init_query_context
+from timing import init_timing
+from metrics import init_metrics
+from jobs import init_jobs
+from admission import init_admission
 
 def create_app():
     app = Flask(__name__)
 
+    # Compress text responses; registered first so it runs after every other hook
+    init_compression(app)
+
+    # Time connect/queue/execute/fetch/render per request (Server-Timing header)
+    init_timing(app)
+
+    # Aggregate request, query, cache and job metrics for Prometheus (/metrics)
+    init_metrics(app)
+
+    # Tag queries with the request and bound them by the route's time budget
+    init_query_context(app)
+
+    # Queue warehouse queries fairly and shed load with 429 when the queue is deep
+    init_admission(app)
+
     # Register blueprints
     app.register_blueprint(auth_bp)
     app.register_blueprint(dashboard_bp)
@@ -22,6 +49,17 @@ def create_app():
     app.register_blueprint(floorplan_bp)
     app.register_blueprint(position_bp)
     app.register_blueprint(performance_bp)
+    app.register_blueprint(simulation_bp)
+    app.register_blueprint(fragment_cache_bp)
+    app.register_blueprint(events_bp)
+    app.register_blueprint(warehouses_bp)
+    app.register_blueprint(slow_queries_bp)
+
+    # Background jobs and their status routes
+    init_jobs(app)
+
+    # Serve fingerprinted, precompressed static assets
+    init_assets(app)
 
     # Route for the home page (login)
     @app.route('/')
@@ -0,0 +1,118 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+from flask import Blueprint, current_app, request, send_from_directory
+from werkzeug.security import safe_join
+from config import Config
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+assets_bp = Blueprint('assets', __name__)
+
+# Static sub-folders that are fingerprinted, and where the built copies go
+SOURCE_DIRS = ('css', 'js')
+BUILD_DIR = 'dist'
+
+# Precompressed variants, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Fingerprinted paths by original static path, e.g. js/dsstore.js -> js/dsstore.1a2b3c4d5e6f.js
+_manifest = {}
+
+# Insert a content hash before the file extension
+def fingerprint(path, digest):
+    base, ext = os.path.splitext(path)
+    return f"{base}.{digest}{ext}"
+
+# Compressors for the variants that can be built here
+def _compressors():
+    compressors = [('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        compressors.append(('.br', lambda data: brotli.compress(data, quality=11)))
+    return compressors
+
+# Write a file atomically so concurrent workers never serve a partial asset
+def _write(path, data):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+def build_assets(static_folder):
+    """
+    Copy every CSS/JS asset to static/dist under a content-hashed name, with
+    gzip (and brotli, when installed) variants next to it. Files that already
+    exist are left alone, so older hashes stay servable to cached pages.
+    Returns and writes the manifest of original -> fingerprinted paths.
+    """
+    build_root = os.path.join(static_folder, BUILD_DIR)
+    manifest = {}
+    for directory in SOURCE_DIRS:
+        for root, _, files in os.walk(os.path.join(static_folder, directory)):
+            for name in sorted(files):
+                source = os.path.join(root, name)
+                relative = os.path.relpath(source, static_folder).replace(os.sep, '/')
+                with open(source, 'rb') as f:
+                    data = f.read()
+                hashed = fingerprint(relative, hashlib.sha256(data).hexdigest()[:12])
+                target = os.path.join(build_root, hashed)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                if not os.path.exists(target):
+                    _write(target, data)
+                for suffix, compress in _compressors():
+                    if not os.path.exists(target + suffix):
+                        compressed = compress(data)
+                        if len(compressed) < len(data):
+                            _write(target + suffix, compressed)
+                manifest[relative] = hashed
+
+    os.makedirs(build_root, exist_ok=True)
+    _write(os.path.join(build_root, 'manifest.json'), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+def init_assets(app):
+    """Build fingerprinted assets and point url_for('static', ...) at them."""
+    if not Config.ASSET_FINGERPRINTING:
+        return
+    _manifest.clear()
+    _manifest.update(build_assets(app.static_folder))
+    app.register_blueprint(assets_bp)
+
+    @app.url_defaults
+    def fingerprinted_static_url(endpoint, values):
+        if endpoint == 'static':
+            hashed = _manifest.get(values.get('filename'))
+            if hashed:
+                values['filename'] = f"{BUILD_DIR}/{hashed}"
+
+# Route to serve fingerprinted assets, precompressed when the client accepts it
+@assets_bp.route('/static/dist/<path:filename>')
+def fingerprinted_asset(filename):
+    build_root = os.path.join(current_app.static_folder, BUILD_DIR)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    encoding = None
+    for candidate, suffix in ENCODINGS:
+        variant = safe_join(build_root, filename + suffix)
+        if request.accept_encodings[candidate] and variant and os.path.isfile(variant):
+            encoding = candidate
+            filename += suffix
+            break
+
+    response = send_from_directory(build_root, filename, mimetype=mimetype, max_age=Config.ASSET_MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    # The name changes whenever the content does, so the file never needs revalidating
+    response.headers['Cache-Control'] = f"public, max-age={Config.ASSET_MAX_AGE}, immutable"
+    response.vary.add('Accept-Encoding')
+    return response
+
+# Build step for deployments that prefer to fingerprint ahead of startup
+if __name__ == '__main__':
+    built = build_assets(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'))
+    print(f"Fingerprinted {len(built)} assets")
@@ -1,6 +1,5 @@
 from flask import Blueprint, request, redirect, url_for, make_response, render_template
-import snowflake.connector
-from config import Config
+from db import LoginFailed, connect
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -15,14 +14,7 @@ def login():
 
         try:
             # Connect to Snowflake to validate credentials
-            conn = snowflake.connector.connect(
-                user=username,
-                password=password,
-                account=Config.SNOWFLAKE_ACCOUNT,
-                warehouse=Config.SNOWFLAKE_WAREHOUSE,
-                database=Config.SNOWFLAKE_DATABASE,
-                schema=Config.SNOWFLAKE_SCHEMA
-            )
+            conn = connect(username, password)
             conn.close()
 
             # Set cookies with login data
@@ -32,8 +24,10 @@ def login():
 
             return resp
 
-        except snowflake.connector.errors.DatabaseError:
+        except LoginFailed:
             return "Login failed. Please check your credentials and try again.", 400
+        except Exception as e:
+            return f"Error: {str(e)}", 500
 
     return render_template('login.html')
     
\ No newline at end of file
@@ -0,0 +1,316 @@
+"""
+Benchmark every blueprint route against a seeded local stand-in database.
+
+For each scale, seeds the ckbbuild.txt schema into SQLite (localdb.py) with
+that many position and performance rows, points db.connect at it, and drives
+the app in-process through the Flask test client. Each scale runs in its own
+interpreter, so caches, indexes and change versions warmed at one scale do
+not carry into the next. Per route it reports the
+first (cold) request, latency percentiles and throughput over the timed
+requests, the Server-Timing phase breakdown, and peak Python memory.
+
+    python bench_routes.py --scales 10000,100000,1000000 --requests 50 --output bench.json
+    python bench_routes.py --scales 10000 --route dsposition --route view_pdf
+
+Numbers are for the app's own work (pooling, caching, pagination,
+rendering) over SQLite; they do not model warehouse latency. Queries go
+through admission control like warehouse queries, but not through the
+Snowflake cursor's async submit and polling.
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from itertools import count, cycle
+import db
+import localdb
+from config import Config
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] if ordered else None
+
+# Parse a Server-Timing header into {phase: ms}
+def parse_server_timing(header):
+    phases = {}
+    for entry in (header or '').split(','):
+        parts = [part.strip() for part in entry.split(';')]
+        for part in parts[1:]:
+            if part.startswith('dur='):
+                phases[parts[0]] = float(part[4:])
+    return phases
+
+class Scenario:
+    """One benchmarked route: a name and a function that sends one request."""
+
+    def __init__(self, name, send, expected=(200,)):
+        self.name = name
+        self.send = send
+        self.expected = expected
+
+# Requests for every route, with ids drawn from the seeded plan. Writes use
+# fresh names or ids reserved at the top of each table so reruns keep working.
+def scenarios(client, plan, requests):
+    unique = count(1)
+    stamp = int(time.time())
+    products, planograms, stores = plan["products"], plan["planograms"], plan["stores"]
+    floorplans, clusters, positions = plan["floorplans"], plan["clusters"], plan["positions"]
+
+    def rotating(limit):
+        index = count()
+        return lambda: next(index) % limit + 1
+
+    # Request bodies built from successive values of a generator
+    def each(values, make):
+        def body():
+            value = values()
+            return make(*value) if isinstance(value, tuple) else make(value)
+        return body
+
+    # Rows deleted by the delete scenarios, taken from the end of each table.
+    # Small tables run out; later requests then delete rows already gone.
+    def reserved(total):
+        victims = cycle(range(total, max(total - requests - 2, 0), -1))
+        return lambda: next(victims)
+
+    # Keys the add scenarios gave their new rows, just past the seeded ones,
+    # for the entity delete scenarios, so seeded rows other scenarios read
+    # stay in place. On a reused database these rows may already be gone.
+    def added(total):
+        keys = cycle(range(total + 1, total + requests + 3))
+        return lambda: next(keys)
+
+    # Membership pairs (a, b) the seed did not link. Small scales run out
+    # and repeat pairs, which the app rejects as already linked.
+    def new_pair(first, second, seeded):
+        pairs = cycle([(a, b) for b in range(1, second + 1) for a in range(1, first + 1) if not seeded(a, b)][:requests * 2])
+        return lambda: next(pairs)
+
+    store_id, planogram_id, product_id = rotating(stores), rotating(planograms), rotating(products)
+    floorplan_id, cluster_id, position_id = rotating(floorplans), rotating(clusters), rotating(positions)
+    pdf_id = rotating(plan["pdfs"])
+    page = lambda path: lambda: client.get(path)
+    post = lambda path, body: lambda: client.post(path, json=body())
+    delete = lambda path, body: lambda: client.delete(path, json=body())
+    product_added, product_deleted = count(1), count(1)
+    pdf = b"%PDF-1.4\n" + os.urandom(64 * 1024)
+    add_planogram = lambda: client.post('/dsplanogram/add', content_type='multipart/form-data', data={
+        "planogramName": f"Bench planogram {next(unique)}", "dbStatus": 1,
+        "pdfFile": (io.BytesIO(pdf), 'bench.pdf')
+    })
+
+    return [
+        Scenario('login', lambda: client.post('/login', data={'username': 'bench', 'password': 'bench'}), (200, 302)),
+        Scenario('dashboard', page('/dashboard')),
+
+        Scenario('dsstore page', page('/dsstore')),
+        Scenario('dsstore list', page('/dsstore/list?limit=200')),
+        Scenario('dsstore data', page('/dsstore/data')),
+        Scenario('get_store', lambda: client.get(f'/get_store?storeId={store_id()}')),
+        Scenario('stores typeahead', page('/stores/typeahead?q=Store 1')),
+        Scenario('dsstore add', post('/dsstore/add', lambda: {"storeName": f"Bench store {stamp}-{next(unique)}", "descriptivo1": "bench", "dbStatus": 1}), (200, 201)),
+        Scenario('dsstore update', post('/dsstore/update_store', lambda: {"storeId": store_id(), "storeName": f"Bench store {stamp}-{next(unique)}", "descriptivo1": "bench", "dbStatus": 1})),
+
+        Scenario('dscluster page', page('/dscluster')),
+        Scenario('dscluster list', page('/dscluster/list?limit=200')),
+        Scenario('get_cluster', lambda: client.get(f'/get_cluster?clusterId={cluster_id()}')),
+        Scenario('dscluster add', post('/dscluster/add', lambda: {"clusterName": f"Bench cluster {next(unique)}"}), (200, 201)),
+        Scenario('dscluster update', post('/dscluster/update_cluster', lambda: {"clusterId": cluster_id(), "clusterName": f"Cluster {next(unique)}"})),
+        Scenario('clstore page', lambda: client.get(f'/clstore?clusterId={cluster_id()}')),
+        Scenario('clstore list', lambda: client.get(f'/clstore/list?clusterId={cluster_id()}')),
+        Scenario('clstore add', post('/clstore/add_store', each(new_pair(clusters, stores, lambda a, b: a == b % clusters + 1), lambda a, b: {"clusterId": a, "storeId": b}))),
+
+        Scenario('dsfloorplan page', page('/dsfloorplan')),
+        Scenario('dsfloorplan list', page('/dsfloorplan/list?limit=200')),
+        Scenario('get_floor_plan', lambda: client.get(f'/get_floor_plan?floorPlanId={floorplan_id()}')),
+        Scenario('floorplans typeahead', page('/floorplans/typeahead?q=Floorplan')),
+        Scenario('dsfloorplan add', post('/dsfloorplan/add', lambda: {"floorPlanName": f"Bench floorplan {next(unique)}", "dbStatus": 1}), (200, 201)),
+        Scenario('dsfloorplan update', post('/dsfloorplan/update_floor_plan', lambda: {"floorPlanId": floorplan_id(), "floorPlanName": f"Floorplan {next(unique)}", "dbStatus": 1})),
+        Scenario('stfloorplan page', lambda: client.get(f'/stfloorplan?storeId={store_id()}')),
+        Scenario('stfloorplan list', lambda: client.get(f'/stfloorplan/list?storeId={store_id()}')),
+        Scenario('stfloorplan add', post('/stfloorplan/add_floorplan', each(new_pair(stores, floorplans, lambda a, b: a == b), lambda a, b: {"storeId": a, "floorplanId": b}))),
+
+        Scenario('dsplanogram page', page('/dsplanogram')),
+        Scenario('dsplanogram list', page('/dsplanogram/list?limit=200')),
+        Scenario('get_planogram', lambda: client.get(f'/get_planogram?planogramId={planogram_id()}')),
+        Scenario('planograms typeahead', page('/planograms/typeahead?q=Planogram 1')),
+        Scenario('dsplanogram add', add_planogram, (200, 201)),
+        Scenario('dsplanogram update', post('/dsplanogram/update_planogram', lambda: {"dbKey": planogram_id(), "planogramName": f"Planogram {next(unique)}", "dbStatus": 1})),
+        Scenario('view_pdf', lambda: client.get(f'/dsplanogram/view_pdf/{pdf_id()}')),
+        Scenario('flplanogram page', lambda: client.get(f'/flplanogram?floorplanId={floorplan_id()}')),
+        Scenario('flplanogram list', lambda: client.get(f'/flplanogram/list?floorplanId={floorplan_id()}')),
+        Scenario('flplanogram view_pdf', lambda: client.get(f'/flplanogram/view_pdf/{pdf_id()}')),
+
+        Scenario('dsproduct page', page('/dsproduct')),
+        Scenario('dsproduct list', page('/dsproduct/list?limit=200')),
+        Scenario('dsproduct list filtered', page('/dsproduct/list?q=Product 12&sort=productName&limit=200')),
+        Scenario('get_product', lambda: client.get(f'/get_product?upc=UPC{product_id():09d}')),
+        Scenario('products search', page('/products/search?q=Product 4')),
+        Scenario('products facets', page('/products/facets?category=Category 3')),
+        Scenario('dsproduct add', post('/dsproduct/add', lambda: {"upc": f"BENCH{stamp}-{next(product_added)}", "productName": "Bench product", "category": "Category 1", "subcategory": "SubCategory 1", "dimensions": "10x10x10", "weight": 1.0, "dbstatus": 1}), (200, 201)),
+        Scenario('dsproduct update', post('/dsproduct/update_product', lambda: {"upc": f"UPC{product_id():09d}", "productName": f"Product {next(unique)}", "category": "Category 1", "subcategory": "SubCategory 1", "dimensions": "10x10x10", "weight": 1.0, "dbstatus": 1})),
+        Scenario('planogram products', lambda: client.get(f'/planogram/{planogram_id()}')),
+        Scenario('planogram add product', post('/planogram/add', lambda: {"planogramId": planogram_id(), "productId": product_id()}), (200, 201)),
+        Scenario('planogram add_bulk', post('/planogram/add_bulk', lambda: {"planogramId": planogram_id(), "upcs": [f"UPC{product_id():09d}" for _ in range(100)]}), (202,)),
+
+        Scenario('dsposition page', page('/dsposition')),
+        Scenario('dsposition list', page('/dsposition/list?limit=200')),
+        Scenario('dsposition list deep page', lambda: client.get(f'/dsposition/list?limit=200&offset={max(positions - 400, 0)}')),
+        Scenario('get_position', lambda: client.get(f'/get_position?positionId={position_id()}')),
+        Scenario('dsposition add', post('/dsposition/add', lambda: {"dbProductParentKey": product_id(), "dbPlanogramParentKey": planogram_id(), "dbFixtureParentKey": 1, "hFacing": 1, "vFacing": 1, "dFacing": 1}), (200, 201)),
+        Scenario('dsposition update', post('/dsposition/update_position', lambda: {"positionId": position_id(), "dbProductParentKey": product_id(), "dbPlanogramParentKey": planogram_id(), "dbFixtureParentKey": 1, "hFacing": 2, "vFacing": 2, "dFacing": 2})),
+
+        Scenario('dsperformance page', page('/dsperformance')),
+        Scenario('dsperformance list', page('/dsperformance/list?limit=200')),
+        Scenario('get_performance', lambda: client.get(f'/get_performance?performanceId={position_id()}')),
+        Scenario('dsperformance add', post('/dsperformance/add', lambda: {"dbPlanogramParentKey": planogram_id(), "dbProductParentKey": product_id(), "factings": 1, "capacity": 1, "unitMovement": 1, "sales": 1.0, "margen": 1.0, "cost": 1.0}), (200, 201)),
+        Scenario('dsperformance update', post('/dsperformance/update_performance', lambda: {"dbKey": position_id(), "dbPlanogramParentKey": planogram_id(), "dbProductParentKey": product_id(), "factings": 2, "capacity": 2, "unitMovement": 2, "sales": 2.0, "margen": 2.0, "cost": 2.0})),
+
+        Scenario('simulation', lambda: client.post(f'/simulation/{planogram_id()}', json={"changes": [{"productId": product_id(), "hFacing": 3}]})),
+
+        # Deletes last, against rows reserved at the end of each table
+        Scenario('planogram delete product', delete('/planogram/delete', lambda: {"planogramId": planograms, "productId": product_id()})),
+        Scenario('dsposition delete', post('/dsposition/delete_position', each(reserved(positions), lambda key: {"positionId": key}))),
+        Scenario('dsperformance delete', post('/dsperformance/delete_performance', each(reserved(positions), lambda key: {"dbKey": key}))),
+        Scenario('clstore delete', post('/clstore/delete_store', each(reserved(stores), lambda store: {"clusterId": store % clusters + 1, "storeId": store}))),
+        Scenario('stfloorplan delete', post('/stfloorplan/delete_floorplan', each(reserved(stores), lambda store: {"storeId": store, "floorplanId": store})), (200, 404)),
+        Scenario('dsproduct delete', delete('/dsproduct/delete_product', lambda: {"upc": f"BENCH{stamp}-{next(product_deleted)}"})),
+        Scenario('dsplanogram delete', post('/dsplanogram/delete_planogram', each(added(planograms), lambda key: {"planogramId": key}))),
+        Scenario('dsfloorplan delete', post('/dsfloorplan/delete_floor_plan', each(added(floorplans), lambda key: {"floorPlanId": key}))),
+        Scenario('dscluster delete', post('/dscluster/delete_cluster', each(added(clusters), lambda key: {"clusterId": key}))),
+        Scenario('dsstore delete', post('/dsstore/delete_store', each(added(stores), lambda key: {"storeId": key}))),
+    ]
+
+def run_scenario(scenario, requests):
+    """Time one cold request, then requests timed ones, then measure peak memory."""
+    errors = 0
+    statuses = {}
+
+    def timed():
+        nonlocal errors
+        started = time.perf_counter()
+        response = scenario.send()
+        elapsed = time.perf_counter() - started
+        response.get_data()
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        if response.status_code not in scenario.expected:
+            errors += 1
+        return elapsed, parse_server_timing(response.headers.get('Server-Timing'))
+
+    cold, _ = timed()
+    latencies, phases = [], {}
+    started = time.perf_counter()
+    for _ in range(requests):
+        elapsed, timing = timed()
+        latencies.append(elapsed)
+        for name, ms in timing.items():
+            phases[name] = phases.get(name, 0.0) + ms
+    elapsed = time.perf_counter() - started
+
+    gc.collect()
+    tracemalloc.start()
+    timed()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "coldMs": round(cold * 1000, 2),
+        "p50Ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95Ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99Ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "throughput": round(requests / elapsed, 1) if elapsed else None,
+        "phasesMs": {name: round(total / requests, 2) for name, total in phases.items()},
+        "peakMemoryBytes": peak,
+        "errors": errors,
+        "statuses": {str(status): n for status, n in sorted(statuses.items())}
+    }
+
+def bench_scale(scale, args):
+    path = os.path.join(args.db_dir, f"bench_{scale}.sqlite3")
+    started = time.perf_counter()
+    plan = localdb.ensure_seeded(path, scale, reseed=args.reseed)
+    seed_seconds = time.perf_counter() - started
+
+    uninstall = localdb.LocalDatabase(path).install(db)
+    try:
+        from app import create_app
+        app = create_app()
+        client = app.test_client()
+        client.set_cookie('snowflake_username', 'bench')
+        client.set_cookie('snowflake_password', 'bench')
+
+        results = {}
+        for scenario in scenarios(client, plan, args.requests):
+            if args.route and not any(pattern in scenario.name for pattern in args.route):
+                continue
+            results[scenario.name] = run_scenario(scenario, args.requests)
+            summary = results[scenario.name]
+            print(f"  {scenario.name:<28} p50 {summary['p50Ms']:>9.2f} ms  p95 {summary['p95Ms']:>9.2f} ms  "
+                  f"{summary['throughput']:>8} req/s  errors {summary['errors']}", flush=True)
+    finally:
+        uninstall()
+
+    return {"plan": plan, "seedSeconds": round(seed_seconds, 2), "routes": results}
+
+# Run bench_scale for one scale in a fresh interpreter and read back its result
+def bench_scale_isolated(scale, args):
+    fd, output = tempfile.mkstemp(suffix='.json', dir=args.db_dir)
+    os.close(fd)
+    command = [sys.executable, os.path.abspath(__file__), '--only-scale', str(scale),
+               '--requests', str(args.requests), '--db-dir', args.db_dir, '--output', output]
+    for pattern in args.route or ():
+        command += ['--route', pattern]
+    if args.reseed:
+        command.append('--reseed')
+    try:
+        subprocess.run(command, check=True)
+        with open(output) as f:
+            return json.load(f)
+    finally:
+        os.remove(output)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every route against a local stand-in database")
+    parser.add_argument('--scales', default='10000,100000,1000000', help="comma-separated position/performance row counts")
+    parser.add_argument('--requests', type=int, default=50, help="timed requests per route")
+    parser.add_argument('--route', action='append', help="only routes whose name contains this (repeatable)")
+    parser.add_argument('--db-dir', default=os.path.join(tempfile.gettempdir(), 'planogram-bench'))
+    parser.add_argument('--reseed', action='store_true', help="seed again even if a database at the scale exists")
+    parser.add_argument('--output', help="write results as JSON to this file")
+    # Internal: run a single scale in this process (what each child does)
+    parser.add_argument('--only-scale', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    os.makedirs(args.db_dir, exist_ok=True)
+
+    if args.only_scale is not None:
+        # Keep background job state out of the repository (read when jobs.py is imported)
+        Config.JOB_DB_PATH = os.path.join(args.db_dir, f"jobs_{args.only_scale}.sqlite3")
+        result = bench_scale(args.only_scale, args)
+        result["maxRssKb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        with open(args.output, 'w') as f:
+            json.dump(result, f)
+        return
+
+    results = {}
+    for scale in (int(value) for value in args.scales.split(',')):
+        print(f"scale {scale}", flush=True)
+        results[str(scale)] = bench_scale_isolated(scale, args)
+
+    report = {
+        "requests": args.requests,
+        "python": sys.version.split()[0],
+        "scales": results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Compare the threaded and gevent serving modes under concurrent load.
+
+Starts serve.py in each mode, sends the same batch of requests to each with
+the given concurrency, and reports throughput and latency percentiles.
+Credentials come from SNOWFLAKE_USER / SNOWFLAKE_PASSWORD, since the routes
+query the warehouse.
+
+    python bench_serving.py --path /dsstore/list --concurrency 200 --requests 2000
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_until_up(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(base_url + '/', timeout=1).read()
+            return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not start")
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] if ordered else None
+
+def run_load(base_url, paths, total, concurrency, cookie):
+    def one(index):
+        request = urllib.request.Request(base_url + paths[index % len(paths)], headers={'Cookie': cookie})
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=120) as response:
+                response.read()
+                ok = response.status == 200
+        except (urllib.error.URLError, OSError):
+            ok = False
+        return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for latency, ok in results if ok]
+    return {
+        "requests": total,
+        "errors": sum(1 for _, ok in results if not ok),
+        "seconds": round(elapsed, 3),
+        "throughput": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1) if latencies else None
+    }
+
+def bench_mode(mode, args, cookie):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, 'serve.py', '--mode', mode, '--port', str(port)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.DEVNULL
+    )
+    try:
+        wait_until_up(base_url)
+        # Warm up connections and caches before measuring
+        run_load(base_url, args.path, min(args.concurrency, args.requests), args.concurrency, cookie)
+        return run_load(base_url, args.path, args.requests, args.concurrency, cookie)
+    finally:
+        server.terminate()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark threaded vs gevent serving")
+    parser.add_argument('--path', action='append', help="route to request (repeatable)")
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--modes', default='threaded,gevent')
+    parser.add_argument('--output', help="write results as JSON to this file")
+    args = parser.parse_args()
+    args.path = args.path or ['/dsstore/list']
+
+    user = os.getenv('SNOWFLAKE_USER')
+    password = os.getenv('SNOWFLAKE_PASSWORD')
+    if not user or not password:
+        raise SystemExit("Set SNOWFLAKE_USER and SNOWFLAKE_PASSWORD")
+    cookie = f"snowflake_username={user}; snowflake_password={password}"
+
+    results = {}
+    for mode in args.modes.split(','):
+        results[mode] = bench_mode(mode, args, cookie)
+        print(f"{mode:>9}: {json.dumps(results[mode])}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"paths": args.path, "concurrency": args.concurrency, "results": results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+import hashlib
+import threading
+import time
+import uuid
+from collections import deque
+from functools import wraps
+from flask import request, jsonify, make_response
+from config import Config
+
+class ChangeLog:
+    """
+    Per-table change versions plus a bounded log of row-level changes
+    (insert / update / delete) made through this process.
+
+    Version tokens look like "<epoch>.<version>"; the epoch changes on every
+    restart so tokens issued by an earlier process are never trusted.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.epoch = uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._sequence = 0
+        self._versions = {}
+        self._events = {}
+
+    def version(self, table):
+        with self._lock:
+            return self._versions.get(table, 0)
+
+    def token(self, table):
+        return f"{self.epoch}.{self.version(table)}"
+
+    def parse_token(self, token):
+        """Return the version in a token from this process, or None."""
+        epoch, _, version = str(token or '').partition('.')
+        if epoch != self.epoch:
+            return None
+        try:
+            return int(version)
+        except ValueError:
+            return None
+
+    def record(self, table, op, key, parent=None):
+        """Record a change to one row and return the table's new version."""
+        with self._lock:
+            version = self._versions.get(table, 0) + 1
+            self._versions[table] = version
+            events = self._events.setdefault(table, deque(maxlen=self.capacity))
+            events.append((version, op, None if key is None else str(key), parent))
+            self._sequence += 1
+            self._changed.notify_all()
+            return version
+
+    def sequence(self):
+        """Number of changes recorded to any table, for use with wait()."""
+        with self._lock:
+            return self._sequence
+
+    def wait(self, sequence, timeout):
+        """Block until a change is recorded after sequence; False on timeout."""
+        with self._lock:
+            return self._changed.wait_for(lambda: self._sequence != sequence, timeout)
+
+    def since(self, table, version):
+        """
+        Return the (version, op, key, parent) events after version, or None
+        when the log no longer reaches back that far.
+        """
+        with self._lock:
+            current = self._versions.get(table, 0)
+            if version > current:
+                return None
+            events = self._events.get(table, ())
+            if version < current and (not events or events[0][0] > version + 1):
+                return None
+            return [event for event in events if event[0] > version]
+
+# Shared change log for all blueprints
+change_log = ChangeLog(Config.CHANGE_LOG_SIZE)
+
+# Build the JSON body for a delta-sync list endpoint.
+# fetch_all() returns every row; fetch_by_keys(keys) returns the current rows
+# for the given keys. Rows are returned as lists in SELECT column order.
+def delta_payload(table, since, fetch_all, fetch_by_keys, key_index=0):
+    # Read the version before the data so a concurrent write is re-sent, not lost
+    token = change_log.token(table)
+    version = change_log.parse_token(since) if since else None
+    events = change_log.since(table, version) if version is not None else None
+
+    if events is None or any(key is None for _, _, key, _ in events):
+        return {"version": token, "full": True, "rows": [list(row) for row in fetch_all()], "deleted": []}
+
+    latest = {}
+    for _, op, key, _ in events:
+        latest[key] = op
+    changed = [key for key, op in latest.items() if op != 'delete']
+    rows = [list(row) for row in fetch_by_keys(changed)] if changed else []
+    found = {str(row[key_index]) for row in rows}
+    deleted = [key for key, op in latest.items() if op == 'delete' or key not in found]
+    return {"version": token, "full": False, "rows": rows, "deleted": deleted}
+
+# Digest of a user's credentials, for keys and validators that must differ per login
+def credentials_digest(user, password):
+    return hashlib.sha256(f"{user}\0{password}".encode()).hexdigest()
+
+# Digest of the calling request's credentials
+def request_digest():
+    return credentials_digest(
+        request.cookies.get('snowflake_username'),
+        request.cookies.get('snowflake_password')
+    )
+
+# Respond to a delta-sync list request. A client whose If-None-Match already
+# names the table's current version gets an empty 304; anyone else gets the
+# delta payload. The ETag is the version plus the caller's credential digest,
+# so one login's validator never revalidates a copy fetched by another.
+# As in conditional(), versions also carry the CONDITIONAL_VERSION_TTL period:
+# a copy from an earlier period is sent in full again, catching writes made
+# outside this process.
+def delta_response(table, fetch_all, fetch_by_keys, key_index=0):
+    period = version_period()
+    digest = request_digest()[:16]
+    etag = f"{change_log.token(table)}.{period}.{digest}"
+    # Weak comparison, as compression weakens the ETag on the way out
+    if request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+    else:
+        since, _, since_period = (request.args.get('since') or '').rpartition('.')
+        if since_period != str(period):
+            since = None
+        payload = delta_payload(table, since, fetch_all, fetch_by_keys, key_index)
+        payload["version"] = f"{payload['version']}.{period}"
+        response = jsonify({"success": True, **payload})
+        etag = f"{payload['version']}.{digest}"
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response
+
+# Index of the current CONDITIONAL_VERSION_TTL period (0 when the TTL is off)
+def version_period():
+    ttl = Config.CONDITIONAL_VERSION_TTL
+    return int(time.time() // ttl) if ttl > 0 else 0
+
+# Decorator for read routes: answer conditional GETs from the in-memory change
+# versions of the tables the route reads, without running the view or a query.
+# The weak ETag combines those versions with the caller's credentials, since
+# Snowflake roles may show different users different rows.
+#
+# The versions only see writes made through this process, so the ETag also
+# carries the current CONDITIONAL_VERSION_TTL period: a copy is revalidated
+# against the warehouse at least once per period, catching writes made
+# elsewhere. Last-Modified is not sent, as second resolution cannot tell
+# apart two writes in the same second; revalidation is by ETag only.
+def conditional(*tables):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            versions = ".".join(str(change_log.version(table)) for table in tables)
+            etag = f"{change_log.epoch}.{versions}.{version_period()}.{request_digest()[:16]}"
+
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('Cookie')
+            return response
+        return wrapper
+    return decorator
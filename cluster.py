@@ -1,19 +1,16 @@
-import snowflake.connector
+import json
 from flask import Blueprint, render_template, request, jsonify
 from config import Config
+from db import connect
+from query_utils import next_key, parse_list_args, list_query, list_payload
+from changes import change_log, delta_response, conditional
+from fragment_cache import render_table_body
 
 cluster_bp = Blueprint('cluster', __name__)
 
 # Helper function to establish a Snowflake connection
 def get_snowflake_connection(user, password):
-    return snowflake.connector.connect(
-        user=user,
-        password=password,
-        account=Config.SNOWFLAKE_ACCOUNT,
-        warehouse=Config.SNOWFLAKE_WAREHOUSE,
-        database=Config.SNOWFLAKE_DATABASE,
-        schema=Config.SNOWFLAKE_SCHEMA
-    )
+    return connect(user, password)
 
 # Helper function to execute a query and fetch results
 def execute_query(user, password, query, params=None, fetchone=False):
@@ -32,10 +29,36 @@ def fetch_cluster_by_id(user, password, cluster_id):
     query = "SELECT DBKEY, CLUSTERNAME FROM NEWCKB.PUBLIC.IX_EIA_CLUSTER WHERE DBKEY = %s"
     return execute_query(user, password, query, (cluster_id,), fetchone=True)
 
-# Insert a new cluster
+# Fetch clusters by a list of IDs
+def fetch_clusters_by_ids(user, password, cluster_ids):
+    query = """
+        SELECT DBKEY, CLUSTERNAME FROM NEWCKB.PUBLIC.IX_EIA_CLUSTER
+        WHERE DBKEY IN (SELECT VALUE::INT FROM TABLE(FLATTEN(INPUT => PARSE_JSON(%s))))
+    """
+    return execute_query(user, password, query, (json.dumps([int(cluster_id) for cluster_id in cluster_ids]),))
+
+# Cluster list columns that can be filtered and sorted, by API name
+CLUSTER_LIST_COLUMNS = {
+    "clusterId": "DBKEY",
+    "clusterName": "CLUSTERNAME"
+}
+
+# Fetch one filtered, sorted page of clusters
+def fetch_cluster_page(user, password, list_args):
+    query, params = list_query(
+        list(CLUSTER_LIST_COLUMNS.values()), "NEWCKB.PUBLIC.IX_EIA_CLUSTER",
+        CLUSTER_LIST_COLUMNS, "DBKEY", list_args
+    )
+    return execute_query(user, password, query, params)
+
+# Insert a new cluster and return its ID
 def insert_cluster(user, password, cluster_name):
-    query = "INSERT INTO NEWCKB.PUBLIC.IX_EIA_CLUSTER (CLUSTERNAME) VALUES (%s)"
-    execute_query(user, password, query, (cluster_name,))
+    query = "INSERT INTO NEWCKB.PUBLIC.IX_EIA_CLUSTER (DBKEY, CLUSTERNAME) VALUES (%s, %s)"
+    with get_snowflake_connection(user, password) as conn:
+        with conn.cursor() as cursor:
+            cluster_id = next_key(cursor, "NEWCKB.PUBLIC.IX_EIA_CLUSTER")
+            cursor.execute(query, (cluster_id, cluster_name))
+            return cluster_id
     # Commit is handled by the context manager
 
 # Update an existing cluster
@@ -52,6 +75,7 @@ def delete_cluster(user, password, cluster_id):
 
 # Route to display all clusters
 @cluster_bp.route('/dscluster')
+@conditional('cluster')
 def dscluster():
     user = request.cookies.get('snowflake_username')
     password = request.cookies.get('snowflake_password')
@@ -60,13 +84,63 @@ def dscluster():
         return "Error: Missing credentials", 401
     
     try:
-        clusters = fetch_clusters(user, password)
-        return render_template('dscluster.html', clusters=clusters)
+        version = change_log.token('cluster')
+        # Only the first page is rendered; the table loads the rest as it scrolls
+        list_args = parse_list_args({}, CLUSTER_LIST_COLUMNS, Config.LIST_PAGE_SIZE, Config.LIST_MAX_PAGE_SIZE)
+        table_body, total = render_table_body(
+            'cluster', version, user, password, list_args, 'dscluster.html', 'clusters',
+            lambda: fetch_cluster_page(user, password, list_args)
+        )
+        return render_template(
+            'dscluster.html', table_body=table_body, total=total,
+            page_size=list_args.limit, version=version
+        )
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+# Route to get clusters changed since a version token
+@cluster_bp.route('/dscluster/data', methods=['GET'])
+def dscluster_data():
+    user = request.cookies.get('snowflake_username')
+    password = request.cookies.get('snowflake_password')
+
+    if not user or not password:
+        return jsonify({"success": False, "message": "Missing credentials"}), 401
+
+    try:
+        return delta_response(
+            'cluster',
+            lambda: fetch_clusters(user, password),
+            lambda cluster_ids: fetch_clusters_by_ids(user, password, cluster_ids)
+        )
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+# Route to get one filtered, sorted page of clusters
+@cluster_bp.route('/dscluster/list', methods=['GET'])
+@conditional('cluster')
+def dscluster_list():
+    user = request.cookies.get('snowflake_username')
+    password = request.cookies.get('snowflake_password')
+
+    if not user or not password:
+        return jsonify({"success": False, "message": "Missing credentials"}), 401
+
+    try:
+        list_args = parse_list_args(request.args, CLUSTER_LIST_COLUMNS, Config.LIST_PAGE_SIZE, Config.LIST_MAX_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    try:
+        version = change_log.token('cluster')
+        clusters = fetch_cluster_page(user, password, list_args)
+        return jsonify({"success": True, "version": version, **list_payload(clusters, list_args)})
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
 # Route to get a cluster by ID
 @cluster_bp.route('/get_cluster', methods=['GET'])
+@conditional('cluster')
 def get_cluster():
     user = request.cookies.get('snowflake_username')
     password = request.cookies.get('snowflake_password')
@@ -109,7 +183,8 @@ def add_cluster():
         return jsonify({"success": False, "message": "Cluster name is required"}), 400
 
     try:
-        insert_cluster(user, password, cluster_name)
+        cluster_id = insert_cluster(user, password, cluster_name)
+        change_log.record('cluster', 'insert', cluster_id)
         return jsonify({"success": True}), 200
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
@@ -132,6 +207,7 @@ def update_cluster_route():
 
     try:
         update_cluster(user, password, cluster_id, cluster_name)
+        change_log.record('cluster', 'update', cluster_id)
         return jsonify({"success": True}), 200
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
@@ -153,6 +229,7 @@ def delete_cluster_route():
 
     try:
         delete_cluster(user, password, cluster_id)
+        change_log.record('cluster', 'delete', cluster_id)
         return jsonify({"success": True}), 200
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
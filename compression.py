@@ -0,0 +1,146 @@
+import zlib
+from flask import request
+from config import Config
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Content types worth compressing; images, PDFs and fonts are already compressed
+COMPRESSIBLE_TYPES = {
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/csv',
+    'text/javascript',
+    'application/javascript',
+    'application/json',
+    'image/svg+xml'
+}
+
+class _GzipEncoder:
+    def __init__(self):
+        self._compressor = zlib.compressobj(Config.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data, flush=False):
+        chunk = self._compressor.compress(data)
+        return chunk + self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else chunk
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+class _BrotliEncoder:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=Config.COMPRESSION_BROTLI_QUALITY)
+
+    def compress(self, data, flush=False):
+        chunk = self._compressor.process(data)
+        return chunk + self._compressor.flush() if flush else chunk
+
+    def finish(self):
+        return self._compressor.finish()
+
+class _ZstdEncoder:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=Config.COMPRESSION_ZSTD_LEVEL).compressobj()
+
+    def compress(self, data, flush=False):
+        chunk = self._compressor.compress(data)
+        return chunk + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK) if flush else chunk
+
+    def finish(self):
+        return self._compressor.flush()
+
+# Encoders available in this environment, in server preference order
+def available_encoders():
+    encoders = {}
+    if brotli is not None:
+        encoders['br'] = _BrotliEncoder
+    if zstandard is not None:
+        encoders['zstd'] = _ZstdEncoder
+    encoders['gzip'] = _GzipEncoder
+    return encoders
+
+# Pick the encoding the client rates highest, breaking ties by server preference
+def negotiate_encoding(accept_encodings, encoders):
+    best = None
+    best_quality = 0
+    for encoding in encoders:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+# Bytes of streamed input to compress before flushing a block to the client.
+# Flushing every small chunk would throw away most of the compression.
+STREAM_FLUSH_SIZE = 16384
+
+# Compress a streamed body incrementally, so clients start receiving data
+# before the view has finished yielding it
+def _compress_stream(chunks, encoder):
+    pending = 0
+    for chunk in chunks:
+        if not chunk:
+            continue
+        pending += len(chunk)
+        flush = pending >= STREAM_FLUSH_SIZE
+        if flush:
+            pending = 0
+        data = encoder.compress(chunk, flush=flush)
+        if data:
+            yield data
+    yield encoder.finish()
+
+def compress_response(response):
+    """Compress an eligible response with the best encoding the client accepts."""
+    if (request.method == 'HEAD'
+            or response.status_code < 200
+            or response.status_code in (204, 206, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+
+    encoders = available_encoders()
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding(request.accept_encodings, encoders)
+    if encoding is None:
+        return response
+
+    if response.is_streamed or response.direct_passthrough:
+        content_length = response.content_length
+        if content_length is not None and content_length < Config.COMPRESSION_MIN_SIZE:
+            return response
+        body = response.iter_encoded()
+        original = response.response
+        response.direct_passthrough = False
+        response.response = _compress_stream(body, encoders[encoding]())
+        if hasattr(original, 'close'):
+            response.call_on_close(original.close)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < Config.COMPRESSION_MIN_SIZE:
+            return response
+        encoder = encoders[encoding]()
+        response.set_data(encoder.compress(data) + encoder.finish())
+
+    response.headers['Content-Encoding'] = encoding
+    # The compressed bytes differ from what a strong ETag describes
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+def init_compression(app):
+    """
+    Compress HTML, JSON and other text responses on the way out.
+    Register this before any other after_request hook so it runs last.
+    """
+    if Config.COMPRESSION_ENABLED:
+        app.after_request(compress_response)
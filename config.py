@@ -4,5 +4,101 @@ class Config:
     # Snowflake connection settings with environment variable overrides
     SNOWFLAKE_ACCOUNT = os.getenv('SNOWFLAKE_ACCOUNT', 'CMWDBMC-HB15746')
     SNOWFLAKE_WAREHOUSE = os.getenv('SNOWFLAKE_WAREHOUSE', 'NEWCKB_WH')
+    # Warehouses per workload class, comma-separated for round-robin
+    SNOWFLAKE_WAREHOUSE_INTERACTIVE = os.getenv('SNOWFLAKE_WAREHOUSE_INTERACTIVE', SNOWFLAKE_WAREHOUSE)
+    SNOWFLAKE_WAREHOUSE_ANALYTIC = os.getenv('SNOWFLAKE_WAREHOUSE_ANALYTIC', SNOWFLAKE_WAREHOUSE)
     SNOWFLAKE_DATABASE = os.getenv('SNOWFLAKE_DATABASE', 'NEWCKB')
     SNOWFLAKE_SCHEMA = os.getenv('SNOWFLAKE_SCHEMA', 'public')
+
+    # What-if simulation settings
+    SIMULATION_MODEL_TTL = int(os.getenv('SIMULATION_MODEL_TTL', '300'))
+    SIMULATION_SPACE_ELASTICITY = float(os.getenv('SIMULATION_SPACE_ELASTICITY', '0.15'))
+    SIMULATION_MOVEMENT_PERIOD_DAYS = float(os.getenv('SIMULATION_MOVEMENT_PERIOD_DAYS', '7'))
+
+    # UPC -> DBKEY resolver cache size
+    UPC_CACHE_SIZE = int(os.getenv('UPC_CACHE_SIZE', '100000'))
+
+    # Number of row changes kept per table for delta sync
+    CHANGE_LOG_SIZE = int(os.getenv('CHANGE_LOG_SIZE', '5000'))
+
+    # Default and maximum page sizes for list endpoints
+    LIST_PAGE_SIZE = int(os.getenv('LIST_PAGE_SIZE', '200'))
+    LIST_MAX_PAGE_SIZE = int(os.getenv('LIST_MAX_PAGE_SIZE', '1000'))
+
+    # Static asset fingerprinting and far-future caching
+    ASSET_FINGERPRINTING = os.getenv('ASSET_FINGERPRINTING', 'true').lower() == 'true'
+    ASSET_MAX_AGE = int(os.getenv('ASSET_MAX_AGE', '31536000'))
+
+    # Response compression (gzip always; brotli/zstd when installed)
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+    COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', '6'))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', '5'))
+    COMPRESSION_ZSTD_LEVEL = int(os.getenv('COMPRESSION_ZSTD_LEVEL', '3'))
+
+    # Rendered table fragment cache
+    FRAGMENT_CACHE_BYTES = int(os.getenv('FRAGMENT_CACHE_BYTES', str(64 * 1024 * 1024)))
+    FRAGMENT_CACHE_TTL = int(os.getenv('FRAGMENT_CACHE_TTL', '300'))
+
+    # Seconds between keep-alive comments on the change event stream
+    EVENTS_KEEPALIVE = int(os.getenv('EVENTS_KEEPALIVE', '15'))
+
+    # Each open event stream holds a worker thread: cap how many are open at once,
+    # and end each after this many seconds (the browser reconnects and resumes)
+    EVENTS_MAX_STREAMS = int(os.getenv('EVENTS_MAX_STREAMS', '100'))
+    EVENTS_MAX_STREAM_SECONDS = int(os.getenv('EVENTS_MAX_STREAM_SECONDS', '300'))
+
+    # Submit reads with execute_async and poll for completion (seconds between polls)
+    ASYNC_QUERIES = os.getenv('ASYNC_QUERIES', 'true').lower() == 'true'
+    QUERY_POLL_INITIAL = float(os.getenv('QUERY_POLL_INITIAL', '0.05'))
+    QUERY_POLL_MAX = float(os.getenv('QUERY_POLL_MAX', '1.0'))
+
+    # Concurrent requests served by the gevent server in serve.py
+    SERVER_CONCURRENCY = int(os.getenv('SERVER_CONCURRENCY', '1000'))
+
+    # Default and long (scans, exports) per-request query budgets in seconds
+    QUERY_TIMEOUT = int(os.getenv('QUERY_TIMEOUT', '30'))
+    QUERY_TIMEOUT_LONG = int(os.getenv('QUERY_TIMEOUT_LONG', '300'))
+
+    # Background job queue: SQLite state file, worker threads, retries, and the
+    # seconds a process's lease on its jobs lasts without renewal (the jobs of a
+    # process that stops are failed once its lease lapses)
+    JOB_DB_PATH = os.getenv('JOB_DB_PATH', os.path.join('instance', 'jobs.sqlite3'))
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+    JOB_RETRY_DELAY = float(os.getenv('JOB_RETRY_DELAY', '5'))
+    JOB_LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', '60'))
+
+    # Admission control for warehouse queries: concurrent queries overall,
+    # per user and for analytic routes, and the queue depth past which
+    # requests get 429 Retry-After
+    ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'true').lower() == 'true'
+    ADMISSION_GLOBAL_LIMIT = int(os.getenv('ADMISSION_GLOBAL_LIMIT', '16'))
+    ADMISSION_USER_LIMIT = int(os.getenv('ADMISSION_USER_LIMIT', '4'))
+    ADMISSION_ANALYTIC_LIMIT = int(os.getenv('ADMISSION_ANALYTIC_LIMIT', '8'))
+    ADMISSION_QUEUE_LIMIT = int(os.getenv('ADMISSION_QUEUE_LIMIT', '64'))
+
+    # Per-request phase timing as a Server-Timing header and a "timing" log line
+    SERVER_TIMING = os.getenv('SERVER_TIMING', 'true').lower() == 'true'
+
+    # Prometheus metrics at /metrics: request, query, connection, cache and job stats
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+
+    # Slow query log: statements slower than the threshold (seconds), how many
+    # recent ones to keep, and whether to capture EXPLAIN for new fingerprints
+    SLOW_QUERY_THRESHOLD = float(os.getenv('SLOW_QUERY_THRESHOLD', '1.0'))
+    SLOW_QUERY_LOG_SIZE = int(os.getenv('SLOW_QUERY_LOG_SIZE', '200'))
+    SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', 'true').lower() == 'true'
+    # The log shows every user's statements and bind values, so /slow_queries (and the
+    # /admission/stats and /warehouses/stats operator routes) need this token in an
+    # X-Admin-Token header; the routes are off while it is unset
+    SLOW_QUERY_ADMIN_TOKEN = os.getenv('SLOW_QUERY_ADMIN_TOKEN', '')
+
+    # Seconds a successful credential check is trusted by routes served from memory,
+    # and how many checked logins to remember
+    CREDENTIAL_CHECK_TTL = int(os.getenv('CREDENTIAL_CHECK_TTL', '60'))
+    CREDENTIAL_CHECK_SIZE = int(os.getenv('CREDENTIAL_CHECK_SIZE', '10000'))
+
+    # Seconds a conditional GET validator stays good without a write through this
+    # process, so writes made elsewhere show up within that time (0 keeps it until a write)
+    CONDITIONAL_VERSION_TTL = int(os.getenv('CONDITIONAL_VERSION_TTL', '60'))
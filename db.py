@@ -0,0 +1,297 @@
+import json
+import math
+import select
+import socket
+import threading
+import time
+import uuid
+from flask import g, has_request_context, request
+from snowflake.connector.connection import SnowflakeConnection
+from snowflake.connector.cursor import SnowflakeCursor
+from snowflake.connector.errors import DatabaseError
+from config import Config
+from changes import credentials_digest
+from admission import ANALYTIC, admission_controller, route_workload
+from warehouses import warehouse_router
+from timing import phase, record_query
+from slow_queries import slow_query_log
+from metrics import admission_wait, connect_duration, connections_open, fingerprint, query_duration, query_errors, query_rows
+
+class QueryCancelled(Exception):
+    """Raised when a query is abandoned because its budget ran out or its client left."""
+
+class LoginFailed(Exception):
+    """Raised when the warehouse rejects a user's credentials."""
+
+# Statements that only read, and so can be submitted asynchronously and
+# collected by query id. Writes keep the blocking path so rowcount is set.
+READ_PREFIXES = ('SELECT', 'WITH')
+
+# Error number of a failed login (ER_FAILED_TO_CONNECT_TO_DB in the connector)
+ER_FAILED_TO_CONNECT_TO_DB = 250001
+
+def is_read_query(query):
+    return query.lstrip().lstrip('(').upper().startswith(READ_PREFIXES)
+
+# Decorator for routes whose queries need more (or less) than the default
+# QUERY_TIMEOUT budget; the budget covers every query the request runs
+def query_budget(seconds):
+    def decorator(view):
+        view.query_budget = seconds
+        return view
+    return decorator
+
+# Give each request an id and a query deadline from its route's budget
+def init_query_context(app):
+    @app.before_request
+    def start_query_budget():
+        view = app.view_functions.get(request.endpoint)
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        g.query_deadline = time.monotonic() + getattr(view, 'query_budget', Config.QUERY_TIMEOUT)
+
+    @app.after_request
+    def add_request_id(response):
+        if 'request_id' in g:
+            response.headers['X-Request-ID'] = g.request_id
+        return response
+
+# True once the HTTP client has closed its connection. Both servers put the
+# client socket in the environ (werkzeug.socket, gevent.socket in serve.py).
+def client_disconnected():
+    sock = request.environ.get('werkzeug.socket') or request.environ.get('gevent.socket')
+    if sock is None:
+        return False
+    try:
+        # TLS sockets reject recv flags; decrypted data still buffered means the
+        # client is there, otherwise peek at the raw bytes on a duplicate socket
+        if hasattr(sock, 'pending'):
+            if sock.pending():
+                return False
+            with socket.fromfd(sock.fileno(), sock.family, sock.type) as raw:
+                return peer_closed(raw)
+        return peer_closed(sock)
+    except (OSError, ValueError):
+        # Unknown is treated as connected, so a query is never cancelled by mistake
+        return False
+
+def peer_closed(sock):
+    readable, _, _ = select.select([sock], [], [], 0)
+    return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b''
+
+# Per-statement parameters for a query run inside a request: a QUERY_TAG
+# naming the route, user and request id, and a statement timeout set to
+# whatever is left of the request's budget
+def statement_params():
+    if not has_request_context() or 'query_deadline' not in g:
+        return {}
+    remaining = g.query_deadline - time.monotonic()
+    if remaining <= 0:
+        raise QueryCancelled("Query budget exhausted")
+    tag = json.dumps({
+        "route": request.endpoint,
+        "workload": route_workload(request.endpoint),
+        "user": request.cookies.get('snowflake_username'),
+        "requestId": g.request_id
+    })
+    return {
+        "QUERY_TAG": tag[:2000],
+        "STATEMENT_TIMEOUT_IN_SECONDS": max(1, math.ceil(remaining))
+    }
+
+# Poll a submitted query until it leaves the running states, cancelling it
+# if the request's budget runs out or its client disconnects. The waits go
+# through time.sleep, so under the gevent server (serve.py) they yield to
+# other requests instead of holding a thread.
+def wait_for_query(cursor, query_id):
+    conn = cursor.connection
+    delay = Config.QUERY_POLL_INITIAL
+    while conn.is_still_running(conn.get_query_status_throw_if_error(query_id)):
+        if has_request_context() and 'query_deadline' in g:
+            reason = None
+            if time.monotonic() >= g.query_deadline:
+                reason = "Query exceeded the route's time budget"
+            elif client_disconnected():
+                reason = "Client disconnected"
+            if reason:
+                cursor.abort_query(query_id)
+                raise QueryCancelled(f"{reason}; cancelled query {query_id}")
+        time.sleep(delay)
+        delay = min(delay * 2, Config.QUERY_POLL_MAX)
+
+# Workload class and queueing deadline for a query. Queries outside a
+# request (background jobs) are analytic and wait as long as they need.
+def query_admission():
+    if not has_request_context():
+        return ANALYTIC, None
+    return route_workload(request.endpoint), g.get('query_deadline')
+
+# Run one statement for cursor with the bookkeeping every cursor shares
+# (AsyncSubmitCursor here, LocalCursor in localdb.py): wait for an admission
+# slot, then time the statement and record it in the metrics, the slow query
+# log and the request's Server-Timing. run(parameters) executes it with the
+# request's statement parameters and returns the statement's query id;
+# explain() returns its plan for the slow query log, and is only called
+# once the slot is released so an EXPLAIN never holds one.
+def execute_statement(cursor, command, params, run, explain):
+    parameters = statement_params()
+    if not Config.ADMISSION_ENABLED:
+        capture_plan = track_statement(cursor, command, params, lambda: run(parameters), explain)
+        if capture_plan:
+            capture_plan()
+        return cursor
+    user, workload, deadline = cursor.connection.user, *query_admission()
+    queued = time.monotonic()
+    with phase('queue'):
+        admitted = admission_controller.acquire(user, workload, deadline)
+    admission_wait.observe(time.monotonic() - queued, workload)
+    if not admitted:
+        raise QueryCancelled("Timed out waiting for a warehouse slot")
+    started = time.monotonic()
+    try:
+        capture_plan = track_statement(cursor, command, params, lambda: run(parameters), explain)
+    finally:
+        admission_controller.release(user, workload, time.monotonic() - started)
+    if capture_plan:
+        capture_plan()
+    return cursor
+
+# Time and record one statement; returns the slow query log's plan capture, if any
+def track_statement(cursor, command, params, run, explain):
+    cursor.fingerprint = fingerprint(command)
+    started = time.perf_counter()
+    try:
+        with phase('execute'):
+            query_id = run()
+    except Exception as e:
+        query_errors.inc(cursor.fingerprint)
+        slow_query_log.record(command, params, time.perf_counter() - started, cursor.sfqid, error=e)
+        raise
+    elapsed = time.perf_counter() - started
+    query_duration.observe(elapsed, cursor.fingerprint)
+    record_query(query_id)
+    return slow_query_log.record(command, params, elapsed, query_id, explain=explain)
+
+class AsyncSubmitCursor(SnowflakeCursor):
+    """
+    Cursor that tags every statement, bounds it by the request's budget and
+    waits for a slot from the admission controller before running it.
+    Reads are submitted with execute_async and polled, so no connection
+    request stays open for the query's duration and they can be cancelled.
+    """
+
+    def execute(self, command, params=None, **kwargs):
+        # execute_async and internal calls pass keyword options; leave those alone
+        if kwargs:
+            return super().execute(command, params, **kwargs)
+        return execute_statement(
+            self, command, params,
+            lambda parameters: self._run(command, params, parameters),
+            lambda: self._explain(command, params)
+        )
+
+    def _run(self, command, params, parameters):
+        if not Config.ASYNC_QUERIES or not is_read_query(command):
+            super().execute(command, params, _statement_params=parameters)
+            return self.sfqid
+        query_id = self.execute_async(command, params, _statement_params=parameters)["queryId"]
+        wait_for_query(self, query_id)
+        # Not get_results_from_sfqid: it reads the results through a new cursor of
+        # this class, which would take a second slot and submit the scan async again
+        super().execute(f"select * from table(result_scan('{query_id}'))", _statement_params=parameters)
+        return query_id
+
+    # Text plan for a statement, from a plain cursor so it skips admission and tagging
+    def _explain(self, command, params):
+        with self.connection.cursor(SnowflakeCursor) as cursor:
+            cursor.execute(f"EXPLAIN USING TEXT {command}", params)
+            return '\n'.join(str(row[0]) for row in cursor.fetchall())
+
+    def _count_rows(self, count):
+        if getattr(self, 'fingerprint', None):
+            query_rows.inc(self.fingerprint, amount=count)
+
+    # Row fetches (including the lazy result download) count as the fetch phase
+    def fetchone(self):
+        with phase('fetch'):
+            row = super().fetchone()
+        self._count_rows(0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        with phase('fetch'):
+            rows = super().fetchmany(size)
+        self._count_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        with phase('fetch'):
+            rows = super().fetchall()
+        self._count_rows(len(rows))
+        return rows
+
+class Connection(SnowflakeConnection):
+    def cursor(self, cursor_class=None):
+        return super().cursor(cursor_class or AsyncSubmitCursor)
+
+    def close(self, retry=True):
+        if not self.is_closed():
+            connections_open.dec()
+        super().close(retry)
+
+# Open a Snowflake connection with the caller's credentials, on a warehouse
+# picked for the workload class of the current route (or of background jobs).
+# Every blueprint's get_snowflake_connection goes through here.
+def connect(user, password):
+    workload, _ = query_admission()
+    warehouse = warehouse_router.pick(workload)
+    started = time.perf_counter()
+    with phase('connect'):
+        try:
+            conn = Connection(
+                user=user,
+                password=password,
+                account=Config.SNOWFLAKE_ACCOUNT,
+                warehouse=warehouse,
+                database=Config.SNOWFLAKE_DATABASE,
+                schema=Config.SNOWFLAKE_SCHEMA
+            )
+        except DatabaseError as e:
+            # Rejected logins are reported as such; network and service errors pass through
+            if e.errno == ER_FAILED_TO_CONNECT_TO_DB:
+                raise LoginFailed(str(e)) from e
+            raise
+    connect_duration.observe(time.perf_counter() - started, warehouse)
+    connections_open.inc()
+    return conn
+
+# Digests of credentials the warehouse accepted recently, with when they were checked
+_verified = {}
+_verified_lock = threading.Lock()
+
+# True if the warehouse accepts a user's credentials. Routes that answer from
+# in-process caches (indexes, models, the job table, the change stream) call
+# this, since no query of theirs would fail on a bad login. Successes are
+# remembered for CREDENTIAL_CHECK_TTL seconds; failures are always rechecked.
+def verify_credentials(user, password):
+    if not user or not password:
+        return False
+    key = credentials_digest(user, password)
+    with _verified_lock:
+        checked = _verified.get(key)
+    if checked is not None and time.monotonic() - checked < Config.CREDENTIAL_CHECK_TTL:
+        return True
+
+    try:
+        connect(user, password).close()
+    except LoginFailed:
+        return False
+
+    now = time.monotonic()
+    with _verified_lock:
+        if len(_verified) >= Config.CREDENTIAL_CHECK_SIZE:
+            for stale in [k for k, at in _verified.items() if now - at >= Config.CREDENTIAL_CHECK_TTL]:
+                del _verified[stale]
+            if len(_verified) >= Config.CREDENTIAL_CHECK_SIZE:
+                _verified.clear()
+        _verified[key] = now
+    return True
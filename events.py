@@ -0,0 +1,127 @@
+import json
+import threading
+import time
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from config import Config
+from changes import change_log
+from db import verify_credentials
+
+events_bp = Blueprint('events', __name__)
+
+# Tables whose row changes can be subscribed to
+EVENT_TABLES = {
+    'store', 'cluster', 'floorplan', 'planogram', 'product', 'position', 'performance',
+    'cluster_store', 'store_floorplan', 'planogram_product'
+}
+
+# Event ids carry the last version sent for each subscribed table, so a
+# reconnecting EventSource (which sends Last-Event-ID) resumes where it left off
+def format_event_id(versions):
+    return f"{change_log.epoch}." + ".".join(str(version) for version in versions.values())
+
+def parse_event_id(event_id, tables):
+    epoch, _, rest = str(event_id or '').partition('.')
+    parts = rest.split('.') if rest else []
+    if epoch != change_log.epoch or len(parts) != len(tables):
+        return None
+    try:
+        return dict(zip(tables, (int(part) for part in parts)))
+    except ValueError:
+        return None
+
+# Number of open streams, bounded by EVENTS_MAX_STREAMS
+_open_streams = 0
+_open_streams_lock = threading.Lock()
+
+def open_stream():
+    global _open_streams
+    with _open_streams_lock:
+        if _open_streams >= Config.EVENTS_MAX_STREAMS:
+            return False
+        _open_streams += 1
+        return True
+
+def close_stream():
+    global _open_streams
+    with _open_streams_lock:
+        _open_streams -= 1
+
+def format_event(event, data, event_id=None):
+    lines = f"event: {event}\n"
+    if event_id:
+        lines += f"id: {event_id}\n"
+    return lines + f"data: {json.dumps(data)}\n\n"
+
+# Stream change events for the given tables, skipping events that belong to
+# a different parent key. Events without a parent (entity edits) always pass.
+# The stream ends after max_seconds; the client reconnects with Last-Event-ID.
+def stream_changes(tables, parent, versions, max_seconds=None):
+    deadline = time.monotonic() + max_seconds if max_seconds else None
+    yield "retry: 3000\n\n"
+    while True:
+        # Read the sequence first so a change made while sending is not missed
+        sequence = change_log.sequence()
+        for table in tables:
+            events = change_log.since(table, versions[table])
+            if events is None:
+                # The log no longer reaches back far enough; the client must reload
+                versions[table] = change_log.version(table)
+                yield format_event('change', {"table": table, "op": "reset", "key": None, "parent": None}, format_event_id(versions))
+                continue
+            for version, op, key, event_parent in events:
+                versions[table] = version
+                if parent is not None and event_parent is not None and str(event_parent) != parent:
+                    continue
+                yield format_event(
+                    'change',
+                    {"table": table, "op": op, "key": key, "parent": event_parent},
+                    format_event_id(versions)
+                )
+        timeout = Config.EVENTS_KEEPALIVE
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            timeout = min(timeout, remaining)
+        if not change_log.wait(sequence, timeout):
+            # Comment lines keep proxies from closing an idle stream
+            yield ": keep-alive\n\n"
+
+# Route to stream row-level change events to open pages
+@events_bp.route('/events', methods=['GET'])
+def change_events():
+    user = request.cookies.get('snowflake_username')
+    password = request.cookies.get('snowflake_password')
+
+    if not user or not password:
+        return jsonify({"success": False, "message": "Missing credentials"}), 401
+
+    # Events come from memory, so the login is checked when the stream opens
+    if not verify_credentials(user, password):
+        return jsonify({"success": False, "message": "Invalid credentials"}), 401
+
+    tables = list(dict.fromkeys(table for table in (request.args.get('tables') or '').split(',') if table))
+    unknown = [table for table in tables if table not in EVENT_TABLES]
+    if not tables or unknown:
+        return jsonify({"success": False, "message": f"Unknown tables: {', '.join(unknown) or 'none given'}"}), 400
+
+    parent = request.args.get('parent') or None
+    # A client reopening a stream that was refused passes its last id as lastEventId
+    event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    versions = parse_event_id(event_id, tables)
+    if versions is None:
+        versions = {table: change_log.version(table) for table in tables}
+
+    if not open_stream():
+        response = jsonify({"success": False, "message": "Too many open event streams"})
+        response.status_code = 503
+        response.headers['Retry-After'] = '10'
+        return response
+
+    stream = stream_changes(tables, parent, versions, Config.EVENTS_MAX_STREAM_SECONDS)
+    response = Response(stream_with_context(stream), mimetype='text/event-stream')
+    response.call_on_close(close_stream)
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop reverse proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
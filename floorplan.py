@@ -1,20 +1,17 @@
-import snowflake.connector
+import json
 from flask import Blueprint, render_template, request, jsonify
 from config import Config
+from db import connect
+from query_utils import clamp_limit, next_key, typeahead_query, parse_list_args, list_query, list_payload
+from changes import change_log, delta_response, conditional
+from fragment_cache import render_table_body
 
 floorplan_bp = Blueprint('floorplan', __name__)
 
 # Helper function to establish a Snowflake connection
 def get_snowflake_connection(user, password):
     """Establish a connection to Snowflake using provided credentials."""
-    return snowflake.connector.connect(
-        user=user,
-        password=password,
-        account=Config.SNOWFLAKE_ACCOUNT,
-        warehouse=Config.SNOWFLAKE_WAREHOUSE,
-        database=Config.SNOWFLAKE_DATABASE,
-        schema=Config.SNOWFLAKE_SCHEMA
-    )
+    return connect(user, password)
 
 # Helper function to execute a query and fetch results
 def execute_query(user, password, query, params=None, fetchone=False):
@@ -43,14 +40,58 @@ def fetch_floor_plan_by_id(user, password, floor_plan_id):
     """
     return execute_query(user, password, query, (floor_plan_id,), fetchone=True)
 
+# Search floor plans by name or ID for pickers
+def search_floor_plans(user, password, text, limit):
+    """Retrieve floor plans matching a typeahead query, best matches first."""
+    query, params = typeahead_query(
+        "IX_FLR_FLOORPLAN", "DBKEY", "FLOORPLANNAME",
+        ["DBKEY", "FLOORPLANNAME", "DBSTATUS"], text, limit
+    )
+    return execute_query(user, password, query, params)
+
+# Fetch floor plans by a list of IDs
+def fetch_floor_plans_by_ids(user, password, floor_plan_ids):
+    """Retrieve the floor plans with the given IDs."""
+    query = """
+        SELECT DBKEY, FLOORPLANNAME, DBSTATUS
+        FROM IX_FLR_FLOORPLAN
+        WHERE DBKEY IN (SELECT VALUE::INT FROM TABLE(FLATTEN(INPUT => PARSE_JSON(%s))))
+    """
+    return execute_query(user, password, query, (json.dumps([int(floor_plan_id) for floor_plan_id in floor_plan_ids]),))
+
+# Floor plan list columns that can be filtered and sorted, by API name
+FLOOR_PLAN_LIST_COLUMNS = {
+    "floorPlanId": "F.DBKEY",
+    "floorPlanName": "F.FLOORPLANNAME",
+    "dbStatus": "F.DBSTATUS"
+}
+
+# Fetch one filtered, sorted page of floor plans
+def fetch_floor_plan_page(user, password, list_args, store_id=None):
+    """Retrieve a page of floor plans, optionally only those assigned to a store."""
+    from_clause = "IX_FLR_FLOORPLAN F"
+    where, where_params = None, ()
+    if store_id is not None:
+        from_clause += " JOIN IX_STR_STORE_FLOORPLAN SF ON F.DBKEY = SF.DBFLOORPLANPARENTKEY"
+        where, where_params = "SF.DBSTOREPARENTKEY = %s", (store_id,)
+    query, params = list_query(
+        list(FLOOR_PLAN_LIST_COLUMNS.values()), from_clause, FLOOR_PLAN_LIST_COLUMNS, "F.DBKEY",
+        list_args, where, where_params
+    )
+    return execute_query(user, password, query, params)
+
 # Insert a new floor plan
 def insert_floor_plan(user, password, name, status):
-    """Insert a new floor plan into the database."""
+    """Insert a new floor plan into the database and return its ID."""
     query = """
-        INSERT INTO IX_FLR_FLOORPLAN (FLOORPLANNAME, DBSTATUS) 
-        VALUES (%s, %s)
+        INSERT INTO IX_FLR_FLOORPLAN (DBKEY, FLOORPLANNAME, DBSTATUS) 
+        VALUES (%s, %s, %s)
     """
-    execute_query(user, password, query, (name, status))
+    with get_snowflake_connection(user, password) as conn:
+        with conn.cursor() as cursor:
+            floor_plan_id = next_key(cursor, "IX_FLR_FLOORPLAN")
+            cursor.execute(query, (floor_plan_id, name, status))
+            return floor_plan_id
     # Commit is handled by the context manager
 
 # Update an existing floor plan
@@ -75,6 +116,7 @@ def delete_floor_plan(user, password, floor_plan_id):
 
 # Route to display all floor plans
 @floorplan_bp.route('/dsfloorplan')
+@conditional('floorplan')
 def dsfloorplan():
     """Display all floor plans."""
     user = request.cookies.get('snowflake_username')
@@ -84,13 +126,65 @@ def dsfloorplan():
         return "Error: Missing credentials", 401
 
     try:
-        floor_plans = fetch_floor_plans(user, password)
-        return render_template('dsfloorplan.html', floor_plans=floor_plans)
+        version = change_log.token('floorplan')
+        # Only the first page is rendered; the table loads the rest as it scrolls
+        list_args = parse_list_args({}, FLOOR_PLAN_LIST_COLUMNS, Config.LIST_PAGE_SIZE, Config.LIST_MAX_PAGE_SIZE)
+        table_body, total = render_table_body(
+            'floorplan', version, user, password, list_args, 'dsfloorplan.html', 'floor_plans',
+            lambda: fetch_floor_plan_page(user, password, list_args)
+        )
+        return render_template(
+            'dsfloorplan.html', table_body=table_body, total=total,
+            page_size=list_args.limit, version=version
+        )
     except Exception as e:
         return f"Error: {str(e)}", 500
 
+# Route to get floor plans changed since a version token
+@floorplan_bp.route('/dsfloorplan/data', methods=['GET'])
+def dsfloorplan_data():
+    """Return floor plan rows changed since the client's version token."""
+    user = request.cookies.get('snowflake_username')
+    password = request.cookies.get('snowflake_password')
+
+    if not user or not password:
+        return jsonify({"success": False, "message": "Missing credentials"}), 401
+
+    try:
+        return delta_response(
+            'floorplan',
+            lambda: fetch_floor_plans(user, password),
+            lambda floor_plan_ids: fetch_floor_plans_by_ids(user, password, floor_plan_ids)
+        )
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+# Route to get one filtered, sorted page of floor plans
+@floorplan_bp.route('/dsfloorplan/list', methods=['GET'])
+@conditional('floorplan')
+def dsfloorplan_list():
+    """Return floor plans matching the filter, sort and paging arguments."""
+    user = request.cookies.get('snowflake_username')
+    password = request.cookies.get('snowflake_password')
+
+    if not user or not password:
+        return jsonify({"success": False, "message": "Missing credentials"}), 401
+
+    try:
+        list_args = parse_list_args(request.args, FLOOR_PLAN_LIST_COLUMNS, Config.LIST_PAGE_SIZE, Config.LIST_MAX_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    try:
+        version = change_log.token('floorplan')
+        floor_plans = fetch_floor_plan_page(user, password, list_args)
+        return jsonify({"success": True, "version": version, **list_payload(floor_plans, list_args)})
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
 # Route to get a floor plan by ID
 @floorplan_bp.route('/get_floor_plan', methods=['GET'])
+@conditional('floorplan')
 def get_floor_plan():
     """Get a specific floor plan by its ID."""
     user = request.cookies.get('snowflake_username')
@@ -119,6 +213,34 @@ def get_floor_plan():
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
+# Route to search floor plans for typeahead pickers
+@floorplan_bp.route('/floorplans/typeahead', methods=['GET'])
+@conditional('floorplan')
+def floor_plans_typeahead():
+    """Return floor plans matching a typeahead query."""
+    user = request.cookies.get('snowflake_username')
+    password = request.cookies.get('snowflake_password')
+
+    if not user or not password:
+        return jsonify({"success": False, "message": "Missing credentials"}), 401
+
+    try:
+        limit = clamp_limit(request.args.get('limit'))
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    try:
+        floor_plans = search_floor_plans(user, password, request.args.get('q', ''), limit)
+        return jsonify({
+            "success": True,
+            "results": [
+                {"id": floor_plan[0], "label": floor_plan[1], "dbStatus": floor_plan[2]}
+                for floor_plan in floor_plans
+            ]
+        })
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
 # Route to add a new floor plan
 @floorplan_bp.route('/dsfloorplan/add', methods=['POST'])
 def add_floor_plan():
@@ -137,7 +259,8 @@ def add_floor_plan():
         return jsonify({"success": False, "message": "All fields are required"}), 400
 
     try:
-        insert_floor_plan(user, password, name, status)
+        floor_plan_id = insert_floor_plan(user, password, name, status)
+        change_log.record('floorplan', 'insert', floor_plan_id)
         return jsonify({"success": True}), 200
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
@@ -162,6 +285,7 @@ def update_floor_plan_route():
 
     try:
         update_floor_plan(user, password, floor_plan_id, name, status)
+        change_log.record('floorplan', 'update', floor_plan_id)
         return jsonify({"success": True}), 200
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
@@ -184,12 +308,14 @@ def delete_floor_plan_route():
 
     try:
         delete_floor_plan(user, password, floor_plan_id)
+        change_log.record('floorplan', 'delete', floor_plan_id)
         return jsonify({"success": True}), 200
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
 # Route to display floor plans for a store
 @floorplan_bp.route('/stfloorplan')
+@conditional('floorplan', 'store', 'store_floorplan')
 def stfloorplan():
     """Display floor plans associated with a specific store."""
     user = request.cookies.get('snowflake_username')
@@ -203,27 +329,43 @@ def stfloorplan():
         return "Error: Store ID is required", 400
 
     try:
-        # Fetch floor plans associated with the store
-        query_store_floor_plans = """
-            SELECT F.DBKEY, F.FLOORPLANNAME, F.DBSTATUS
-            FROM IX_FLR_FLOORPLAN F
-            JOIN IX_STR_STORE_FLOORPLAN SF
-            ON F.DBKEY = SF.DBFLOORPLANPARENTKEY
-            WHERE SF.DBSTOREPARENTKEY = %s
-        """
-        # Fetch all floor plans
-        query_all_floor_plans = "SELECT DBKEY, FLOORPLANNAME, DBSTATUS FROM IX_FLR_FLOORPLAN"
+        # Fetch the first page of floor plans associated with the store; the table loads
+        # the rest as it scrolls and the floor plan picker loads its choices on demand
+        list_args = parse_list_args({}, FLOOR_PLAN_LIST_COLUMNS, Config.LIST_PAGE_SIZE, Config.LIST_MAX_PAGE_SIZE)
+        first_page = list_payload(fetch_floor_plan_page(user, password, list_args, store_id), list_args)
+
+        return render_template(
+            'stfloorplan.html', floorplans=first_page["rows"], total=first_page["total"],
+            page_size=list_args.limit, store_id=store_id
+        )
+    except Exception as e:
+        return f"Error: {str(e)}", 500
 
-        with get_snowflake_connection(user, password) as conn:
-            with conn.cursor() as cursor:
-                cursor.execute(query_store_floor_plans, (store_id,))
-                floorplans = cursor.fetchall()
-                cursor.execute(query_all_floor_plans)
-                all_floorplans = cursor.fetchall()
+# Route to get one filtered, sorted page of the floor plans in a store
+@floorplan_bp.route('/stfloorplan/list', methods=['GET'])
+@conditional('floorplan', 'store', 'store_floorplan')
+def stfloorplan_list():
+    """Return a store's floor plans matching the filter, sort and paging arguments."""
+    user = request.cookies.get('snowflake_username')
+    password = request.cookies.get('snowflake_password')
 
-        return render_template('stfloorplan.html', floorplans=floorplans, all_floorplans=all_floorplans, store_id=store_id)
+    if not user or not password:
+        return jsonify({"success": False, "message": "Missing credentials"}), 401
+
+    store_id = request.args.get('storeId')
+    if not store_id:
+        return jsonify({"success": False, "message": "Store ID is required"}), 400
+
+    try:
+        list_args = parse_list_args(request.args, FLOOR_PLAN_LIST_COLUMNS, Config.LIST_PAGE_SIZE, Config.LIST_MAX_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    try:
+        floor_plans = fetch_floor_plan_page(user, password, list_args, store_id)
+        return jsonify({"success": True, **list_payload(floor_plans, list_args)})
     except Exception as e:
-        return f"Error: {str(e)}", 500
+        return jsonify({"success": False, "message": str(e)}), 500
 
 # Route to add a floor plan to a store
 @floorplan_bp.route('/stfloorplan/add_floorplan', methods=['POST'])
@@ -260,6 +402,7 @@ def add_floorplan_to_store():
                     return jsonify({'message': 'Floorplan already associated with this store.'}), 400
 
                 cursor.execute(query_insert, (store_id, floorplan_id))
+        change_log.record('store_floorplan', 'insert', floorplan_id, store_id)
         return jsonify({'message': 'Floorplan added successfully.'}), 200
     except Exception as e:
         return jsonify({'message': str(e)}), 500
@@ -292,6 +435,7 @@ def remove_floorplan_from_store():
                 cursor.execute(query_delete, (store_id, floorplan_id))
                 if cursor.rowcount == 0:
                     return jsonify({"success": False, "message": "No matching record found to delete."}), 404
+        change_log.record('store_floorplan', 'delete', floorplan_id, store_id)
         return jsonify({"success": True, "message": "Floorplan removed successfully."}), 200
     except Exception as e:
         return jsonify({"success": False, "message": "Failed to remove floorplan from store."}), 500
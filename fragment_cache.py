@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import Blueprint, render_template, request, jsonify
+from markupsafe import Markup
+from config import Config
+from query_utils import list_payload
+from changes import credentials_digest
+
+fragment_cache_bp = Blueprint('fragment_cache', __name__)
+
+class FragmentCache:
+    """
+    Size-bounded LRU cache of rendered HTML fragments.
+
+    Keys include the table's change version, so a write through this app
+    makes older renderings unreachable and they age out of the LRU. Entries
+    also expire after ttl seconds to pick up writes made outside the app.
+    """
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached (html, meta) for key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[2] > self.ttl:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, key, html, meta=None):
+        size = len(html)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (html, meta, time.monotonic())
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        html = self._entries.pop(key)[0]
+        self._bytes -= len(html)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "maxBytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hitRate": self.hits / lookups if lookups else 0.0
+            }
+
+# Shared fragment cache for all blueprints
+fragment_cache = FragmentCache(Config.FRAGMENT_CACHE_BYTES, Config.FRAGMENT_CACHE_TTL)
+
+# Render one page of a list table's rows with the rows/<template> partial,
+# reusing the cached rendering while the table version is unchanged.
+# The key includes a digest of the credentials: Snowflake roles may show users
+# different rows, and a hit must not skip the login check the query performs.
+# fetch_page() returns list query rows; returns (html, total).
+def render_table_body(entity, version, user, password, list_args, template, rows_name, fetch_page):
+    key = (entity, version, credentials_digest(user, password), list_args.cursor())
+    cached = fragment_cache.get(key)
+    if cached is not None:
+        return cached
+
+    page = list_payload(fetch_page(), list_args)
+    html = Markup(render_template(f"rows/{template}", **{rows_name: page["rows"]}))
+    fragment_cache.put(key, html, page["total"])
+    return html, page["total"]
+
+# Route to get fragment cache statistics
+@fragment_cache_bp.route('/fragment_cache/stats', methods=['GET'])
+def fragment_cache_stats():
+    # db imports this module (through metrics), so import it here
+    from db import verify_credentials
+
+    user = request.cookies.get('snowflake_username')
+    password = request.cookies.get('snowflake_password')
+
+    if not user or not password:
+        return jsonify({"success": False, "message": "Missing credentials"}), 401
+
+    # The stats come from memory, so the login is checked on its own
+    if not verify_credentials(user, password):
+        return jsonify({"success": False, "message": "Invalid credentials"}), 401
+
+    return jsonify({"success": True, **fragment_cache.stats()})
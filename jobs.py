@@ -0,0 +1,309 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from flask import Blueprint, request, jsonify
+from config import Config
+from db import LoginFailed, verify_credentials
+
+jobs_bp = Blueprint('jobs', __name__)
+
+# Registered task functions by job kind
+_tasks = {}
+
+# Decorator registering a function as a background job kind.
+# The function is called as task(job, user, password, **params).
+def job_task(kind):
+    def decorator(func):
+        _tasks[kind] = func
+        return func
+    return decorator
+
+class PermanentJobError(Exception):
+    """Raised by a task for failures that retrying cannot fix."""
+
+class Job:
+    """Handle passed to a running task for reporting progress."""
+
+    def __init__(self, queue, job_id):
+        self.queue = queue
+        self.id = job_id
+
+    def progress(self, done, total=None, message=None):
+        self.queue.update(self.id, progress_done=done, progress_total=total, message=message)
+
+class JobQueue:
+    """
+    In-process background job queue backed by a local SQLite table.
+
+    Job state (status, progress, results, errors) survives restarts, but
+    credentials are only kept in memory, so a job can only run in the
+    process that queued it. Several processes may share the file: each
+    holds a lease on its own queued and running jobs and renews it while
+    alive. Jobs whose lease has expired belonged to a process that stopped;
+    they are marked failed rather than re-run without credentials.
+    """
+
+    def __init__(self, path, workers, max_attempts, retry_delay, lease_seconds=60):
+        self.path = path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lease_seconds = lease_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._credentials = {}
+        self._db = None
+        self._started = False
+
+    def _connect(self):
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.row_factory = sqlite3.Row
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    owner TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    progress_done INTEGER,
+                    progress_total INTEGER,
+                    message TEXT,
+                    created_at REAL NOT NULL,
+                    run_after REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    worker TEXT,
+                    lease_until REAL
+                )
+            """)
+            # Files created before leases existed lack the lease columns
+            columns = {row["name"] for row in self._db.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (('worker', 'TEXT'), ('lease_until', 'REAL')):
+                if column not in columns:
+                    self._db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            self._db.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, run_after)")
+            self._db.commit()
+        return self._db
+
+    def start(self):
+        """Fail jobs whose worker has stopped and start the workers and the lease heartbeat."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self.expire_leases()
+        for index in range(self.workers):
+            threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True).start()
+        threading.Thread(target=self._heartbeat, name="job-lease-heartbeat", daemon=True).start()
+
+    def renew_leases(self):
+        """Extend the lease on every unfinished job this process holds."""
+        with self._lock:
+            db = self._connect()
+            db.execute(
+                "UPDATE jobs SET lease_until = ? WHERE worker = ? AND status IN ('queued', 'running')",
+                (time.time() + self.lease_seconds, self.worker_id)
+            )
+            db.commit()
+
+    def expire_leases(self):
+        """Mark failed the unfinished jobs whose worker stopped renewing its lease."""
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            db.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? "
+                "WHERE status IN ('queued', 'running') AND (lease_until IS NULL OR lease_until < ?)",
+                ("Interrupted: the process running this job stopped", now, now)
+            )
+            db.commit()
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            try:
+                self.renew_leases()
+                self.expire_leases()
+            except sqlite3.Error:
+                # A busy file is retried on the next beat, well within the lease
+                continue
+
+    def submit(self, kind, user, password, **params):
+        """Queue a job and return its id."""
+        if kind not in _tasks:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._credentials[job_id] = (user, password)
+            db = self._connect()
+            db.execute(
+                "INSERT INTO jobs (id, kind, owner, status, params, max_attempts, created_at, run_after, worker, lease_until) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, user, json.dumps(params), self.max_attempts, now, now, self.worker_id, now + self.lease_seconds)
+            )
+            db.commit()
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            db = self._connect()
+            db.execute(
+                f"UPDATE jobs SET {', '.join(f'{name} = ?' for name in fields)} WHERE id = ?",
+                (*fields.values(), job_id)
+            )
+            db.commit()
+
+    def get(self, job_id, owner):
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT * FROM jobs WHERE id = ? AND owner = ?", (job_id, owner)
+            ).fetchone()
+        return job_payload(row) if row else None
+
+    def list(self, owner, limit=50):
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT * FROM jobs WHERE owner = ? ORDER BY created_at DESC LIMIT ?", (owner, limit)
+            ).fetchall()
+        return [job_payload(row) for row in rows]
+
+    def counts(self):
+        """Number of jobs in each status."""
+        with self._lock:
+            rows = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    # Claim this process's oldest runnable job, or return how long to wait for one
+    def _claim(self):
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            row = db.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' AND worker = ? ORDER BY run_after, created_at LIMIT 1",
+                (self.worker_id,)
+            ).fetchone()
+            if row is None:
+                return None, None
+            if row["run_after"] > now:
+                return None, row["run_after"] - now
+            db.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ? WHERE id = ?",
+                (now, row["id"])
+            )
+            db.commit()
+            return row, None
+
+    def _work(self):
+        while True:
+            row, wait = self._claim()
+            if row is None:
+                with self._wakeup:
+                    self._wakeup.wait(wait if wait is not None else 5)
+                continue
+            self._run(row)
+
+    def _run(self, row):
+        job_id = row["id"]
+        credentials = self._credentials.get(job_id)
+        if credentials is None:
+            self._finish(job_id, 'failed', error="Credentials are no longer available")
+            return
+        try:
+            result = _tasks[row["kind"]](Job(self, job_id), *credentials, **json.loads(row["params"]))
+        except (PermanentJobError, LoginFailed) as e:
+            # Retrying cannot fix a bad request or rejected credentials
+            self._finish(job_id, 'failed', error=str(e))
+        except Exception as e:
+            attempts = row["attempts"] + 1
+            if attempts >= row["max_attempts"]:
+                self._finish(job_id, 'failed', error=str(e))
+            else:
+                # Back off exponentially before the next attempt
+                self.update(
+                    job_id, status='queued', error=traceback.format_exception_only(type(e), e)[-1].strip(),
+                    run_after=time.time() + self.retry_delay * 2 ** (attempts - 1)
+                )
+        else:
+            self._finish(job_id, 'succeeded', result=json.dumps(result))
+
+    def _finish(self, job_id, status, result=None, error=None):
+        self.update(job_id, status=status, result=result, error=error, finished_at=time.time())
+        with self._lock:
+            self._credentials.pop(job_id, None)
+
+# Convert a job row to its JSON form
+def job_payload(row):
+    return {
+        "id": row["id"],
+        "kind": row["kind"],
+        "status": row["status"],
+        "attempts": row["attempts"],
+        "maxAttempts": row["max_attempts"],
+        "progress": {"done": row["progress_done"], "total": row["progress_total"], "message": row["message"]},
+        "result": json.loads(row["result"]) if row["result"] else None,
+        "error": row["error"],
+        "createdAt": row["created_at"],
+        "startedAt": row["started_at"],
+        "finishedAt": row["finished_at"]
+    }
+
+# Shared job queue for all blueprints
+job_queue = JobQueue(Config.JOB_DB_PATH, Config.JOB_WORKERS, Config.JOB_MAX_ATTEMPTS, Config.JOB_RETRY_DELAY,
+                     Config.JOB_LEASE_SECONDS)
+
+def init_jobs(app):
+    """Register the job status routes and start the workers."""
+    app.register_blueprint(jobs_bp)
+    job_queue.start()
+
+# Route to list the caller's recent jobs
+@jobs_bp.route('/jobs', methods=['GET'])
+def list_jobs():
+    user = request.cookies.get('snowflake_username')
+    password = request.cookies.get('snowflake_password')
+
+    if not user or not password:
+        return jsonify({"success": False, "message": "Missing credentials"}), 401
+
+    # Jobs are keyed by user name, so the password is checked before listing them
+    if not verify_credentials(user, password):
+        return jsonify({"success": False, "message": "Invalid credentials"}), 401
+
+    return jsonify({"success": True, "jobs": job_queue.list(user)})
+
+# Route to get the status of one job
+@jobs_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    user = request.cookies.get('snowflake_username')
+    password = request.cookies.get('snowflake_password')
+
+    if not user or not password:
+        return jsonify({"success": False, "message": "Missing credentials"}), 401
+
+    if not verify_credentials(user, password):
+        return jsonify({"success": False, "message": "Invalid credentials"}), 401
+
+    # Other users' jobs are reported as missing
+    job = job_queue.get(job_id, user)
+    if job is None:
+        return jsonify({"success": False, "message": "Job not found"}), 404
+
+    return jsonify({"success": True, "job": job})
@@ -0,0 +1,284 @@
+"""
+Load test one app instance with concurrent virtual planners.
+
+Starts serve.py's server in a subprocess against a seeded local stand-in
+database (localdb.py) whose connections sleep like a remote warehouse,
+then runs N virtual users through planner sessions: log in, browse
+stores, open a store's floorplans, open a floorplan's planograms, view a
+PDF and edit positions. Each user keeps its own cookies and revalidates
+pages with If-None-Match the way a browser does.
+
+Reports throughput and p50/p95/p99 latency and error rate per step.
+
+    python load_test.py --users 50 --duration 60 --latency-ms 80 --output load.json
+    python load_test.py --users 200 --mode threaded --error-rate 0.01
+
+Raise --users until p95 or the error rate passes what planners will put
+up with; that is the instance's capacity for this warehouse latency.
+
+The stand-in replaces db.Connection, so statements run through localdb's
+cursor rather than AsyncSubmitCursor. They still take admission slots and
+are timed, counted and slow-logged by the same db.execute_statement hook.
+What is not exercised is the Snowflake connector itself: execute_async
+submission, status polling, and cancelling a query when its budget runs
+out or its client disconnects. A budget that runs out here fails the next
+statement instead of cancelling the running one.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] if ordered else None
+
+class VirtualUser:
+    """One planner with its own cookie jar and ETag cache."""
+
+    def __init__(self, base_url, name, plan, rng, record):
+        self.base_url = base_url
+        self.name = name
+        self.plan = plan
+        self.rng = rng
+        self.record = record
+        self.etags = {}
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+        )
+
+    def request(self, step, path, method='GET', json_body=None, form=None):
+        url = self.base_url + path
+        headers = {'Accept-Encoding': 'gzip'}
+        data = None
+        if json_body is not None:
+            data = json.dumps(json_body).encode()
+            headers['Content-Type'] = 'application/json'
+        elif form is not None:
+            data = urllib.parse.urlencode(form).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if method == 'GET' and url in self.etags:
+            headers['If-None-Match'] = self.etags[url]
+
+        started = time.perf_counter()
+        try:
+            with self.opener.open(urllib.request.Request(url, data, headers, method=method), timeout=120) as response:
+                response.read()
+                status = response.status
+                if response.headers.get('ETag'):
+                    self.etags[url] = response.headers['ETag']
+        except urllib.error.HTTPError as e:
+            e.read()
+            status = e.code
+        except (urllib.error.URLError, OSError):
+            status = None
+        ok = status is not None and (status < 400 or status == 304)
+        self.record(step, time.perf_counter() - started, status, ok)
+        return ok
+
+    def think(self, mean):
+        if mean > 0:
+            time.sleep(self.rng.expovariate(1 / mean))
+
+    def session(self, think):
+        """One planner workflow, start to finish."""
+        pick = lambda count: self.rng.randint(1, count)
+        store = pick(self.plan["stores"])
+        floorplan = pick(self.plan["floorplans"])
+
+        self.request('login', '/login', 'POST', form={'username': self.name, 'password': 'load'})
+        self.think(think)
+        self.request('dsstore page', '/dsstore')
+        self.request('dsstore list', '/dsstore/list?limit=200')
+        self.think(think)
+        self.request('stores typeahead', '/stores/typeahead?' + urllib.parse.urlencode({'q': f'Store {store}'}))
+        self.think(think)
+        self.request('stfloorplan page', f'/stfloorplan?storeId={store}')
+        self.request('stfloorplan list', f'/stfloorplan/list?storeId={store}')
+        self.think(think)
+        self.request('flplanogram page', f'/flplanogram?floorplanId={floorplan}')
+        self.request('flplanogram list', f'/flplanogram/list?floorplanId={floorplan}')
+        self.think(think)
+        self.request('view pdf', f'/flplanogram/view_pdf/{pick(self.plan["pdfs"])}')
+        self.think(think)
+        self.request('dsposition page', '/dsposition')
+        for _ in range(self.rng.randint(1, 3)):
+            position = pick(self.plan["positions"])
+            self.request('get_position', f'/get_position?positionId={position}')
+            self.think(think)
+            self.request('dsposition update', '/dsposition/update_position', 'POST', json_body={
+                "positionId": position,
+                "dbProductParentKey": pick(self.plan["products"]),
+                "dbPlanogramParentKey": pick(self.plan["planograms"]),
+                "dbFixtureParentKey": self.rng.randint(1, 12),
+                "hFacing": self.rng.randint(1, 6),
+                "vFacing": self.rng.randint(1, 4),
+                "dFacing": self.rng.randint(1, 4)
+            })
+        self.request('dsposition list', f'/dsposition/list?limit=200&offset={self.rng.randrange(0, self.plan["positions"], 200)}')
+
+class Recorder:
+    """Thread-safe per-step latency and status counts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.steps = {}
+        self.sessions = 0
+
+    def __call__(self, step, elapsed, status, ok):
+        with self._lock:
+            entry = self.steps.setdefault(step, {"latencies": [], "errors": 0, "statuses": {}})
+            entry["latencies"].append(elapsed)
+            entry["statuses"][str(status)] = entry["statuses"].get(str(status), 0) + 1
+            if not ok:
+                entry["errors"] += 1
+
+    def session_done(self):
+        with self._lock:
+            self.sessions += 1
+
+    def report(self, seconds):
+        steps = {}
+        total = errors = 0
+        for step, entry in self.steps.items():
+            latencies = entry["latencies"]
+            total += len(latencies)
+            errors += entry["errors"]
+            steps[step] = {
+                "requests": len(latencies),
+                "throughput": round(len(latencies) / seconds, 2),
+                "p50Ms": round(percentile(latencies, 0.50) * 1000, 1),
+                "p95Ms": round(percentile(latencies, 0.95) * 1000, 1),
+                "p99Ms": round(percentile(latencies, 0.99) * 1000, 1),
+                "errorRate": round(entry["errors"] / len(latencies), 4),
+                "statuses": entry["statuses"]
+            }
+        return {
+            "seconds": round(seconds, 1),
+            "sessions": self.sessions,
+            "requests": total,
+            "throughput": round(total / seconds, 1),
+            "errorRate": round(errors / total, 4) if total else None,
+            "steps": steps
+        }
+
+def wait_until_up(base_url, server, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit("Server exited during startup (rerun with --verbose for its log)")
+        try:
+            urllib.request.urlopen(base_url + '/', timeout=1).read()
+            return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    raise SystemExit(f"Server at {base_url} did not start")
+
+# Run the app against the fake warehouse (the subprocess side of the test)
+def serve(args):
+    def prepare():
+        import db
+        import localdb
+        from config import Config
+        Config.JOB_DB_PATH = os.path.join(os.path.dirname(args.db), 'jobs.sqlite3')
+        localdb.LocalDatabase(
+            args.db, localdb.FakeWarehouseConnection,
+            latency=args.latency_ms / 1000, connect_latency=args.connect_latency_ms / 1000,
+            error_rate=args.error_rate
+        ).install(db)
+
+    import serve as server
+    server.run(args.mode, '127.0.0.1', args.port, args.concurrency, prepare)
+
+def run(args):
+    import localdb
+    os.makedirs(args.db_dir, exist_ok=True)
+    db_path = os.path.join(args.db_dir, f"load_{args.scale}.sqlite3")
+    plan = localdb.ensure_seeded(db_path, args.scale)
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), 'serve', '--db', db_path, '--port', str(port),
+         '--mode', args.mode, '--concurrency', str(args.concurrency),
+         '--latency-ms', str(args.latency_ms), '--connect-latency-ms', str(args.connect_latency_ms),
+         '--error-rate', str(args.error_rate)],
+        stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL
+    )
+    try:
+        wait_until_up(base_url, server)
+        recorder = Recorder()
+        deadline = time.monotonic() + args.duration
+
+        def user_loop(index):
+            # Stagger arrivals over the ramp-up so users do not start in lockstep
+            time.sleep(args.ramp_up * index / max(args.users, 1))
+            user = VirtualUser(base_url, f"planner{index}", plan, random.Random(index), recorder)
+            while time.monotonic() < deadline:
+                user.session(args.think_ms / 1000)
+                recorder.session_done()
+
+        print(f"{args.users} users, {args.duration}s, warehouse latency {args.latency_ms}ms, {args.mode} server", flush=True)
+        started = time.perf_counter()
+        threads = [threading.Thread(target=user_loop, args=(index,), daemon=True) for index in range(args.users)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        report = recorder.report(time.perf_counter() - started)
+    finally:
+        server.terminate()
+        server.wait()
+
+    for step, summary in report["steps"].items():
+        print(f"  {step:<18} {summary['requests']:>6} req  p50 {summary['p50Ms']:>8.1f} ms  p95 {summary['p95Ms']:>8.1f} ms  "
+              f"p99 {summary['p99Ms']:>8.1f} ms  errors {summary['errorRate']:.2%}")
+    print(f"  {report['sessions']} sessions, {report['throughput']} req/s, error rate {report['errorRate']:.2%}")
+
+    if args.output:
+        settings = {key: value for key, value in vars(args).items() if key not in ('command', 'output')}
+        with open(args.output, 'w') as f:
+            json.dump({"settings": settings, "plan": plan, "results": report}, f, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the app with concurrent virtual planners")
+    parser.add_argument('command', nargs='?', choices=('run', 'serve'), default='run')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=30, help="seconds to keep starting sessions")
+    parser.add_argument('--ramp-up', type=float, default=5, help="seconds over which users arrive")
+    parser.add_argument('--think-ms', type=float, default=500, help="mean pause between a user's steps")
+    parser.add_argument('--scale', type=int, default=100000, help="position/performance rows to seed")
+    parser.add_argument('--latency-ms', type=float, default=50, help="median warehouse statement latency")
+    parser.add_argument('--connect-latency-ms', type=float, default=200, help="median warehouse login latency")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of statements that fail")
+    parser.add_argument('--mode', choices=('gevent', 'threaded'), default='gevent')
+    parser.add_argument('--concurrency', type=int, default=1000, help="gevent server request limit")
+    parser.add_argument('--db-dir', default=os.path.join(tempfile.gettempdir(), 'planogram-bench'))
+    parser.add_argument('--verbose', action='store_true', help="show the server's log")
+    parser.add_argument('--output', help="write results as JSON to this file")
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        serve(args)
+    else:
+        run(args)
+
+if __name__ == '__main__':
+    main()
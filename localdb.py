@@ -0,0 +1,329 @@
+"""
+Local stand-in for the Snowflake database, for benchmarks and load tests.
+
+Builds the ckbbuild.txt schema in a SQLite file, seeds it at a given scale
+and serves connections that accept the app's Snowflake SQL. The handful of
+Snowflake-only constructs the blueprints use (FLATTEN over PARSE_JSON,
+::INT casts, ILIKE, TO_VARCHAR, the NEWCKB.PUBLIC prefix, pyformat
+parameters, <table>_SEQ.NEXTVAL) are rewritten to their SQLite equivalents.
+
+Like the warehouse, the stand-in has no secondary indexes: lookups by
+parent key scan, so pagination and caching changes show up at scale.
+"""
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from functools import lru_cache
+from db import LoginFailed, execute_statement
+from timing import phase
+from metrics import connections_open, query_rows
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ckbbuild.txt')
+
+# Snowflake SQL -> SQLite rewrites, applied in order
+REWRITES = [
+    (re.compile(r'NEWCKB\.PUBLIC\.', re.I), ''),
+    (re.compile(r'TABLE\s*\(\s*FLATTEN\s*\(\s*INPUT\s*=>\s*PARSE_JSON\s*\(\s*%s\s*\)\s*\)\s*\)', re.I), 'json_each(%s)'),
+    (re.compile(r'([\w.]+)::INT\b', re.I), r'CAST(\1 AS INTEGER)'),
+    (re.compile(r'([\w.]+)::STRING\b', re.I), r'CAST(\1 AS TEXT)'),
+    (re.compile(r'TO_VARCHAR\(([^()]*)\)', re.I), r'CAST(\1 AS TEXT)'),
+    (re.compile(r'\bILIKE\b', re.I), 'LIKE'),
+    (re.compile(r"ESCAPE '\\\\'"), lambda match: "ESCAPE '\\'"),
+    (re.compile(r'\bIFF\(', re.I), 'IIF('),
+    (re.compile(r'\b(\w+)_SEQ\.NEXTVAL\b', re.I), r"nextval('\1')"),
+]
+
+@lru_cache(maxsize=1024)
+def translate(query, has_params):
+    """Rewrite one Snowflake statement for SQLite."""
+    for pattern, replacement in REWRITES:
+        query = pattern.sub(replacement, query)
+    if has_params:
+        query = query.replace('%s', '?').replace('%%', '%')
+    return query
+
+# CREATE TABLE statements from ckbbuild.txt, rewritten for SQLite
+def schema_statements(path=SCHEMA_FILE):
+    with open(path) as f:
+        text = f.read()
+    statements = []
+    for statement in re.findall(r'^CREATE\s+(?:OR\s+REPLACE\s+)?TABLE\b.*?\);', text, re.S | re.M):
+        statement = re.sub(r'CREATE\s+(?:OR\s+REPLACE\s+)?TABLE(?:\s+IF\s+NOT\s+EXISTS)?',
+                           'CREATE TABLE IF NOT EXISTS', statement, flags=re.I)
+        statement = re.sub(r'INT\s+AUTOINCREMENT\s+PRIMARY\s+KEY', 'INTEGER PRIMARY KEY AUTOINCREMENT', statement, flags=re.I)
+        statement = re.sub(r'\bBINARY\b', 'BLOB', statement, flags=re.I)
+        statements.append(statement)
+    return statements
+
+class LocalCursor:
+    """DB-API cursor over sqlite3 that accepts the app's Snowflake SQL."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._cursor = connection._db.cursor()
+        self.sfqid = None
+        self.fingerprint = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Admission, timing, metrics and the slow query log go through db.py's
+    # shared hook, as for AsyncSubmitCursor; only the statement differs
+    def execute(self, command, params=None):
+        self.sfqid = None
+        return execute_statement(
+            self, command, params,
+            lambda parameters: self._run(command, params),
+            lambda: self._explain(command, params)
+        )
+
+    def _run(self, command, params):
+        self.connection.before_execute(command)
+        if params is None:
+            self._cursor.execute(translate(command, False))
+        else:
+            self._cursor.execute(translate(command, True), tuple(params))
+        self.sfqid = uuid.uuid4().hex
+        return self.sfqid
+
+    def _explain(self, command, params):
+        query = "EXPLAIN QUERY PLAN " + translate(command, params is not None)
+        rows = self.connection._db.execute(query, () if params is None else tuple(params)).fetchall()
+        return '\n'.join(row[-1] for row in rows)
+
+    def fetchone(self):
+        with phase('fetch'):
+            row = self._cursor.fetchone()
+        query_rows.inc(self.fingerprint, amount=0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        with phase('fetch'):
+            rows = self._cursor.fetchmany(size or self._cursor.arraysize)
+        query_rows.inc(self.fingerprint, amount=len(rows))
+        return rows
+
+    def fetchall(self):
+        with phase('fetch'):
+            rows = self._cursor.fetchall()
+        query_rows.inc(self.fingerprint, amount=len(rows))
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+class LocalConnection:
+    """Connection to the stand-in database, shaped like db.Connection."""
+
+    def __init__(self, path, user, sequences=None, **kwargs):
+        self.user = user
+        self.warehouse = kwargs.get('warehouse')
+        self.closed = False
+        # Autocommit, like a Snowflake session: commit() only ends explicit transactions
+        with phase('connect'):
+            self._db = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        if sequences is not None:
+            self._db.create_function('nextval', 1, sequences.next_value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Hook for subclasses that add latency or failures before each statement
+    def before_execute(self, command):
+        pass
+
+    def cursor(self):
+        return LocalCursor(self)
+
+    def commit(self):
+        if self._db.in_transaction:
+            self._db.execute("COMMIT")
+
+    def rollback(self):
+        if self._db.in_transaction:
+            self._db.execute("ROLLBACK")
+
+    # db.connect counted this connection as open
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            connections_open.dec()
+        self._db.close()
+
+class WarehouseError(sqlite3.OperationalError):
+    """Failure injected by FakeWarehouseConnection."""
+
+class FakeWarehouseConnection(LocalConnection):
+    """
+    Stand-in connection that behaves like a remote warehouse: each login
+    and statement waits a log-normally distributed delay around latency
+    seconds, and a fraction error_rate of statements fail. The waits go
+    through time.sleep, so they yield under gevent like real queries do.
+    """
+
+    def __init__(self, path, user, latency=0.05, connect_latency=0.2, spread=0.5, error_rate=0.0, **kwargs):
+        self.latency = latency
+        self.spread = spread
+        self.error_rate = error_rate
+        with phase('connect'):
+            time.sleep(self._delay(connect_latency))
+        super().__init__(path, user, **kwargs)
+
+    def _delay(self, median):
+        return median * random.lognormvariate(0, self.spread) if median > 0 else 0
+
+    def before_execute(self, command):
+        with phase('execute'):
+            time.sleep(self._delay(self.latency))
+        if self.error_rate and random.random() < self.error_rate:
+            raise WarehouseError("Injected warehouse failure")
+
+# A seeded stand-in database. install() makes every blueprint's
+# get_snowflake_connection open a connection_class(**options) to it instead.
+# users, if given, maps user names to passwords and other logins are rejected.
+class LocalDatabase:
+    def __init__(self, path, connection_class=LocalConnection, users=None, **options):
+        self.path = path
+        self.connection_class = connection_class
+        self.users = users
+        self.options = options
+        # Held open so closing the last request connection does not checkpoint the WAL
+        self._anchor = sqlite3.connect(path, check_same_thread=False)
+        self._anchor.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        self._sequences = {}
+        self._sequences_lock = threading.Lock()
+
+    def connect(self, user=None, password=None, **kwargs):
+        if self.users is not None and (user not in self.users or self.users[user] != password):
+            raise LoginFailed(f"Incorrect username or password was specified for {user}")
+        return self.connection_class(self.path, user, sequences=self, **self.options, **kwargs)
+
+    # <table>_SEQ.NEXTVAL: shared by every connection, and never behind the
+    # table's own keys, since seeded and key-less rows take AUTOINCREMENT's
+    def next_value(self, table):
+        with self._sequences_lock:
+            highest = self._anchor.execute(f"SELECT COALESCE(MAX(DBKEY), 0) FROM {table}").fetchone()[0]
+            value = max(self._sequences.get(table, 0), highest) + 1
+            self._sequences[table] = value
+            return value
+
+    def install(self, db_module):
+        """Route db.connect to this database; returns a function that undoes it."""
+        original = db_module.Connection
+        db_module.Connection = lambda **kwargs: self.connect(**kwargs)
+        return lambda: setattr(db_module, 'Connection', original)
+
+    def counts(self):
+        with sqlite3.connect(self.path) as db:
+            tables = [row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+            return {table: db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in tables}
+
+# Row counts per table for a scale (the position and performance row count)
+def seed_plan(scale):
+    products = max(scale // 10, 5)
+    planograms = max(scale // 100, 5)
+    stores = max(scale // 1000, 5)
+    return {
+        "products": products,
+        "planograms": planograms,
+        "stores": stores,
+        "floorplans": stores,
+        "clusters": max(stores // 10, 3),
+        "positions": scale,
+        "performances": scale,
+        "pdfs": min(planograms, 50)
+    }
+
+def seed(path, scale, pdf_bytes=64 * 1024, rng_seed=1):
+    """Create the schema at path and fill it with scale positions/performances."""
+    if os.path.exists(path):
+        os.remove(path)
+    rng = random.Random(rng_seed)
+    plan = seed_plan(scale)
+    db = sqlite3.connect(path)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=OFF")
+    for statement in schema_statements():
+        db.execute(statement)
+
+    categories = [f"Category {n}" for n in range(1, 21)]
+    db.executemany(
+        "INSERT INTO ITX_SPC_PRODUCT (UPC, ProductName, Category, SubCategory, Dimensions, Weight, DBStatus) VALUES (?, ?, ?, ?, ?, ?, 1)",
+        ((f"UPC{n:09d}", f"Product {n}", categories[n % 20], f"SubCategory {n % 200}",
+          f"{rng.randint(5, 40)}x{rng.randint(5, 40)}x{rng.randint(5, 40)}", round(rng.uniform(0.1, 10), 2))
+         for n in range(1, plan["products"] + 1))
+    )
+    db.executemany("INSERT INTO IX_STR_STORE (StoreName, DESCRIPTIVO1, DBStatus) VALUES (?, ?, 1)",
+                   ((f"Store {n}", f"Description {n}") for n in range(1, plan["stores"] + 1)))
+    db.executemany("INSERT INTO IX_FLR_FLOORPLAN (FloorplanName, DBStatus) VALUES (?, 1)",
+                   ((f"Floorplan {n}",) for n in range(1, plan["floorplans"] + 1)))
+    db.executemany("INSERT INTO IX_SPC_PLANOGRAM (PlanogramName, PDFPath, DBStatus) VALUES (?, ?, 1)",
+                   ((f"Planogram {n}", f"stage/planogram{n}.pdf") for n in range(1, plan["planograms"] + 1)))
+    db.executemany("INSERT INTO IX_EIA_CLUSTER (ClusterName) VALUES (?)",
+                   ((f"Cluster {n}",) for n in range(1, plan["clusters"] + 1)))
+    db.executemany("INSERT INTO IX_EIA_CLUSTER_STORE (DBClusterParentKey, DBStoreParentKey) VALUES (?, ?)",
+                   ((n % plan["clusters"] + 1, n) for n in range(1, plan["stores"] + 1)))
+    db.executemany("INSERT INTO IX_STR_STORE_FLOORPLAN (DBStoreParentKey, DBFloorplanParentKey) VALUES (?, ?)",
+                   ((n, n) for n in range(1, plan["stores"] + 1)))
+    db.executemany("INSERT INTO IX_FLR_PERFORMANCE (DBFloorplanParentKey, DBPlanogramParentKey, CAPACITY) VALUES (?, ?, ?)",
+                   ((n % plan["floorplans"] + 1, n, rng.randint(50, 500)) for n in range(1, plan["planograms"] + 1)))
+
+    # Spread positions evenly over planograms; each performance row matches a position
+    per_planogram = max(scale // plan["planograms"], 1)
+    def placements():
+        for n in range(scale):
+            planogram = n // per_planogram % plan["planograms"] + 1
+            yield planogram, (n * 7919) % plan["products"] + 1
+    db.executemany(
+        "INSERT INTO IX_SPC_POSITION (DBProductParentKey, DBPlanogramParentKey, DBFixtureParentKey, HFacing, VFacing, DFacing) VALUES (?, ?, ?, ?, ?, ?)",
+        ((product, planogram, n % 12 + 1, rng.randint(1, 6), rng.randint(1, 4), rng.randint(1, 4))
+         for n, (planogram, product) in enumerate(placements()))
+    )
+    db.executemany(
+        "INSERT INTO IX_SPC_PERFORMANCE (DBPlanogramParentKey, DBProductParentKey, FACTINGS, CAPACITY, UNITMOVEMENT, SALES, MARGEN, COST) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        ((planogram, product, rng.randint(1, 300), rng.randint(10, 100), rng.randint(0, 50),
+          round(rng.uniform(10, 10000), 2), round(rng.uniform(1, 2500), 2), round(rng.uniform(5, 7500), 2))
+         for planogram, product in placements())
+    )
+
+    pdf = b"%PDF-1.4\n" + bytes(rng.getrandbits(8) for _ in range(pdf_bytes))
+    db.executemany("INSERT INTO IX_SPC_PLANOGRAM_PDF (DBPlanogramParentKey, PDF) VALUES (?, ?)",
+                   ((n, pdf) for n in range(1, plan["pdfs"] + 1)))
+    db.commit()
+    db.close()
+    with open(path + '.json', 'w') as f:
+        json.dump({"scale": scale, "plan": plan}, f)
+    return plan
+
+# Reuse a database seeded earlier at the same scale, or seed a new one
+def ensure_seeded(path, scale, reseed=False):
+    marker = path + '.json'
+    if not reseed and os.path.exists(path) and os.path.exists(marker):
+        with open(marker) as f:
+            info = json.load(f)
+        if info.get("scale") == scale:
+            return info["plan"]
+    return seed(path, scale)
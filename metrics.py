@@ -0,0 +1,257 @@
+import bisect
+import hashlib
+import re
+import threading
+import time
+from functools import lru_cache
+from flask import Blueprint, Response, g, request
+from config import Config
+from admission import admission_controller
+from fragment_cache import fragment_cache
+from product_index import product_facet_index, product_search_index
+from upc_resolver import upc_resolver
+from warehouses import warehouse_router
+
+metrics_bp = Blueprint('metrics', __name__)
+
+# Histogram buckets in seconds, from a cached lookup to a long analytic scan
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """
+    A named family of samples keyed by label values, aggregated in process.
+    Updates take one short lock per family, so they are safe from request
+    threads, greenlets and job workers alike.
+    """
+
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+        lines = self.header()
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(self.labels, key)} {_number(value)}")
+        return lines
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # Per-bucket counts (the last is +Inf), then sum and count
+                state = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self):
+        with self._lock:
+            values = {key: list(state) for key, state in self._values.items()}
+        lines = self.header()
+        bounds = self.buckets + (float('inf'),)
+        for key, state in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, state):
+                cumulative += count
+                le = f'le="{_number(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_number(state[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {state[-1]}")
+        return lines
+
+# Literals and bind placeholders a fingerprint ignores, so the same statement
+# with different values (or a different number of IN-list items) groups together
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_WHITESPACE = re.compile(r"\s+")
+
+# SQL text with literals and placeholders replaced by ?, for grouping statements
+@lru_cache(maxsize=4096)
+def normalize_statement(query):
+    text = _STRING_LITERAL.sub('?', query)
+    text = text.replace('%s', '?')
+    text = _NUMBER_LITERAL.sub('?', text)
+    text = _PLACEHOLDER_LIST.sub('?+', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+# Short stable id for a statement's normalized text, used as a metric label
+@lru_cache(maxsize=4096)
+def fingerprint(query):
+    return hashlib.sha1(normalize_statement(query).encode()).hexdigest()[:12]
+
+request_duration = Histogram(
+    'planogram_http_request_duration_seconds', "Time to handle a request, by route.",
+    ('endpoint', 'method', 'status')
+)
+query_duration = Histogram(
+    'planogram_query_duration_seconds', "Warehouse statement execution time, by statement fingerprint.",
+    ('fingerprint',)
+)
+query_errors = Counter(
+    'planogram_query_errors_total', "Warehouse statements that raised, by statement fingerprint.",
+    ('fingerprint',)
+)
+query_rows = Counter(
+    'planogram_query_rows_fetched_total', "Rows fetched from warehouse results, by statement fingerprint.",
+    ('fingerprint',)
+)
+connect_duration = Histogram(
+    'planogram_connect_duration_seconds', "Time to open a warehouse connection, by warehouse.",
+    ('warehouse',)
+)
+connections_open = Gauge('planogram_connections_open', "Warehouse connections currently open.")
+admission_wait = Histogram(
+    'planogram_admission_wait_seconds', "Time queries waited for a warehouse slot, by workload class.",
+    ('workload',)
+)
+pdf_bytes_served = Counter(
+    'planogram_pdf_bytes_served_total', "Planogram PDF bytes sent to clients, by route.",
+    ('endpoint',)
+)
+
+METRICS = [
+    request_duration,
+    query_duration,
+    query_errors,
+    query_rows,
+    connect_duration,
+    connections_open,
+    admission_wait,
+    pdf_bytes_served
+]
+
+# Families read from the stats() of the app's shared objects at scrape time
+def _family(name, kind, help, labels, samples):
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for values, value in samples:
+        lines.append(f"{name}{_labels(labels, values)} {_number(value)}")
+    return lines
+
+def collected_metrics():
+    fragments = fragment_cache.stats()
+    upcs = upc_resolver.stats()
+    admission = admission_controller.stats()
+    routed = warehouse_router.stats()["routed"]
+    caches = (('fragment', fragments), ('upc_resolver', upcs))
+
+    lines = []
+    for field, suffix, help in (
+        ('hits', 'hits', "Cache lookups that found an entry."),
+        ('misses', 'misses', "Cache lookups that found nothing."),
+        ('evictions', 'evictions', "Entries evicted to stay within the cache's size bound.")
+    ):
+        lines += _family(f'planogram_cache_{suffix}_total', 'counter', help, ('cache',),
+                         [((cache,), stats[field]) for cache, stats in caches])
+    lines += _family('planogram_cache_entries', 'gauge', "Entries held in each in-process cache or index.", ('cache',), [
+        (('fragment',), fragments["entries"]),
+        (('upc_resolver',), upcs["size"]),
+        (('product_search',), len(product_search_index)),
+        (('product_facet',), len(product_facet_index))
+    ])
+    lines += _family('planogram_cache_bytes', 'gauge', "Bytes held by the rendered fragment cache.", ('cache',),
+                     [(('fragment',), fragments["bytes"])])
+
+    lines += _family('planogram_admission_running', 'gauge', "Queries holding a warehouse slot.", ('workload',),
+                     [((workload,), count) for workload, count in admission["running"].items()])
+    lines += _family('planogram_admission_waiting', 'gauge', "Queries queued for a warehouse slot.", ('workload',),
+                     [((workload,), count) for workload, count in admission["waiting"].items()])
+    for field, name, help in (
+        ('admitted', 'admitted', "Queries granted a warehouse slot."),
+        ('rejected', 'rejected', "Requests turned away with 429 while the queue was full."),
+        ('timedOut', 'timed_out', "Queries that gave up waiting for a slot.")
+    ):
+        lines += _family(f'planogram_admission_{name}_total', 'counter', help, (), [((), admission[field])])
+
+    lines += _family('planogram_connections_routed_total', 'counter', "Connections opened, by workload class and warehouse.",
+                     ('workload', 'warehouse'),
+                     [((workload, warehouse), count)
+                      for workload, warehouses in sorted(routed.items())
+                      for warehouse, count in sorted(warehouses.items())])
+
+    # Imported here: jobs imports db, which imports this module
+    from jobs import job_queue
+    lines += _family('planogram_jobs', 'gauge', "Background jobs, by status.", ('status',),
+                     sorted(((status,), count) for status, count in job_queue.counts().items()))
+    return lines
+
+# Prometheus text exposition of every metric
+def render_metrics():
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    lines += collected_metrics()
+    return '\n'.join(lines) + '\n'
+
+# Time every request into the per-route latency histogram
+def init_metrics(app):
+    if not Config.METRICS_ENABLED:
+        return
+    app.register_blueprint(metrics_bp)
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def observe_request(response):
+        if 'metrics_started' in g:
+            request_duration.observe(
+                time.perf_counter() - g.metrics_started,
+                request.endpoint or 'unmatched', request.method, str(response.status_code)
+            )
+        return response
+
+# Route for Prometheus to scrape
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
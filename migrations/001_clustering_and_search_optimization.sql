@@ -0,0 +1,79 @@
+-- Migration 001: clustering keys and search optimization for the app's access paths
+--
+-- Every lookup the app makes filters or joins on a parent key or on UPC, and
+-- ckbbuild.txt declares none of them, so micro-partitions are laid out in
+-- load order and those lookups scan whole tables.
+--
+--   Clustering keys co-locate the rows that range and join lookups read
+--   together (a planogram's positions, a floorplan's planograms), so pruning
+--   can skip the other partitions. Automatic Clustering maintains them in
+--   the background and bills reclustering as serverless credits.
+--
+--   Search optimization adds point-lookup access paths for the equality
+--   filters that are not the leading clustering column (UPC, DBKEY and the
+--   second key of the link tables). Requires Enterprise Edition.
+--
+-- Run after ckbbuild.txt with a role that owns the tables, naming the
+-- role, warehouse, database and schema of the environment:
+--
+--   snowsql -o variable_substitution=true \
+--       -D role=SYSADMIN -D warehouse=NEWCKB_WH -D database=NEWCKB -D schema=PUBLIC \
+--       -f migrations/001_clustering_and_search_optimization.sql
+--
+-- Applied versions are recorded in SCHEMA_MIGRATIONS; once version 1 is
+-- recorded, running the file again changes nothing. Measure the effect
+-- with verify_pruning.py before and after; reclustering an existing table
+-- takes a while, so rerun it once SYSTEM$CLUSTERING_INFORMATION settles.
+
+USE ROLE &role;
+USE DATABASE &database;
+USE SCHEMA &schema;
+USE WAREHOUSE &warehouse;
+
+CREATE TABLE IF NOT EXISTS SCHEMA_MIGRATIONS (
+    VERSION INT PRIMARY KEY,
+    DESCRIPTION VARCHAR(255),
+    APPLIED_AT TIMESTAMP_LTZ DEFAULT CURRENT_TIMESTAMP()
+);
+
+EXECUTE IMMEDIATE $$
+DECLARE
+    applied INTEGER;
+BEGIN
+    SELECT COUNT(*) INTO :applied FROM SCHEMA_MIGRATIONS WHERE VERSION = 1;
+    IF (applied > 0) THEN
+        RETURN 'Migration 1 is already applied; nothing to do';
+    END IF;
+
+    -- Positions: the planogram page, simulations and position edits read one
+    -- planogram's rows, then look products up within it
+    ALTER TABLE IX_SPC_POSITION CLUSTER BY (DBPlanogramParentKey, DBProductParentKey);
+    ALTER TABLE IX_SPC_POSITION ADD SEARCH OPTIMIZATION ON EQUALITY(DBKEY, DBProductParentKey);
+
+    -- Performance: joined to positions on (planogram, product)
+    ALTER TABLE IX_SPC_PERFORMANCE CLUSTER BY (DBPlanogramParentKey, DBProductParentKey);
+    ALTER TABLE IX_SPC_PERFORMANCE ADD SEARCH OPTIMIZATION ON EQUALITY(DBKEY, DBProductParentKey);
+
+    -- Floorplan performance: flplanogram lists a floorplan's planograms
+    ALTER TABLE IX_FLR_PERFORMANCE CLUSTER BY (DBFloorplanParentKey, DBPlanogramParentKey);
+    ALTER TABLE IX_FLR_PERFORMANCE ADD SEARCH OPTIMIZATION ON EQUALITY(DBPlanogramParentKey);
+
+    -- Cluster stores: clstore lists a cluster's stores
+    ALTER TABLE IX_EIA_CLUSTER_STORE CLUSTER BY (DBClusterParentKey);
+    ALTER TABLE IX_EIA_CLUSTER_STORE ADD SEARCH OPTIMIZATION ON EQUALITY(DBStoreParentKey);
+
+    -- Store floorplans: stfloorplan lists a store's floorplans
+    ALTER TABLE IX_STR_STORE_FLOORPLAN CLUSTER BY (DBStoreParentKey);
+    ALTER TABLE IX_STR_STORE_FLOORPLAN ADD SEARCH OPTIMIZATION ON EQUALITY(DBFloorplanParentKey);
+
+    -- Products: looked up by UPC (get_product, planogram adds, bulk resolution)
+    ALTER TABLE ITX_SPC_PRODUCT ADD SEARCH OPTIMIZATION ON EQUALITY(UPC);
+
+    -- Planogram PDFs: fetched by DBKEY and joined to planograms on their parent key
+    ALTER TABLE IX_SPC_PLANOGRAM_PDF ADD SEARCH OPTIMIZATION ON EQUALITY(DBKEY, DBPlanogramParentKey);
+
+    INSERT INTO SCHEMA_MIGRATIONS (VERSION, DESCRIPTION)
+    VALUES (1, 'Clustering keys and search optimization for parent key and UPC lookups');
+    RETURN 'Migration 1 applied';
+END;
+$$;
@@ -0,0 +1,53 @@
+-- Migration 002: key sequences for the tables whose inserts return the new key
+--
+-- The cluster, floor plan, position and performance inserts hand the new
+-- row's DBKEY back to the caller. DBKEY is AUTOINCREMENT and Snowflake has
+-- no way to read back the key a statement generated, so reading it after
+-- the insert could return a row another session added meanwhile. Instead
+-- the app draws the key from <table>_SEQ.NEXTVAL and inserts it (see
+-- query_utils.next_key); every app insert into these tables does so.
+--
+-- Each sequence starts after the table's highest DBKEY. Rows inserted
+-- without a DBKEY still take AUTOINCREMENT's own counter, which can reach
+-- keys the sequence has handed out, so loads into these tables from
+-- outside the app must set DBKEY from the same sequence.
+--
+--   snowsql -o variable_substitution=true \
+--       -D role=SYSADMIN -D warehouse=NEWCKB_WH -D database=NEWCKB -D schema=PUBLIC \
+--       -f migrations/002_insert_key_sequences.sql
+--
+-- Applied versions are recorded in SCHEMA_MIGRATIONS (created by 001); once
+-- version 2 is recorded, running the file again changes nothing.
+
+USE ROLE &role;
+USE DATABASE &database;
+USE SCHEMA &schema;
+USE WAREHOUSE &warehouse;
+
+EXECUTE IMMEDIATE $$
+DECLARE
+    applied INTEGER;
+    next_key INTEGER;
+    keyed_tables RESULTSET DEFAULT (
+        SELECT VALUE::STRING AS TABLE_NAME
+        FROM TABLE(FLATTEN(INPUT => ARRAY_CONSTRUCT(
+            'IX_EIA_CLUSTER', 'IX_FLR_FLOORPLAN', 'IX_SPC_POSITION', 'IX_SPC_PERFORMANCE'
+        )))
+    );
+BEGIN
+    SELECT COUNT(*) INTO :applied FROM SCHEMA_MIGRATIONS WHERE VERSION = 2;
+    IF (applied > 0) THEN
+        RETURN 'Migration 2 is already applied; nothing to do';
+    END IF;
+
+    FOR keyed IN keyed_tables DO
+        LET table_name VARCHAR := keyed.TABLE_NAME;
+        SELECT COALESCE(MAX(DBKEY), 0) + 1 INTO :next_key FROM IDENTIFIER(:table_name);
+        EXECUTE IMMEDIATE 'CREATE SEQUENCE IF NOT EXISTS ' || table_name || '_SEQ START = ' || next_key || ' INCREMENT = 1';
+    END FOR;
+
+    INSERT INTO SCHEMA_MIGRATIONS (VERSION, DESCRIPTION)
+    VALUES (2, 'Key sequences for cluster, floor plan, position and performance inserts');
+    RETURN 'Migration 2 applied';
+END;
+$$;
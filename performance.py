@@ -1,21 +1,18 @@
 import os
 from flask import Blueprint, render_template, request, jsonify
-import snowflake.connector
 from config import Config
+from db import connect
+from query_utils import next_key, parse_list_args, list_query, list_payload
+from changes import change_log, conditional
 from datetime import datetime
+from fragment_cache import render_table_body
+from simulation import invalidate_planogram_model, invalidate_all_planogram_models
 
 performance_bp = Blueprint('performance', __name__)
 
 # Helper function to get Snowflake connection
 def get_snowflake_connection(user, password):
-    return snowflake.connector.connect(
-        user=user,
-        password=password,
-        account=Config.SNOWFLAKE_ACCOUNT,
-        warehouse=Config.SNOWFLAKE_WAREHOUSE,
-        database=Config.SNOWFLAKE_DATABASE,
-        schema=Config.SNOWFLAKE_SCHEMA
-    )
+    return connect(user, password)
 
 # Fetch all performance records
 def fetch_performances(user, password):
@@ -58,19 +55,55 @@ def fetch_performance_by_id(user, password, performance_id):
         if conn:
             conn.close()
 
-# Insert a new performance record
+# Performance list columns that can be filtered and sorted, by API name
+PERFORMANCE_LIST_COLUMNS = {
+    "dbKey": "DBKEY",
+    "dbPlanogramParentKey": "DBPLANOGRAMPARENTKEY",
+    "dbProductParentKey": "DBPRODUCTPARENTKEY",
+    "factings": "FACTINGS",
+    "capacity": "CAPACITY",
+    "unitMovement": "UNITMOVEMENT",
+    "sales": "SALES",
+    "margen": "MARGEN",
+    "cost": "COST"
+}
+
+# Fetch one filtered, sorted page of performance records
+def fetch_performance_page(user, password, list_args):
+    conn = None
+    cursor = None
+    try:
+        conn = get_snowflake_connection(user, password)
+        cursor = conn.cursor()
+        query, params = list_query(
+            list(PERFORMANCE_LIST_COLUMNS.values()), "NEWCKB.PUBLIC.IX_SPC_PERFORMANCE",
+            PERFORMANCE_LIST_COLUMNS, "DBKEY", list_args
+        )
+        cursor.execute(query, params)
+        return cursor.fetchall()
+    except Exception as e:
+        raise e
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.close()
+
+# Insert a new performance record and return its ID
 def insert_performance(user, password, dbplanogramparentkey, dbproductparentkey, factings, capacity, unitmovement, sales, margen, cost):
     conn = None
     cursor = None
     try:
         conn = get_snowflake_connection(user, password)
         cursor = conn.cursor()
+        performance_id = next_key(cursor, "NEWCKB.PUBLIC.IX_SPC_PERFORMANCE")
         cursor.execute("""
-            INSERT INTO NEWCKB.PUBLIC.IX_SPC_PERFORMANCE (DBPLANOGRAMPARENTKEY, DBPRODUCTPARENTKEY, FACTINGS, CAPACITY, UNITMOVEMENT, SALES, MARGEN, COST)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (dbplanogramparentkey, dbproductparentkey, factings, capacity, unitmovement, sales, margen, cost))
+            INSERT INTO NEWCKB.PUBLIC.IX_SPC_PERFORMANCE (DBKEY, DBPLANOGRAMPARENTKEY, DBPRODUCTPARENTKEY, FACTINGS, CAPACITY, UNITMOVEMENT, SALES, MARGEN, COST)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (performance_id, dbplanogramparentkey, dbproductparentkey, factings, capacity, unitmovement, sales, margen, cost))
         conn.commit()
         print(f"Inserted performance record")
+        return performance_id
     except Exception as e:
         raise e
     finally:
@@ -121,6 +154,7 @@ def delete_performance(user, password, performance_id):
 
 # Route to display all performance records
 @performance_bp.route('/dsperformance')
+@conditional('performance')
 def dsperformance():
     user = request.cookies.get('snowflake_username')
     password = request.cookies.get('snowflake_password')
@@ -129,14 +163,47 @@ def dsperformance():
         return "Error: Missing credentials", 401
     
     try:
-        performances = fetch_performances(user, password)
+        version = change_log.token('performance')
+        # Only the first page is rendered; the table loads the rest as it scrolls
+        list_args = parse_list_args({}, PERFORMANCE_LIST_COLUMNS, Config.LIST_PAGE_SIZE, Config.LIST_MAX_PAGE_SIZE)
+        table_body, total = render_table_body(
+            'performance', version, user, password, list_args, 'dsperformance.html', 'performances',
+            lambda: fetch_performance_page(user, password, list_args)
+        )
     except Exception as e:
         return f"Error: {str(e)}", 500
 
-    return render_template('dsperformance.html', performances=performances)
+    return render_template(
+        'dsperformance.html', table_body=table_body, total=total,
+        page_size=list_args.limit, version=version
+    )
+
+# Route to get one filtered, sorted page of performance records
+@performance_bp.route('/dsperformance/list', methods=['GET'])
+@conditional('performance')
+def dsperformance_list():
+    user = request.cookies.get('snowflake_username')
+    password = request.cookies.get('snowflake_password')
+
+    if not user or not password:
+        return jsonify({"success": False, "message": "Missing credentials"}), 401
+
+    try:
+        list_args = parse_list_args(request.args, PERFORMANCE_LIST_COLUMNS, Config.LIST_PAGE_SIZE, Config.LIST_MAX_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    try:
+        version = change_log.token('performance')
+        performances = fetch_performance_page(user, password, list_args)
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+    return jsonify({"success": True, "version": version, **list_payload(performances, list_args)})
 
 # Route to get a performance record by ID
 @performance_bp.route('/get_performance', methods=['GET'])
+@conditional('performance')
 def get_performance():
     user = request.cookies.get('snowflake_username')
     password = request.cookies.get('snowflake_password')
@@ -194,10 +261,13 @@ def add_performance():
         return jsonify({"success": False, "message": "All fields are required"}), 400
 
     try:
-        insert_performance(user, password, dbplanogramparentkey, dbproductparentkey, factings, capacity, unitmovement, sales, margen, cost)
+        performance_id = insert_performance(user, password, dbplanogramparentkey, dbproductparentkey, factings, capacity, unitmovement, sales, margen, cost)
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
+    change_log.record('performance', 'insert', performance_id)
+    invalidate_planogram_model(dbplanogramparentkey)
+
     return jsonify({"success": True}), 200
 
 # Route to update an existing performance record
@@ -228,6 +298,10 @@ def update_performance_route():
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
+    change_log.record('performance', 'update', dbkey)
+    # The record may have moved from another planogram, which is not known here
+    invalidate_all_planogram_models()
+
     return jsonify({"success": True}), 200
 
 # Route to delete a performance record
@@ -249,4 +323,7 @@ def delete_performance_route():
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
+    change_log.record('performance', 'delete', performance_id)
+    invalidate_all_planogram_models()
+
     return jsonify({"success": True}), 200
@@ -1,7 +1,13 @@
 import io
-import snowflake.connector
+import json
 from flask import Blueprint, render_template, request, jsonify, send_file
 from config import Config
+from db import connect, query_budget
+from admission import ANALYTIC, workload
+from query_utils import clamp_limit, typeahead_query, parse_list_args, list_query, list_payload
+from changes import change_log, delta_response, conditional
+from fragment_cache import render_table_body
+from metrics import pdf_bytes_served
 
 planogram_bp = Blueprint('planogram', __name__)
 
@@ -9,14 +15,7 @@ def get_snowflake_connection(user, password):
     """
     Create a Snowflake connection using provided credentials and config settings.
     """
-    return snowflake.connector.connect(
-        user=user,
-        password=password,
-        account=Config.SNOWFLAKE_ACCOUNT,
-        warehouse=Config.SNOWFLAKE_WAREHOUSE,
-        database=Config.SNOWFLAKE_DATABASE,
-        schema=Config.SNOWFLAKE_SCHEMA
-    )
+    return connect(user, password)
 
 def execute_query(user, password, query, params=None, fetchone=False, commit=False):
     """
@@ -36,7 +35,53 @@ def execute_query(user, password, query, params=None, fetchone=False, commit=Fal
         if conn:
             conn.close()
 
+def fetch_planograms(user, password, planogram_ids=None):
+    """
+    Fetch planogram list rows with their PDF ID, optionally limited to some IDs.
+    """
+    query = """
+        SELECT p.DBKEY, p.PLANOGRAMNAME, p.DBSTATUS, pp.DBKEY AS pdfId
+        FROM NEWCKB.PUBLIC.IX_SPC_PLANOGRAM p
+        LEFT JOIN NEWCKB.PUBLIC.IX_SPC_PLANOGRAM_PDF pp 
+        ON p.DBKEY = pp.DBPlanogramParentKey
+    """
+    if planogram_ids is None:
+        return execute_query(user, password, query)
+    query += " WHERE p.DBKEY IN (SELECT VALUE::INT FROM TABLE(FLATTEN(INPUT => PARSE_JSON(%s))))"
+    return execute_query(user, password, query, (json.dumps([int(planogram_id) for planogram_id in planogram_ids]),))
+
+# Planogram list columns that can be filtered and sorted, by API name
+PLANOGRAM_LIST_COLUMNS = {
+    "planogramId": "p.DBKEY",
+    "planogramName": "p.PLANOGRAMNAME",
+    "dbStatus": "p.DBSTATUS"
+}
+
+def fetch_planogram_page(user, password, list_args, floorplan_id=None):
+    """
+    Fetch one filtered, sorted page of planograms with their PDF ID,
+    optionally only those placed on a floorplan.
+    """
+    from_clause = """
+        NEWCKB.PUBLIC.IX_SPC_PLANOGRAM p
+        LEFT JOIN NEWCKB.PUBLIC.IX_SPC_PLANOGRAM_PDF pp
+        ON p.DBKEY = pp.DBPlanogramParentKey
+    """
+    where, where_params = None, ()
+    if floorplan_id is not None:
+        from_clause += """
+        JOIN NEWCKB.PUBLIC.IX_FLR_PERFORMANCE FP
+        ON p.DBKEY = FP.DBPLANOGRAMPARENTKEY
+        """
+        where, where_params = "FP.DBFLOORPLANPARENTKEY = %s", (floorplan_id,)
+    query, params = list_query(
+        list(PLANOGRAM_LIST_COLUMNS.values()) + ["pp.DBKEY"], from_clause, PLANOGRAM_LIST_COLUMNS, "p.DBKEY",
+        list_args, where, where_params
+    )
+    return execute_query(user, password, query, params)
+
 @planogram_bp.route('/dsplanogram')
+@conditional('planogram')
 def dsplanogram():
     """
     Display all planogram records.
@@ -48,19 +93,68 @@ def dsplanogram():
         return "Error: Missing credentials", 401
     
     try:
-        query = """
-            SELECT p.DBKEY, p.PLANOGRAMNAME, p.DBSTATUS, pp.DBKEY AS pdfId
-            FROM NEWCKB.PUBLIC.IX_SPC_PLANOGRAM p
-            LEFT JOIN NEWCKB.PUBLIC.IX_SPC_PLANOGRAM_PDF pp 
-            ON p.DBKEY = pp.DBPlanogramParentKey
-        """
-        planograms = execute_query(user, password, query)
+        version = change_log.token('planogram')
+        # Only the first page is rendered; the table loads the rest as it scrolls
+        list_args = parse_list_args({}, PLANOGRAM_LIST_COLUMNS, Config.LIST_PAGE_SIZE, Config.LIST_MAX_PAGE_SIZE)
+        table_body, total = render_table_body(
+            'planogram', version, user, password, list_args, 'dsplanogram.html', 'planograms',
+            lambda: fetch_planogram_page(user, password, list_args)
+        )
     except Exception as e:
         return f"Error: {str(e)}", 500
 
-    return render_template('dsplanogram.html', planograms=planograms)
+    return render_template(
+        'dsplanogram.html', table_body=table_body, total=total,
+        page_size=list_args.limit, version=version
+    )
+
+@planogram_bp.route('/dsplanogram/data', methods=['GET'])
+def dsplanogram_data():
+    """
+    Return planogram rows changed since the client's version token.
+    """
+    user = request.cookies.get('snowflake_username')
+    password = request.cookies.get('snowflake_password')
+
+    if not user or not password:
+        return jsonify({"success": False, "message": "Missing credentials"}), 401
+
+    try:
+        return delta_response(
+            'planogram',
+            lambda: fetch_planograms(user, password),
+            lambda planogram_ids: fetch_planograms(user, password, planogram_ids)
+        )
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@planogram_bp.route('/dsplanogram/list', methods=['GET'])
+@conditional('planogram')
+def dsplanogram_list():
+    """
+    Return planograms matching the filter, sort and paging arguments.
+    """
+    user = request.cookies.get('snowflake_username')
+    password = request.cookies.get('snowflake_password')
+
+    if not user or not password:
+        return jsonify({"success": False, "message": "Missing credentials"}), 401
+
+    try:
+        list_args = parse_list_args(request.args, PLANOGRAM_LIST_COLUMNS, Config.LIST_PAGE_SIZE, Config.LIST_MAX_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    try:
+        version = change_log.token('planogram')
+        planograms = fetch_planogram_page(user, password, list_args)
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+    return jsonify({"success": True, "version": version, **list_payload(planograms, list_args)})
 
 @planogram_bp.route('/get_planogram', methods=['GET'])
+@conditional('planogram')
 def get_planogram():
     """
     Get a specific planogram record by ID.
@@ -98,6 +192,41 @@ def get_planogram():
     else:
         return jsonify({"success": False, "message": "Planogram record not found"}), 404
 
+@planogram_bp.route('/planograms/typeahead', methods=['GET'])
+@conditional('planogram')
+def planograms_typeahead():
+    """
+    Return planograms matching a typeahead query, best matches first.
+    """
+    user = request.cookies.get('snowflake_username')
+    password = request.cookies.get('snowflake_password')
+
+    if not user or not password:
+        return jsonify({"success": False, "message": "Missing credentials"}), 401
+
+    try:
+        limit = clamp_limit(request.args.get('limit'))
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    query, params = typeahead_query(
+        "NEWCKB.PUBLIC.IX_SPC_PLANOGRAM", "DBKEY", "PLANOGRAMNAME",
+        ["DBKEY", "PLANOGRAMNAME", "DBSTATUS"], request.args.get('q', ''), limit
+    )
+
+    try:
+        planograms = execute_query(user, password, query, params)
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+    return jsonify({
+        "success": True,
+        "results": [
+            {"id": planogram[0], "label": planogram[1], "dbStatus": planogram[2]}
+            for planogram in planograms
+        ]
+    })
+
 @planogram_bp.route('/dsplanogram/add', methods=['POST'])
 def add_planogram():
     """
@@ -139,6 +268,8 @@ def add_planogram():
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
+    change_log.record('planogram', 'insert', planogram_id)
+
     return jsonify({"success": True}), 200
 
 @planogram_bp.route('/dsplanogram/update_planogram', methods=['POST'])
@@ -171,6 +302,8 @@ def update_planogram_route():
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
+    change_log.record('planogram', 'update', dbkey)
+
     return jsonify({"success": True}), 200
 
 @planogram_bp.route('/dsplanogram/delete_planogram', methods=['POST'])
@@ -199,9 +332,12 @@ def delete_planogram_route():
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
+    change_log.record('planogram', 'delete', planogram_id)
+
     return jsonify({"success": True}), 200
 
 @planogram_bp.route('/dsplanogram/view_pdf/<int:dbkey>', methods=['GET'])
+@conditional('planogram')
 def view_pdf_dsplanogram(dbkey):
     """
     View a PDF file associated with a planogram.
@@ -222,6 +358,7 @@ def view_pdf_dsplanogram(dbkey):
         pdf_data = execute_query(user, password, query, (dbkey,), fetchone=True)
         if pdf_data and pdf_data[0]:
             pdf_binary = pdf_data[0]
+            pdf_bytes_served.inc(request.endpoint, amount=len(pdf_binary))
             return send_file(io.BytesIO(pdf_binary), download_name='planogram.pdf', as_attachment=False)
         else:
             return jsonify({"success": False, "message": "PDF not found"}), 404
@@ -229,6 +366,7 @@ def view_pdf_dsplanogram(dbkey):
         return jsonify({"success": False, "message": str(e)}), 500
 
 @planogram_bp.route('/flplanogram/view_pdf/<int:dbkey>', methods=['GET'])
+@conditional('planogram')
 def view_pdf_flplanogram(dbkey):
     """
     View a PDF file associated with a floorplan.
@@ -249,6 +387,7 @@ def view_pdf_flplanogram(dbkey):
         pdf_data = execute_query(user, password, query, (dbkey,), fetchone=True)
         if pdf_data and pdf_data[0]:
             pdf_binary = pdf_data[0]
+            pdf_bytes_served.inc(request.endpoint, amount=len(pdf_binary))
             return send_file(io.BytesIO(pdf_binary), download_name='planogram.pdf', as_attachment=False)
         else:
             return jsonify({"success": False, "message": "PDF not found"}), 404
@@ -256,6 +395,9 @@ def view_pdf_flplanogram(dbkey):
         return jsonify({"success": False, "message": str(e)}), 500
 
 @planogram_bp.route('/flplanogram', methods=['GET'])
+@query_budget(Config.QUERY_TIMEOUT_LONG)
+@workload(ANALYTIC)
+@conditional('planogram', 'floorplan', 'performance')
 def flplanogram():
     """
     Display the floorplan and associated planograms.
@@ -271,28 +413,49 @@ def flplanogram():
         return "Error: Floorplan ID is required", 400
     
     try:
-        query_planograms = """
-            SELECT P.DBKEY, P.PLANOGRAMNAME, P.DBSTATUS, pp.DBKEY AS pdfId
-            FROM NEWCKB.PUBLIC.IX_SPC_PLANOGRAM P
-            LEFT JOIN NEWCKB.PUBLIC.IX_SPC_PLANOGRAM_PDF pp
-            ON P.DBKEY = pp.DBPlanogramParentKey
-            JOIN NEWCKB.PUBLIC.IX_FLR_PERFORMANCE FP
-            ON P.DBKEY = FP.DBPLANOGRAMPARENTKEY
-            WHERE FP.DBFLOORPLANPARENTKEY = %s
-        """
-        planograms = execute_query(user, password, query_planograms, (floorplan_id,))
+        # Only the first page is rendered; the table loads the rest as it scrolls
+        list_args = parse_list_args({}, PLANOGRAM_LIST_COLUMNS, Config.LIST_PAGE_SIZE, Config.LIST_MAX_PAGE_SIZE)
+        first_page = list_payload(fetch_planogram_page(user, password, list_args, floorplan_id), list_args)
 
-        query_all_planograms = """
-            SELECT DBKEY, PLANOGRAMNAME, DBSTATUS
-            FROM NEWCKB.PUBLIC.IX_SPC_PLANOGRAM
-        """
-        all_planograms = execute_query(user, password, query_all_planograms)
-        
-        return render_template('flplanogram.html', planograms=planograms, all_planograms=all_planograms, floorplan_id=floorplan_id)
+        # The planogram picker loads its choices on demand from /planograms/typeahead
+        return render_template(
+            'flplanogram.html', planograms=first_page["rows"], total=first_page["total"],
+            page_size=list_args.limit, floorplan_id=floorplan_id
+        )
 
     except Exception as e:
         return f"Error: {str(e)}", 500
 
+@planogram_bp.route('/flplanogram/list', methods=['GET'])
+@query_budget(Config.QUERY_TIMEOUT_LONG)
+@workload(ANALYTIC)
+@conditional('planogram', 'floorplan', 'performance')
+def flplanogram_list():
+    """
+    Return a floorplan's planograms matching the filter, sort and paging arguments.
+    """
+    user = request.cookies.get('snowflake_username')
+    password = request.cookies.get('snowflake_password')
+
+    if not user or not password:
+        return jsonify({"success": False, "message": "Missing credentials"}), 401
+
+    floorplan_id = request.args.get('floorplanId')
+    if not floorplan_id:
+        return jsonify({"success": False, "message": "Floorplan ID is required"}), 400
+
+    try:
+        list_args = parse_list_args(request.args, PLANOGRAM_LIST_COLUMNS, Config.LIST_PAGE_SIZE, Config.LIST_MAX_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    try:
+        planograms = fetch_planogram_page(user, password, list_args, floorplan_id)
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+    return jsonify({"success": True, **list_payload(planograms, list_args)})
+
 @planogram_bp.route('/flplanogram/add_planogram', methods=['POST'])
 def add_planogram_to_floorplan():
     """
@@ -318,6 +481,8 @@ def add_planogram_to_floorplan():
     
     try:
         execute_query(user, password, query, (floorplan_id, planogram_id), commit=True)
+        # Links live in the performance table; the new row's key is not known here
+        change_log.record('performance', 'insert', None, floorplan_id)
         return jsonify({"success": True}), 200
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
@@ -347,6 +512,7 @@ def remove_planogram_from_floorplan():
     
     try:
         execute_query(user, password, query, (floorplan_id, planogram_id), commit=True)
+        change_log.record('performance', 'delete', None, floorplan_id)
         return jsonify({"success": True}), 200
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
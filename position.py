@@ -1,20 +1,17 @@
 import os
 from flask import Blueprint, render_template, request, jsonify
-import snowflake.connector
 from config import Config
+from db import connect
+from query_utils import next_key, parse_list_args, list_query, list_payload
+from changes import change_log, conditional
+from fragment_cache import render_table_body
+from simulation import invalidate_planogram_model, invalidate_position_models
 
 position_bp = Blueprint('position', __name__)
 
 # Helper function to get Snowflake connection
 def get_snowflake_connection(user, password):
-    return snowflake.connector.connect(
-        user=user,
-        password=password,
-        account=Config.SNOWFLAKE_ACCOUNT,
-        warehouse=Config.SNOWFLAKE_WAREHOUSE,
-        database=Config.SNOWFLAKE_DATABASE,
-        schema=Config.SNOWFLAKE_SCHEMA
-    )
+    return connect(user, password)
 
 # Fetch all positions
 def fetch_positions(user, password):
@@ -51,18 +48,49 @@ def fetch_position_by_id(user, password, position_id):
         if conn:
             conn.close()
 
-# Insert a new position
+# Position list columns that can be filtered and sorted, by API name
+POSITION_LIST_COLUMNS = {
+    "positionId": "DBKEY",
+    "dbProductParentKey": "DBPRODUCTPARENTKEY",
+    "dbPlanogramParentKey": "DBPLANOGRAMPARENTKEY",
+    "dbFixtureParentKey": "DBFIXTUREPARENTKEY",
+    "hFacing": "HFACING",
+    "vFacing": "VFACING",
+    "dFacing": "DFACING"
+}
+
+# Fetch one filtered, sorted page of positions
+def fetch_position_page(user, password, list_args):
+    conn = None
+    try:
+        conn = get_snowflake_connection(user, password)
+        cursor = conn.cursor()
+        query, params = list_query(
+            list(POSITION_LIST_COLUMNS.values()), "NEWCKB.PUBLIC.IX_SPC_POSITION",
+            POSITION_LIST_COLUMNS, "DBKEY", list_args
+        )
+        cursor.execute(query, params)
+        return cursor.fetchall()
+    except Exception as e:
+        raise e
+    finally:
+        if conn:
+            conn.close()
+
+# Insert a new position and return its ID
 def insert_position(user, password, db_product_parent_key, db_planogram_parent_key, db_fixture_parent_key, h_facing, v_facing, d_facing):
     conn = None
     try:
         conn = get_snowflake_connection(user, password)
         cursor = conn.cursor()
+        position_id = next_key(cursor, "NEWCKB.PUBLIC.IX_SPC_POSITION")
         cursor.execute("""
-            INSERT INTO NEWCKB.PUBLIC.IX_SPC_POSITION (DBPRODUCTPARENTKEY, DBPLANOGRAMPARENTKEY, DBFIXTUREPARENTKEY, HFACING, VFACING, DFACING) 
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (db_product_parent_key, db_planogram_parent_key, db_fixture_parent_key, h_facing, v_facing, d_facing))
+            INSERT INTO NEWCKB.PUBLIC.IX_SPC_POSITION (DBKEY, DBPRODUCTPARENTKEY, DBPLANOGRAMPARENTKEY, DBFIXTUREPARENTKEY, HFACING, VFACING, DFACING) 
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, (position_id, db_product_parent_key, db_planogram_parent_key, db_fixture_parent_key, h_facing, v_facing, d_facing))
         conn.commit()
         print(f"Inserted position")
+        return position_id
     except Exception as e:
         raise e
     finally:
@@ -105,6 +133,7 @@ def delete_position(user, password, position_id):
 
 # Route to display all positions
 @position_bp.route('/dsposition')
+@conditional('position')
 def dsposition():
     user = request.cookies.get('snowflake_username')
     password = request.cookies.get('snowflake_password')
@@ -113,14 +142,47 @@ def dsposition():
         return "Error: Missing credentials", 401
     
     try:
-        positions = fetch_positions(user, password)
+        version = change_log.token('position')
+        # Only the first page is rendered; the table loads the rest as it scrolls
+        list_args = parse_list_args({}, POSITION_LIST_COLUMNS, Config.LIST_PAGE_SIZE, Config.LIST_MAX_PAGE_SIZE)
+        table_body, total = render_table_body(
+            'position', version, user, password, list_args, 'dsposition.html', 'positions',
+            lambda: fetch_position_page(user, password, list_args)
+        )
     except Exception as e:
         return f"Error: {str(e)}", 500
 
-    return render_template('dsposition.html', positions=positions)
+    return render_template(
+        'dsposition.html', table_body=table_body, total=total,
+        page_size=list_args.limit, version=version
+    )
+
+# Route to get one filtered, sorted page of positions
+@position_bp.route('/dsposition/list', methods=['GET'])
+@conditional('position')
+def dsposition_list():
+    user = request.cookies.get('snowflake_username')
+    password = request.cookies.get('snowflake_password')
+
+    if not user or not password:
+        return jsonify({"success": False, "message": "Missing credentials"}), 401
+
+    try:
+        list_args = parse_list_args(request.args, POSITION_LIST_COLUMNS, Config.LIST_PAGE_SIZE, Config.LIST_MAX_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    try:
+        version = change_log.token('position')
+        positions = fetch_position_page(user, password, list_args)
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+    return jsonify({"success": True, "version": version, **list_payload(positions, list_args)})
 
 # Route to get a position by ID
 @position_bp.route('/get_position', methods=['GET'])
+@conditional('position')
 def get_position():
     user = request.cookies.get('snowflake_username')
     password = request.cookies.get('snowflake_password')
@@ -174,10 +236,13 @@ def add_position():
         return jsonify({"success": False, "message": "All fields are required"}), 400
 
     try:
-        insert_position(user, password, db_product_parent_key, db_planogram_parent_key, db_fixture_parent_key, h_facing, v_facing, d_facing)
+        position_id = insert_position(user, password, db_product_parent_key, db_planogram_parent_key, db_fixture_parent_key, h_facing, v_facing, d_facing)
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
+    change_log.record('position', 'insert', position_id)
+    invalidate_planogram_model(db_planogram_parent_key)
+
     return jsonify({"success": True}), 200
 
 # Route to update an existing position
@@ -206,6 +271,10 @@ def update_position_route():
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
+    change_log.record('position', 'update', position_id)
+    invalidate_position_models(position_id)
+    invalidate_planogram_model(db_planogram_parent_key)
+
     return jsonify({"success": True}), 200
 
 # Route to delete a position
@@ -228,4 +297,7 @@ def delete_position_route():
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
+    change_log.record('position', 'delete', position_id)
+    invalidate_position_models(position_id)
+
     return jsonify({"success": True}), 200
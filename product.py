@@ -1,21 +1,21 @@
+import json
 import os
 from flask import Blueprint, render_template, request, jsonify
-import snowflake.connector
 from config import Config
+from db import connect, verify_credentials
+from product_index import product_facet_index, product_search_index
+from upc_resolver import upc_resolver
+from query_utils import parse_list_args, list_query, list_payload
+from changes import change_log, conditional
+from fragment_cache import render_table_body
+from jobs import PermanentJobError, job_queue, job_task
 
 product_bp = Blueprint('product', __name__)
 
 # Helper function to establish a Snowflake connection
 def get_snowflake_connection(user, password):
     """Establishes a connection to the Snowflake database."""
-    return snowflake.connector.connect(
-        user=user,
-        password=password,
-        account=Config.SNOWFLAKE_ACCOUNT,
-        warehouse=Config.SNOWFLAKE_WAREHOUSE,
-        database=Config.SNOWFLAKE_DATABASE,
-        schema=Config.SNOWFLAKE_SCHEMA
-    )
+    return connect(user, password)
 
 # Database operation functions
 
@@ -49,24 +49,77 @@ def fetch_product_by_upc(user, password, upc):
         if conn:
             conn.close()
 
-def fetch_dbkey_by_upc(user, password, upc):
-    """Fetches the DBKEY of a product by its UPC."""
+# Product list columns that can be filtered and sorted, by API name
+PRODUCT_LIST_COLUMNS = {
+    "upc": "UPC",
+    "productName": "PRODUCTNAME",
+    "category": "CATEGORY",
+    "subcategory": "SUBCATEGORY",
+    "dimensions": "DIMENSIONS",
+    "weight": "WEIGHT",
+    "dbstatus": "DBSTATUS"
+}
+
+def fetch_product_page(user, password, list_args):
+    """Fetches one filtered, sorted page of product list rows."""
     conn = None
     try:
         conn = get_snowflake_connection(user, password)
         cursor = conn.cursor()
-        cursor.execute("SELECT DBKEY FROM ITX_SPC_PRODUCT WHERE UPC = %s", (upc,))
-        result = cursor.fetchone()
-        if result:
-            return result[0]
-        else:
-            raise ValueError("UPC not found")
+        query, params = list_query(
+            list(PRODUCT_LIST_COLUMNS.values()), "ITX_SPC_PRODUCT",
+            PRODUCT_LIST_COLUMNS, "UPC", list_args
+        )
+        cursor.execute(query, params)
+        return cursor.fetchall()
+    finally:
+        if conn:
+            conn.close()
+
+def fetch_upc_dbkeys(user, password, limit):
+    """Fetches up to limit UPC/DBKEY pairs to warm the resolver cache."""
+    conn = None
+    try:
+        conn = get_snowflake_connection(user, password)
+        cursor = conn.cursor()
+        cursor.execute("SELECT UPC, DBKEY FROM ITX_SPC_PRODUCT WHERE UPC IS NOT NULL LIMIT %s", (limit,))
+        return cursor.fetchall()
+    finally:
+        if conn:
+            conn.close()
+
+def fetch_dbkeys_by_upcs(user, password, upcs):
+    """Fetches UPC/DBKEY pairs for a batch of UPCs in a single query."""
+    conn = None
+    try:
+        conn = get_snowflake_connection(user, password)
+        cursor = conn.cursor()
+        # Bind the whole batch as one JSON array so any number of UPCs costs one round trip
+        cursor.execute("""
+            SELECT p.UPC, p.DBKEY
+            FROM ITX_SPC_PRODUCT p
+            JOIN TABLE(FLATTEN(INPUT => PARSE_JSON(%s))) f
+            ON p.UPC = f.VALUE::STRING
+        """, (json.dumps(list(upcs)),))
+        return cursor.fetchall()
     finally:
         if conn:
             conn.close()
 
+def resolve_dbkeys(user, password, upcs):
+    """Maps UPCs to DBKEYs from the resolver cache, with at most one query for misses."""
+    upc_resolver.ensure_warm(lambda limit: fetch_upc_dbkeys(user, password, limit))
+    return upc_resolver.resolve_many(upcs, lambda missing: fetch_dbkeys_by_upcs(user, password, missing))
+
+def fetch_dbkey_by_upc(user, password, upc):
+    """Fetches the DBKEY of a product by its UPC."""
+    dbkey = resolve_dbkeys(user, password, [upc]).get(str(upc))
+    if dbkey is None:
+        raise ValueError("UPC not found")
+    return dbkey
+
 def insert_product(user, password, upc, product_name, category, subcategory, dimensions, weight, dbstatus):
-    """Inserts a new product into the database."""
+    """Inserts a new product into the database and returns its DBKEY."""
     conn = None
     try:
         conn = get_snowflake_connection(user, password)
@@ -76,6 +129,9 @@ def insert_product(user, password, upc, product_name, category, subcategory, dim
             VALUES (%s, %s, %s, %s, %s, %s, %s)
         """, (upc, product_name, category, subcategory, dimensions, weight, dbstatus))
         conn.commit()
+        cursor.execute("SELECT DBKEY FROM ITX_SPC_PRODUCT WHERE UPC = %s", (upc,))
+        result = cursor.fetchone()
+        return result[0] if result else None
     finally:
         if conn:
             conn.close()
@@ -108,6 +164,18 @@ def delete_product(user, password, upc):
         if conn:
             conn.close()
 
+def fetch_product_facet_rows(user, password):
+    """Fetches the columns needed to build the catalog facet index."""
+    conn = None
+    try:
+        conn = get_snowflake_connection(user, password)
+        cursor = conn.cursor()
+        cursor.execute("SELECT DBKEY, UPC, PRODUCTNAME, CATEGORY, SUBCATEGORY, DBSTATUS FROM ITX_SPC_PRODUCT")
+        return cursor.fetchall()
+    finally:
+        if conn:
+            conn.close()
+
 def fetch_products_by_planogram(user, password, planogram_id):
     """Fetches products associated with a specific planogram."""
     conn = None
@@ -151,14 +219,37 @@ def insert_product_to_planogram(user, password, planogram_id, product_id):
         """, (planogram_id, product_id))
         if cursor.fetchone()[0] == 0:
             cursor.execute("""
-                INSERT INTO IX_SPC_POSITION (DBPlanogramParentKey, DBProductParentKey, DBFixtureParentKey, HFacing, VFacing, DFacing)
-                VALUES (%s, %s, 0, 0, 0, 0)
+                INSERT INTO IX_SPC_POSITION (DBKEY, DBPlanogramParentKey, DBProductParentKey, DBFixtureParentKey, HFacing, VFacing, DFacing)
+                VALUES (IX_SPC_POSITION_SEQ.NEXTVAL, %s, %s, 0, 0, 0, 0)
             """, (planogram_id, product_id))
             conn.commit()
     finally:
         if conn:
             conn.close()
 
+def insert_products_to_planogram(user, password, planogram_id, product_ids):
+    """Inserts a batch of products into a planogram, skipping ones already placed."""
+    conn = None
+    try:
+        conn = get_snowflake_connection(user, password)
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO IX_SPC_POSITION (DBKEY, DBPlanogramParentKey, DBProductParentKey, DBFixtureParentKey, HFacing, VFacing, DFacing)
+            SELECT IX_SPC_POSITION_SEQ.NEXTVAL, %s, PRODUCT, 0, 0, 0, 0
+            FROM (
+                SELECT DISTINCT f.VALUE::INT AS PRODUCT
+                FROM TABLE(FLATTEN(INPUT => PARSE_JSON(%s))) f
+                WHERE f.VALUE::INT NOT IN (
+                    SELECT DBProductParentKey FROM IX_SPC_POSITION WHERE DBPlanogramParentKey = %s
+                )
+            )
+        """, (planogram_id, json.dumps(list(product_ids)), planogram_id))
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        if conn:
+            conn.close()
+
 def delete_product_from_planogram(user, password, planogram_id, product_id):
     """Deletes a product from a planogram."""
     conn = None
@@ -177,6 +268,7 @@ def delete_product_from_planogram(user, password, planogram_id, product_id):
 # Routes
 
 @product_bp.route('/dsproduct')
+@conditional('product')
 def dsproduct():
     """Route to display all products."""
     user = request.cookies.get('snowflake_username')
@@ -186,13 +278,46 @@ def dsproduct():
         return "Error: Missing credentials", 401
     
     try:
-        products = fetch_products(user, password)
+        version = change_log.token('product')
+        # Only the first page is rendered; the table loads the rest as it scrolls
+        list_args = parse_list_args({}, PRODUCT_LIST_COLUMNS, Config.LIST_PAGE_SIZE, Config.LIST_MAX_PAGE_SIZE)
+        table_body, total = render_table_body(
+            'product', version, user, password, list_args, 'dsproduct.html', 'products',
+            lambda: fetch_product_page(user, password, list_args)
+        )
     except Exception as e:
         return f"Error: {str(e)}", 500
 
-    return render_template('dsproduct.html', products=products)
+    return render_template(
+        'dsproduct.html', table_body=table_body, total=total,
+        page_size=list_args.limit, version=version
+    )
+
+@product_bp.route('/dsproduct/list', methods=['GET'])
+@conditional('product')
+def dsproduct_list():
+    """Route to get one filtered, sorted page of products."""
+    user = request.cookies.get('snowflake_username')
+    password = request.cookies.get('snowflake_password')
+
+    if not user or not password:
+        return jsonify({"success": False, "message": "Missing credentials"}), 401
+
+    try:
+        list_args = parse_list_args(request.args, PRODUCT_LIST_COLUMNS, Config.LIST_PAGE_SIZE, Config.LIST_MAX_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    try:
+        version = change_log.token('product')
+        products = fetch_product_page(user, password, list_args)
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+    return jsonify({"success": True, "version": version, **list_payload(products, list_args)})
 
 @product_bp.route('/get_product', methods=['GET'])
+@conditional('product')
 def get_product():
     """Route to get a product by UPC."""
     user = request.cookies.get('snowflake_username')
@@ -248,10 +373,20 @@ def add_product():
         return jsonify({"success": False, "message": "All fields are required"}), 400
 
     try:
-        insert_product(user, password, upc, product_name, category, subcategory, dimensions, weight, dbstatus)
+        dbkey = insert_product(user, password, upc, product_name, category, subcategory, dimensions, weight, dbstatus)
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
+    if product_search_index.loaded:
+        product_search_index.add(dbkey, upc, product_name)
+    if product_facet_index.loaded:
+        product_facet_index.upsert(dbkey, upc, product_name, category, subcategory, dbstatus)
+    if dbkey is not None:
+        upc_resolver.put(upc, dbkey)
+    else:
+        upc_resolver.invalidate(upc)
+    change_log.record('product', 'insert', upc)
+
     return jsonify({"success": True}), 201
 
 @product_bp.route('/dsproduct/update_product', methods=['POST'])
@@ -280,6 +415,13 @@ def update_product_route():
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
+    indexed = product_search_index.get(upc)
+    if indexed:
+        product_search_index.add(indexed[0], upc, product_name)
+    if product_facet_index.loaded:
+        product_facet_index.upsert(None, upc, product_name, category, subcategory, dbstatus)
+    change_log.record('product', 'update', upc)
+
     return jsonify({"success": True}), 200
 
 @product_bp.route('/dsproduct/delete_product', methods=['DELETE'])
@@ -300,9 +442,76 @@ def delete_product_route():
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
+    product_search_index.remove(upc)
+    product_facet_index.remove(upc)
+    upc_resolver.invalidate(upc)
+    change_log.record('product', 'delete', upc)
+
     return jsonify({"success": True}), 200
 
+@product_bp.route('/products/search', methods=['GET'])
+@conditional('product')
+def search_products():
+    """Route to search products by UPC prefix or product name."""
+    user = request.cookies.get('snowflake_username')
+    password = request.cookies.get('snowflake_password')
+
+    if not user or not password:
+        return jsonify({"success": False, "message": "Missing credentials"}), 401
+
+    # A warm index answers without a query, so the login is checked on its own
+    if not verify_credentials(user, password):
+        return jsonify({"success": False, "message": "Invalid credentials"}), 401
+
+    query = request.args.get('q', '')
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), 100)
+    except ValueError:
+        return jsonify({"success": False, "message": "Limit must be a number"}), 400
+
+    try:
+        product_search_index.ensure_loaded(lambda: fetch_all_products(user, password))
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+    return jsonify({"success": True, "products": product_search_index.search(query, limit)})
+
+@product_bp.route('/products/facets', methods=['GET'])
+@conditional('product')
+def product_facets():
+    """Route to get Category/SubCategory/DBStatus counts and a filtered page of products."""
+    user = request.cookies.get('snowflake_username')
+    password = request.cookies.get('snowflake_password')
+
+    if not user or not password:
+        return jsonify({"success": False, "message": "Missing credentials"}), 401
+
+    # As with search, a warm index answers without a query
+    if not verify_credentials(user, password):
+        return jsonify({"success": False, "message": "Invalid credentials"}), 401
+
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+        page_size = min(max(int(request.args.get('pageSize', 50)), 1), 500)
+    except ValueError:
+        return jsonify({"success": False, "message": "Page and page size must be numbers"}), 400
+
+    try:
+        product_facet_index.ensure_loaded(lambda: fetch_product_facet_rows(user, password))
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+    result = product_facet_index.query(
+        category=request.args.get('category'),
+        subcategory=request.args.get('subcategory'),
+        dbstatus=request.args.get('dbstatus'),
+        page=page,
+        page_size=page_size
+    )
+    return jsonify({"success": True, "page": page, "pageSize": page_size, **result})
+
 @product_bp.route('/planogram/<int:planogram_id>')
+@conditional('product', 'planogram_product')
 def get_planogram_products(planogram_id):
     """Route to get products associated with a specific planogram."""
     user = request.cookies.get('snowflake_username')
@@ -330,17 +539,68 @@ def add_product_to_planogram_route():
     data = request.get_json()
     planogram_id = data.get('planogramId')
     product_id = data.get('productId')
+    upc = data.get('upc')
 
-    if not (planogram_id and product_id):
+    if not (planogram_id and (product_id or upc)):
         return jsonify({"success": False, "message": "Planogram ID and Product ID are required"}), 400
 
     try:
+        if not product_id:
+            product_id = fetch_dbkey_by_upc(user, password, upc)
         insert_product_to_planogram(user, password, planogram_id, product_id)
+        change_log.record('planogram_product', 'insert', product_id, planogram_id)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 404
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
     return jsonify({"success": True}), 201
 
+# UPCs resolved and inserted per step of a bulk add job
+BULK_ADD_CHUNK_SIZE = 1000
+
+@job_task('planogram_add_bulk')
+def add_products_to_planogram_bulk_job(job, user, password, planogram_id, upcs):
+    """Adds products to a planogram in chunks, reporting progress after each one.
+    Each chunk skips products already placed, so a retried job does not duplicate rows."""
+    try:
+        planogram_id = int(planogram_id)
+    except (TypeError, ValueError):
+        raise PermanentJobError(f"Planogram ID must be a number, not {planogram_id!r}")
+    inserted = 0
+    unresolved = []
+    for start in range(0, len(upcs), BULK_ADD_CHUNK_SIZE):
+        chunk = upcs[start:start + BULK_ADD_CHUNK_SIZE]
+        dbkeys = resolve_dbkeys(user, password, chunk)
+        if dbkeys:
+            count = insert_products_to_planogram(user, password, planogram_id, list(dbkeys.values()))
+            if count:
+                inserted += count
+                change_log.record('planogram_product', 'insert', None, planogram_id)
+        unresolved.extend(str(upc) for upc in chunk if str(upc) not in dbkeys)
+        job.progress(start + len(chunk), len(upcs), f"{inserted} products added")
+    return {"inserted": inserted, "unresolved": unresolved}
+
+@product_bp.route('/planogram/add_bulk', methods=['POST'])
+def add_products_to_planogram_bulk_route():
+    """Route to queue adding many products to a planogram by UPC; poll /jobs/<id> for the result."""
+    user = request.cookies.get('snowflake_username')
+    password = request.cookies.get('snowflake_password')
+
+    if not user or not password:
+        return jsonify({"success": False, "message": "Missing credentials"}), 401
+
+    data = request.get_json()
+    planogram_id = data.get('planogramId')
+    upcs = data.get('upcs')
+
+    if not (planogram_id and isinstance(upcs, list) and upcs):
+        return jsonify({"success": False, "message": "Planogram ID and a list of UPCs are required"}), 400
+
+    job_id = job_queue.submit('planogram_add_bulk', user, password,
+                              planogram_id=planogram_id, upcs=[str(upc) for upc in upcs])
+    return jsonify({"success": True, "jobId": job_id, "statusUrl": f"/jobs/{job_id}"}), 202
+
 @product_bp.route('/planogram/delete', methods=['DELETE'])
 def delete_product_from_planogram_route():
     """Route to remove a product from a planogram."""
@@ -359,6 +619,7 @@ def delete_product_from_planogram_route():
 
     try:
         delete_product_from_planogram(user, password, planogram_id, product_id)
+        change_log.record('planogram_product', 'delete', product_id, planogram_id)
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
@@ -0,0 +1,386 @@
+import bisect
+import threading
+from collections import Counter, defaultdict
+from itertools import islice
+
+# Normalize text for indexing and matching
+def normalize(text):
+    return ' '.join(str(text or '').lower().split())
+
+# Split a name into padded word trigrams ("  p", " pr", "pro", ...)
+def trigrams(text):
+    grams = set()
+    for word in normalize(text).split(' '):
+        if not word:
+            continue
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+# Trigrams for a query; the last word is left open so partial words still match
+def query_trigrams(text):
+    grams = set()
+    words = normalize(text).split(' ')
+    for position, word in enumerate(words):
+        if not word:
+            continue
+        padded = f"  {word}" if position == len(words) - 1 else f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+class ProductSearchIndex:
+    """
+    In-memory product lookup: a character trie over UPCs for prefix search
+    and an inverted trigram index over product names for fuzzy name search.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        self.loaded = False
+        self._clear()
+
+    def _clear(self):
+        self._products = {}
+        self._trie = {}
+        self._postings = defaultdict(set)
+        self._ranked = defaultdict(list)
+
+    def load(self, rows):
+        """Replace the index contents with (DBKEY, UPC, ProductName) rows."""
+        with self._lock:
+            self._clear()
+            for dbkey, upc, name in rows:
+                self._add(dbkey, upc, name, bulk=True)
+            for ranked in self._ranked.values():
+                ranked.sort()
+            self.loaded = True
+
+    def ensure_loaded(self, loader):
+        """Build the index with loader() the first time it is needed."""
+        if self.loaded:
+            return
+        with self._load_lock:
+            if not self.loaded:
+                self.load(loader())
+
+    def add(self, dbkey, upc, name):
+        """Insert or replace a product."""
+        with self._lock:
+            if upc in self._products:
+                self._remove(upc)
+            self._add(dbkey, upc, name)
+
+    def remove(self, upc):
+        """Remove a product by UPC."""
+        with self._lock:
+            self._remove(upc)
+
+    def get(self, upc):
+        with self._lock:
+            return self._products.get(upc)
+
+    def __len__(self):
+        return len(self._products)
+
+    def _add(self, dbkey, upc, name, bulk=False):
+        if upc is None:
+            return
+        upc = str(upc)
+        self._products[upc] = (dbkey, upc, name)
+        node = self._trie
+        for char in upc.lower():
+            node = node.setdefault(char, {})
+        node.setdefault('$', set()).add(upc)
+        rank = self._rank(upc)
+        for gram in trigrams(name):
+            self._postings[gram].add(upc)
+            if bulk:
+                self._ranked[gram].append(rank)
+            else:
+                bisect.insort(self._ranked[gram], rank)
+
+    def _remove(self, upc):
+        entry = self._products.pop(upc, None)
+        if entry is None:
+            return
+        path = [self._trie]
+        for char in upc.lower():
+            node = path[-1].get(char)
+            if node is None:
+                break
+            path.append(node)
+        else:
+            path[-1].get('$', set()).discard(upc)
+            # Prune branches that no longer lead to any UPC
+            for char, parent in zip(reversed(upc.lower()), reversed(path[:-1])):
+                child = parent[char]
+                if child.get('$') or len(child) > ('$' in child):
+                    break
+                del parent[char]
+        rank = (len(entry[2] or ''), upc)
+        for gram in trigrams(entry[2]):
+            postings = self._postings.get(gram)
+            if postings is not None:
+                postings.discard(upc)
+                ranked = self._ranked[gram]
+                i = bisect.bisect_left(ranked, rank)
+                if i < len(ranked) and ranked[i] == rank:
+                    del ranked[i]
+                if not postings:
+                    del self._postings[gram]
+                    del self._ranked[gram]
+
+    def _upc_prefix(self, prefix, limit):
+        node = self._trie
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        found = []
+        stack = [node]
+        while stack and len(found) < limit:
+            current = stack.pop()
+            found.extend(sorted(current.get('$', ())))
+            stack.extend(current[char] for char in sorted(current, reverse=True) if char != '$')
+        return found[:limit]
+
+    def _rank(self, upc):
+        # Shorter names rank first among equally good matches
+        return (len(self._products[upc][2] or ''), upc)
+
+    def _name_matches(self, query, limit):
+        grams = sorted(query_trigrams(query), key=lambda g: len(self._postings.get(g, ())))
+        if not grams or not self._postings.get(grams[0]):
+            rarest = None
+        else:
+            rarest = grams[0]
+
+        # Full matches: walk the rarest posting list in rank order and keep
+        # names that contain every other query trigram, stopping at limit.
+        matches = []
+        if rarest is not None:
+            others = [self._postings.get(g, ()) for g in grams[1:]]
+            for _, upc in self._ranked[rarest]:
+                if all(upc in postings for postings in others):
+                    matches.append((upc, 1.0))
+                    if len(matches) >= limit:
+                        return matches
+
+        # Partial matches: a name sharing at least half of the query trigrams
+        # must appear in one of the rarest len(grams) - threshold + 1 lists.
+        threshold = max(1, (len(grams) + 1) // 2)
+        seen = {upc for upc, _ in matches}
+        candidates = set()
+        for gram in grams[:len(grams) - threshold + 1]:
+            candidates.update(self._postings.get(gram, ()))
+        candidates -= seen
+        scored = []
+        for upc in candidates:
+            score = sum(1 for gram in grams if upc in self._postings.get(gram, ()))
+            if score >= threshold:
+                scored.append((-score, self._rank(upc)))
+        scored.sort()
+        for negative_score, (_, upc) in scored[:limit - len(matches)]:
+            matches.append((upc, -negative_score / len(grams)))
+        return matches
+
+    def search(self, query, limit=10):
+        """Return up to limit matches, UPC hits first, then name matches by score."""
+        query = normalize(query)
+        if not query:
+            return []
+        with self._lock:
+            results = []
+            seen = set()
+            for upc in self._upc_prefix(query.replace(' ', ''), limit):
+                results.append((upc, 2.0 if upc.lower() == query else 1.5))
+                seen.add(upc)
+            for upc, score in self._name_matches(query, limit):
+                if upc not in seen:
+                    results.append((upc, score))
+                    seen.add(upc)
+            results.sort(key=lambda item: -item[1])
+            return [
+                {
+                    "dbKey": self._products[upc][0],
+                    "upc": upc,
+                    "productName": self._products[upc][2],
+                    "score": round(score, 3)
+                }
+                for upc, score in results[:limit]
+            ]
+
+# Normalize a DBStatus value so 1 and "1" count as the same facet
+def status_value(dbstatus):
+    try:
+        return int(dbstatus)
+    except (TypeError, ValueError):
+        return dbstatus
+
+class ProductFacetIndex:
+    """
+    Category / SubCategory / DBStatus facet counts over the product catalog,
+    maintained incrementally, plus member sets for filtered paging and the
+    catalog presorted by (name, UPC) so a page is a slice, not a sort.
+    """
+
+    FACETS = ('category', 'subcategory', 'dbstatus')
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        self.loaded = False
+        self._clear()
+
+    def _clear(self):
+        self._products = {}
+        self._counts = {facet: Counter() for facet in self.FACETS}
+        self._members = {facet: defaultdict(set) for facet in self.FACETS}
+        self._order = []
+
+    def load(self, rows):
+        """Replace the index with (DBKEY, UPC, ProductName, Category, SubCategory, DBStatus) rows."""
+        with self._lock:
+            self._clear()
+            for row in rows:
+                self._add(*row, ordered=False)
+            self._order = sorted(self._sort_key(entry) for entry in self._products.values())
+            self.loaded = True
+
+    def ensure_loaded(self, loader):
+        """Build the index with loader() the first time it is needed."""
+        if self.loaded:
+            return
+        with self._load_lock:
+            if not self.loaded:
+                self.load(loader())
+
+    def upsert(self, dbkey, upc, name, category, subcategory, dbstatus):
+        """Insert or replace a product, moving its counts to the new facet values."""
+        with self._lock:
+            if dbkey is None and upc in self._products:
+                dbkey = self._products[upc][0]
+            self._remove(upc)
+            self._add(dbkey, upc, name, category, subcategory, dbstatus)
+
+    def remove(self, upc):
+        with self._lock:
+            self._remove(upc)
+
+    def __len__(self):
+        return len(self._products)
+
+    def _facet_values(self, category, subcategory, dbstatus):
+        return {
+            'category': category,
+            'subcategory': (category, subcategory),
+            'dbstatus': status_value(dbstatus)
+        }
+
+    @staticmethod
+    def _sort_key(entry):
+        return (str(entry[2] or ''), entry[1])
+
+    def _add(self, dbkey, upc, name, category, subcategory, dbstatus, ordered=True):
+        if upc is None:
+            return
+        upc = str(upc)
+        entry = self._products[upc] = (dbkey, upc, name, category, subcategory, status_value(dbstatus))
+        if ordered:
+            bisect.insort(self._order, self._sort_key(entry))
+        for facet, value in self._facet_values(category, subcategory, dbstatus).items():
+            self._counts[facet][value] += 1
+            self._members[facet][value].add(upc)
+
+    def _remove(self, upc):
+        entry = self._products.pop(str(upc), None)
+        if entry is None:
+            return
+        key = self._sort_key(entry)
+        i = bisect.bisect_left(self._order, key)
+        if i < len(self._order) and self._order[i] == key:
+            del self._order[i]
+        for facet, value in self._facet_values(*entry[3:]).items():
+            self._counts[facet][value] -= 1
+            if self._counts[facet][value] <= 0:
+                del self._counts[facet][value]
+            members = self._members[facet].get(value)
+            if members is not None:
+                members.discard(entry[1])
+                if not members:
+                    del self._members[facet][value]
+
+    def _matching(self, category=None, subcategory=None, dbstatus=None):
+        filters = []
+        if category is not None and subcategory is not None:
+            filters.append(self._members['subcategory'].get((category, subcategory), set()))
+        elif category is not None:
+            filters.append(self._members['category'].get(category, set()))
+        elif subcategory is not None:
+            filters.append(set().union(*(
+                members for (_, sub), members in self._members['subcategory'].items() if sub == subcategory
+            )))
+        if dbstatus is not None:
+            filters.append(self._members['dbstatus'].get(status_value(dbstatus), set()))
+        if not filters:
+            return None
+        filters.sort(key=len)
+        return filters[0].intersection(*filters[1:])
+
+    def query(self, category=None, subcategory=None, dbstatus=None, page=1, page_size=50):
+        """
+        Return facet counts for the filtered set and one page of its products.
+        Without filters the maintained global counters are returned as-is.
+        """
+        with self._lock:
+            matching = self._matching(category, subcategory, dbstatus)
+            start = (page - 1) * page_size
+            if matching is None:
+                counts = self._counts
+                total = len(self._order)
+                page_upcs = [upc for _, upc in self._order[start:start + page_size]]
+            else:
+                counts = {facet: Counter() for facet in self.FACETS}
+                for upc in matching:
+                    entry = self._products[upc]
+                    for facet, value in self._facet_values(*entry[3:]).items():
+                        counts[facet][value] += 1
+                total = len(matching)
+                # Walk the presorted catalog, stopping once the page is filled
+                page_upcs = list(islice((upc for _, upc in self._order if upc in matching), start, start + page_size))
+
+            return {
+                "total": total,
+                "facets": {
+                    "category": [
+                        {"value": value, "count": count}
+                        for value, count in sorted(counts['category'].items(), key=lambda item: (-item[1], str(item[0])))
+                    ],
+                    "subcategory": [
+                        {"category": value[0], "value": value[1], "count": count}
+                        for value, count in sorted(counts['subcategory'].items(), key=lambda item: (-item[1], str(item[0])))
+                    ],
+                    "dbStatus": [
+                        {"value": value, "count": count}
+                        for value, count in sorted(counts['dbstatus'].items(), key=lambda item: (-item[1], str(item[0])))
+                    ]
+                },
+                "products": [
+                    {
+                        "dbKey": entry[0],
+                        "upc": entry[1],
+                        "productName": entry[2],
+                        "category": entry[3],
+                        "subcategory": entry[4],
+                        "dbstatus": entry[5]
+                    }
+                    for entry in (self._products[upc] for upc in page_upcs)
+                ]
+            }
+
+# Shared indexes used by the product routes
+product_search_index = ProductSearchIndex()
+product_facet_index = ProductFacetIndex()
@@ -0,0 +1,113 @@
+# Shared helpers for building parameterized lookup queries
+
+# Escape LIKE wildcards so user input is matched literally (use with ESCAPE '\\')
+def escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+# Draw the key for a row about to be inserted into table from the table's
+# sequence (migrations/002), so the INSERT names its own DBKEY. Reading the
+# key back after the insert could return a row another session added.
+def next_key(cursor, table):
+    cursor.execute(f"SELECT {table}_SEQ.NEXTVAL")
+    return cursor.fetchone()[0]
+
+# Parse a result limit from a query string value, clamped to [1, maximum]
+def clamp_limit(value, default=20, maximum=100):
+    try:
+        limit = int(value) if value not in (None, '') else default
+    except (TypeError, ValueError):
+        raise ValueError("Limit must be a number")
+    return min(max(limit, 1), maximum)
+
+# Build a relevance-ordered typeahead query over one name column.
+# Exact matches sort first, then prefix matches, then substring matches,
+# with shorter names ahead of longer ones.
+def typeahead_query(table, key_column, name_column, columns, text, limit):
+    text = (text or '').strip()
+    select = f"SELECT {', '.join(columns)} FROM {table}"
+    if not text:
+        return f"{select} ORDER BY {name_column} LIMIT %s", (limit,)
+
+    escaped = escape_like(text)
+    query = f"""
+        {select}
+        WHERE {name_column} ILIKE %s ESCAPE '\\\\' OR TO_VARCHAR({key_column}) = %s
+        ORDER BY
+            CASE
+                WHEN LOWER({name_column}) = LOWER(%s) OR TO_VARCHAR({key_column}) = %s THEN 0
+                WHEN {name_column} ILIKE %s ESCAPE '\\\\' THEN 1
+                ELSE 2
+            END,
+            LENGTH({name_column}),
+            {name_column}
+        LIMIT %s
+    """
+    return query, (f"%{escaped}%", text, text, text, f"{escaped}%", limit)
+
+# Filter, sort and paging arguments accepted by list endpoints
+class ListArgs:
+    def __init__(self, text, column, sort, direction, limit, offset):
+        self.text = text
+        self.column = column
+        self.sort = sort
+        self.direction = direction
+        self.limit = limit
+        self.offset = offset
+
+    # Everything that selects the page, for use in cache keys
+    def cursor(self):
+        return (self.text, self.column, self.sort, self.direction, self.limit, self.offset)
+
+# Parse list arguments from a query string, validating column names against
+# the endpoint's whitelist so only known columns reach the SQL text.
+def parse_list_args(args, columns, default_limit=200, max_limit=1000):
+    text = (args.get('q') or '').strip()
+    column = args.get('column') or None
+    if column is not None and column not in columns:
+        raise ValueError(f"Unknown filter column: {column}")
+    sort = args.get('sort') or None
+    if sort is not None and sort not in columns:
+        raise ValueError(f"Unknown sort column: {sort}")
+    direction = (args.get('dir') or 'asc').lower()
+    if direction not in ('asc', 'desc'):
+        raise ValueError("Sort direction must be 'asc' or 'desc'")
+    limit = clamp_limit(args.get('limit'), default_limit, max_limit)
+    try:
+        offset = max(int(args.get('offset') or 0), 0)
+    except ValueError:
+        raise ValueError("Offset must be a number")
+    return ListArgs(text, column, sort, direction, limit, offset)
+
+# Build a filtered, sorted and paged list query.
+# columns maps API column names to SQL expressions; select_columns are the
+# returned columns. A running total is appended as the last column so the
+# page and the match count come back in one query.
+def list_query(select_columns, from_clause, columns, key_column, list_args, where=None, where_params=()):
+    clauses = [where] if where else []
+    params = list(where_params)
+
+    if list_args.text:
+        pattern = f"%{escape_like(list_args.text)}%"
+        targets = [columns[list_args.column]] if list_args.column else list(columns.values())
+        clauses.append("(" + " OR ".join(f"TO_VARCHAR({target}) ILIKE %s ESCAPE '\\\\'" for target in targets) + ")")
+        params.extend([pattern] * len(targets))
+
+    order = key_column
+    if list_args.sort:
+        order = f"{columns[list_args.sort]} {list_args.direction.upper()}, {key_column}"
+
+    query = f"SELECT {', '.join(select_columns)}, COUNT(*) OVER () FROM {from_clause}"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += f" ORDER BY {order} LIMIT %s OFFSET %s"
+    params.extend([list_args.limit, list_args.offset])
+    return query, tuple(params)
+
+# Split the running total off list query rows
+def list_payload(rows, list_args):
+    return {
+        "rows": [list(row[:-1]) for row in rows],
+        "total": rows[0][-1] if rows else (0 if list_args.offset == 0 else None),
+        "limit": list_args.limit,
+        "offset": list_args.offset
+    }
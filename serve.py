@@ -0,0 +1,62 @@
+"""
+Serve the app outside the Flask debug server.
+
+    python serve.py --mode gevent     # one greenlet per request (default)
+    python serve.py --mode threaded   # one OS thread per request
+
+In gevent mode the standard library is monkey-patched, so a request waiting
+on the warehouse (db.wait_for_query sleeps between status polls) yields to
+the others instead of holding a thread. Hundreds of warehouse calls can be
+in flight from one process.
+"""
+import argparse
+from config import Config
+
+# Serve the app until interrupted. prepare, if given, runs after gevent has
+# patched the standard library and before the app is imported.
+def run(mode, host, port, concurrency, prepare=None):
+    if mode == 'gevent':
+        try:
+            from gevent import monkey
+        except ImportError:
+            raise SystemExit("gevent is not installed: pip install gevent, or use --mode threaded")
+        # Patch before the app (and the Snowflake connector) are imported
+        monkey.patch_all()
+        from gevent.pool import Pool
+        from gevent.pywsgi import WSGIHandler, WSGIServer
+        if prepare:
+            prepare()
+        from app import create_app
+
+        # Expose the client socket so queries can be cancelled when it closes
+        class SocketHandler(WSGIHandler):
+            def get_environ(self):
+                environ = super().get_environ()
+                environ['gevent.socket'] = self.socket
+                return environ
+
+        server = WSGIServer((host, port), create_app(), spawn=Pool(concurrency), handler_class=SocketHandler)
+        print(f"Serving on http://{host}:{port} (gevent, {concurrency} concurrent requests)")
+        server.serve_forever()
+    else:
+        from werkzeug.serving import make_server
+        if prepare:
+            prepare()
+        from app import create_app
+
+        server = make_server(host, port, create_app(), threaded=True)
+        print(f"Serving on http://{host}:{port} (threaded)")
+        server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the planogram app")
+    parser.add_argument('--mode', choices=('gevent', 'threaded'), default='gevent')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=Config.SERVER_CONCURRENCY,
+                        help="maximum requests handled at once in gevent mode")
+    args = parser.parse_args()
+    run(args.mode, args.host, args.port, args.concurrency)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,343 @@
+import math
+import threading
+import time
+from array import array
+from flask import Blueprint, request, jsonify
+from config import Config
+from db import LoginFailed, connect, query_budget, verify_credentials
+from admission import ANALYTIC, workload
+
+simulation_bp = Blueprint('simulation', __name__)
+
+# Helper function to establish a Snowflake connection
+def get_snowflake_connection(user, password):
+    """Establish a connection to Snowflake using provided credentials."""
+    return connect(user, password)
+
+# Parse a "WxHxD" dimensions string into three floats (0.0 for anything missing)
+def parse_dimensions(dimensions):
+    parts = []
+    for part in str(dimensions or '').lower().split('x')[:3]:
+        try:
+            parts.append(float(part.strip()))
+        except ValueError:
+            parts.append(0.0)
+    return tuple(parts + [0.0] * (3 - len(parts)))
+
+class PlanogramModel:
+    """
+    Columnar in-memory snapshot of one planogram: one array per column,
+    one slot per position, with product geometry and performance joined in.
+    """
+
+    def __init__(self, planogram_id, rows):
+        self.planogram_id = planogram_id
+        self.loaded_at = time.time()
+        self.position_ids = array('q')
+        self.product_ids = array('q')
+        self.h_facing = array('l')
+        self.v_facing = array('l')
+        self.d_facing = array('l')
+        self.width = array('d')
+        self.height = array('d')
+        self.depth = array('d')
+        self.unit_movement = array('d')
+        self.sales = array('d')
+        self.margin = array('d')
+        self.cost = array('d')
+        self.index_by_position = {}
+        self.index_by_product = {}
+
+        for row in rows:
+            (position_id, product_id, h_facing, v_facing, d_facing,
+             dimensions, unit_movement, sales, margin, cost) = row
+            width, height, depth = parse_dimensions(dimensions)
+            slot = len(self.position_ids)
+            self.position_ids.append(position_id)
+            self.product_ids.append(product_id)
+            self.h_facing.append(h_facing or 0)
+            self.v_facing.append(v_facing or 0)
+            self.d_facing.append(d_facing or 0)
+            self.width.append(width)
+            self.height.append(height)
+            self.depth.append(depth)
+            self.unit_movement.append(float(unit_movement or 0))
+            self.sales.append(float(sales or 0))
+            self.margin.append(float(margin or 0))
+            self.cost.append(float(cost or 0))
+            self.index_by_position[position_id] = slot
+            self.index_by_product.setdefault(product_id, slot)
+
+    def __len__(self):
+        return len(self.position_ids)
+
+    def resolve_slot(self, change):
+        """Find the position slot a change refers to, by positionId or productId."""
+        if change.get('positionId') is not None:
+            return self.index_by_position.get(int(change['positionId']))
+        if change.get('productId') is not None:
+            return self.index_by_product.get(int(change['productId']))
+        return None
+
+    def simulate(self, changes, elasticity, period_days):
+        """
+        Apply hypothetical facing changes to copies of the facing columns and
+        recompute capacity, days of supply and projected sales/margin.
+        The model itself is never modified, so it can be shared between requests.
+        """
+        h_facing = array('l', self.h_facing)
+        v_facing = array('l', self.v_facing)
+        d_facing = array('l', self.d_facing)
+        changed = set()
+        unknown = []
+
+        for change in changes:
+            slot = self.resolve_slot(change)
+            if slot is None:
+                unknown.append(change)
+                continue
+            if change.get('hFacing') is not None:
+                h_facing[slot] = int(change['hFacing'])
+            if change.get('vFacing') is not None:
+                v_facing[slot] = int(change['vFacing'])
+            if change.get('dFacing') is not None:
+                d_facing[slot] = int(change['dFacing'])
+            changed.add(slot)
+
+        baseline = self._totals(self.h_facing, self.v_facing, self.d_facing, elasticity, period_days)
+        scenario = self._totals(h_facing, v_facing, d_facing, elasticity, period_days)
+        positions = [
+            {
+                "positionId": self.position_ids[slot],
+                "productId": self.product_ids[slot],
+                "before": self._position_kpis(slot, self.h_facing, self.v_facing, self.d_facing, elasticity, period_days),
+                "after": self._position_kpis(slot, h_facing, v_facing, d_facing, elasticity, period_days)
+            }
+            for slot in sorted(changed)
+        ]
+        return baseline, scenario, positions, unknown
+
+    def _lift(self, slot, h, elasticity):
+        # Space elasticity: sales respond to the ratio of new to baseline front facings
+        base_h = self.h_facing[slot]
+        if base_h <= 0:
+            return 1.0
+        return (h / base_h) ** elasticity if h > 0 else 0.0
+
+    def _position_kpis(self, slot, h_facing, v_facing, d_facing, elasticity, period_days):
+        h, v, d = h_facing[slot], v_facing[slot], d_facing[slot]
+        capacity = h * v * d
+        lift = self._lift(slot, h, elasticity)
+        unit_movement = self.unit_movement[slot] * lift
+        daily_movement = unit_movement / period_days if period_days else 0.0
+        return {
+            "hFacing": h,
+            "vFacing": v,
+            "dFacing": d,
+            "capacity": capacity,
+            "linearWidth": h * self.width[slot],
+            "unitMovement": round(unit_movement, 2),
+            "daysOfSupply": round(capacity / daily_movement, 2) if daily_movement else None,
+            "sales": round(self.sales[slot] * lift, 2),
+            "margin": round(self.margin[slot] * lift, 2),
+            "cost": round(self.cost[slot] * lift, 2)
+        }
+
+    def _totals(self, h_facing, v_facing, d_facing, elasticity, period_days):
+        capacity = 0
+        linear_width = 0.0
+        sales = margin = cost = movement = 0.0
+        for slot in range(len(self.position_ids)):
+            kpis = self._position_kpis(slot, h_facing, v_facing, d_facing, elasticity, period_days)
+            capacity += kpis["capacity"]
+            linear_width += kpis["linearWidth"]
+            sales += kpis["sales"]
+            margin += kpis["margin"]
+            cost += kpis["cost"]
+            movement += kpis["unitMovement"]
+        daily_movement = movement / period_days if period_days else 0.0
+        return {
+            "positions": len(self.position_ids),
+            "capacity": capacity,
+            "linearWidth": round(linear_width, 2),
+            "daysOfSupply": round(capacity / daily_movement, 2) if daily_movement else None,
+            "sales": round(sales, 2),
+            "margin": round(margin, 2),
+            "cost": round(cost, 2)
+        }
+
+# Loaded planogram models, keyed by planogram ID
+_models = {}
+_models_lock = threading.Lock()
+
+# Fetch positions joined with product geometry and performance for one planogram
+def fetch_planogram_model_rows(user, password, planogram_id):
+    query = """
+        SELECT pos.DBKEY, pos.DBPRODUCTPARENTKEY, pos.HFACING, pos.VFACING, pos.DFACING,
+               p.DIMENSIONS, perf.UNITMOVEMENT, perf.SALES, perf.MARGEN, perf.COST
+        FROM NEWCKB.PUBLIC.IX_SPC_POSITION pos
+        LEFT JOIN NEWCKB.PUBLIC.ITX_SPC_PRODUCT p
+        ON pos.DBPRODUCTPARENTKEY = p.DBKEY
+        LEFT JOIN NEWCKB.PUBLIC.IX_SPC_PERFORMANCE perf
+        ON perf.DBPLANOGRAMPARENTKEY = pos.DBPLANOGRAMPARENTKEY
+        AND perf.DBPRODUCTPARENTKEY = pos.DBPRODUCTPARENTKEY
+        WHERE pos.DBPLANOGRAMPARENTKEY = %s
+        ORDER BY pos.DBKEY
+    """
+    with get_snowflake_connection(user, password) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(query, (planogram_id,))
+            return cursor.fetchall()
+
+# Return the cached model for a planogram, loading it on first use or when stale.
+# A cached model skips the query, so the caller's login is checked separately.
+def get_planogram_model(user, password, planogram_id, reload=False):
+    with _models_lock:
+        model = _models.get(planogram_id)
+    if model and not reload and time.time() - model.loaded_at < Config.SIMULATION_MODEL_TTL:
+        if not verify_credentials(user, password):
+            raise LoginFailed("Invalid credentials")
+        return model
+
+    model = PlanogramModel(planogram_id, fetch_planogram_model_rows(user, password, planogram_id))
+    with _models_lock:
+        _models[planogram_id] = model
+    return model
+
+# Drop a cached model so the next simulation reloads it from the database
+def invalidate_planogram_model(planogram_id):
+    try:
+        planogram_id = int(planogram_id)
+    except (TypeError, ValueError):
+        return
+    with _models_lock:
+        _models.pop(planogram_id, None)
+
+# Drop the cached models that contain a position (its old planogram after a move)
+def invalidate_position_models(position_id):
+    try:
+        position_id = int(position_id)
+    except (TypeError, ValueError):
+        return
+    with _models_lock:
+        for planogram_id in [key for key, model in _models.items() if position_id in model.index_by_position]:
+            del _models[planogram_id]
+
+# Drop every cached model, for writes that cannot be traced to one planogram
+def invalidate_all_planogram_models():
+    with _models_lock:
+        _models.clear()
+
+FACING_FIELDS = ('hFacing', 'vFacing', 'dFacing')
+
+def whole_number(value, name):
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"{name} must be a whole number")
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError(f"{name} must be a whole number")
+        return int(value)
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a whole number")
+
+# Check one requested change and return it with numeric fields as ints
+def parse_change(change):
+    if not isinstance(change, dict):
+        raise ValueError("Each change must be an object")
+    parsed = dict(change)
+    for field in ('positionId', 'productId') + FACING_FIELDS:
+        if change.get(field) is not None:
+            parsed[field] = whole_number(change[field], field)
+    for field in FACING_FIELDS:
+        if parsed.get(field) is not None and parsed[field] < 0:
+            raise ValueError(f"{field} cannot be negative")
+    return parsed
+
+# Parse a finite number from the request body, or the default when absent
+def finite_number(data, name, default):
+    value = data.get(name, default)
+    if isinstance(value, bool):
+        raise ValueError(name)
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(name)
+    return number
+
+# Route to run a what-if facing simulation against a planogram
+@simulation_bp.route('/simulation/<int:planogram_id>', methods=['POST'])
+@query_budget(Config.QUERY_TIMEOUT_LONG)
+@workload(ANALYTIC)
+def simulate_planogram(planogram_id):
+    """Recompute planogram KPIs for hypothetical facing changes without writing anything."""
+    user = request.cookies.get('snowflake_username')
+    password = request.cookies.get('snowflake_password')
+
+    if not user or not password:
+        return jsonify({"success": False, "message": "Missing credentials"}), 401
+
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        return jsonify({"success": False, "message": "Request body must be an object"}), 400
+    changes = data.get('changes') or []
+    if not isinstance(changes, list):
+        return jsonify({"success": False, "message": "Changes must be a list"}), 400
+
+    try:
+        changes = [parse_change(change) for change in changes]
+    except ValueError as e:
+        return jsonify({"success": False, "message": f"Invalid change: {e}"}), 400
+
+    try:
+        elasticity = finite_number(data, 'elasticity', Config.SIMULATION_SPACE_ELASTICITY)
+        period_days = finite_number(data, 'periodDays', Config.SIMULATION_MOVEMENT_PERIOD_DAYS)
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "message": "Elasticity and period days must be finite numbers"}), 400
+    if period_days <= 0:
+        return jsonify({"success": False, "message": "Period days must be positive"}), 400
+
+    try:
+        model = get_planogram_model(user, password, planogram_id, reload=bool(data.get('reload')))
+    except LoginFailed:
+        return jsonify({"success": False, "message": "Invalid credentials"}), 401
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+    if not len(model):
+        return jsonify({"success": False, "message": "Planogram has no positions"}), 404
+
+    started = time.perf_counter()
+    try:
+        baseline, scenario, positions, unknown = model.simulate(changes, elasticity, period_days)
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "message": f"Invalid change: {e}"}), 400
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    return jsonify({
+        "success": True,
+        "planogramId": planogram_id,
+        "modelLoadedAt": model.loaded_at,
+        "baseline": baseline,
+        "scenario": scenario,
+        "positions": positions,
+        "unmatchedChanges": unknown,
+        "elapsedMs": round(elapsed_ms, 3)
+    })
+
+# Route to discard a cached planogram model
+@simulation_bp.route('/simulation/<int:planogram_id>/reload', methods=['POST'])
+@query_budget(Config.QUERY_TIMEOUT_LONG)
+@workload(ANALYTIC)
+def reload_planogram_model(planogram_id):
+    """Force the next simulation for this planogram to reload from the database."""
+    user = request.cookies.get('snowflake_username')
+    password = request.cookies.get('snowflake_password')
+
+    if not user or not password:
+        return jsonify({"success": False, "message": "Missing credentials"}), 401
+
+    invalidate_planogram_model(planogram_id)
+    return jsonify({"success": True}), 200
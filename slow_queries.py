@@ -0,0 +1,169 @@
+import hmac
+import json
+import logging
+import threading
+import time
+from collections import deque
+from flask import Blueprint, g, has_request_context, request, jsonify
+from config import Config
+from metrics import fingerprint, normalize_statement
+
+slow_queries_bp = Blueprint('slow_queries', __name__)
+
+logger = logging.getLogger('slow_query')
+
+# Bind parameters are kept for replaying a slow statement, shortened so a
+# bulk payload (a JSON list of thousands of UPCs) cannot fill the buffer
+PARAM_MAX_ITEMS = 50
+PARAM_MAX_CHARS = 200
+
+def shorten_param(value):
+    if isinstance(value, (bytes, bytearray)):
+        return f"<{len(value)} bytes>"
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    text = str(value)
+    return text if len(text) <= PARAM_MAX_CHARS else text[:PARAM_MAX_CHARS] + f"... ({len(text)} chars)"
+
+def shorten_params(params):
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: shorten_param(value) for key, value in list(params.items())[:PARAM_MAX_ITEMS]}
+    params = list(params)
+    shortened = [shorten_param(value) for value in params[:PARAM_MAX_ITEMS]]
+    if len(params) > PARAM_MAX_ITEMS:
+        shortened.append(f"... ({len(params)} params)")
+    return shortened
+
+class SlowQueryLog:
+    """
+    Bounded record of statements that ran longer than threshold seconds.
+
+    Keeps the most recent slow executions (with bind params and query ids)
+    in a ring buffer, and a summary per statement fingerprint. Until a
+    fingerprint has a plan, each slow execution captures one with the
+    caller's explain function, so the plan is on hand before anyone asks.
+    """
+
+    def __init__(self, threshold, size, explain):
+        self.threshold = threshold
+        self.explain = explain
+        self._lock = threading.Lock()
+        self._entries = deque(maxlen=size)
+        self._fingerprints = {}
+        self._capturing = set()
+
+    def record(self, statement, params, seconds, query_id, error=None, explain=None):
+        """
+        Record one execution if it was slow; explain() returns its plan as text.
+        If the fingerprint has no plan yet and none is being captured, this
+        returns a function that captures it, for the caller to run once it
+        has given up its warehouse slot; otherwise None.
+        """
+        if seconds < self.threshold:
+            return
+        key = fingerprint(statement)
+        entry = {
+            "fingerprint": key,
+            "seconds": round(seconds, 3),
+            "queryId": query_id,
+            "params": shorten_params(params),
+            "at": time.time()
+        }
+        if error is not None:
+            entry["error"] = str(error)
+        if has_request_context():
+            entry["route"] = request.endpoint
+            entry["user"] = request.cookies.get('snowflake_username')
+            entry["requestId"] = g.get('request_id')
+
+        with self._lock:
+            self._entries.append(entry)
+            summary = self._fingerprints.get(key)
+            if summary is None:
+                summary = self._fingerprints[key] = {
+                    "fingerprint": key,
+                    "statement": normalize_statement(statement),
+                    "count": 0,
+                    "totalSeconds": 0.0,
+                    "maxSeconds": 0.0,
+                    "lastQueryId": None,
+                    "plan": None
+                }
+            summary["count"] += 1
+            summary["totalSeconds"] += seconds
+            summary["maxSeconds"] = max(summary["maxSeconds"], seconds)
+            summary["lastQueryId"] = query_id
+            capture = (self.explain and explain is not None
+                       and summary["plan"] is None and key not in self._capturing)
+            if capture:
+                self._capturing.add(key)
+        logger.warning(json.dumps(entry))
+
+        if capture:
+            return lambda: self._capture_plan(key, summary, explain)
+        return None
+
+    # Explained outside the lock; a failed EXPLAIN is kept as the plan text
+    def _capture_plan(self, key, summary, explain):
+        plan = None
+        try:
+            plan = explain()
+        except Exception as e:
+            plan = f"EXPLAIN failed: {e}"
+        finally:
+            with self._lock:
+                summary["plan"] = plan
+                self._capturing.discard(key)
+
+    def stats(self):
+        with self._lock:
+            entries = list(self._entries)
+            summaries = [dict(summary) for summary in self._fingerprints.values()]
+        for summary in summaries:
+            summary["totalSeconds"] = round(summary["totalSeconds"], 3)
+            summary["maxSeconds"] = round(summary["maxSeconds"], 3)
+        return {
+            "thresholdSeconds": self.threshold,
+            "recent": entries[::-1],
+            "fingerprints": sorted(summaries, key=lambda summary: summary["totalSeconds"], reverse=True)
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._fingerprints.clear()
+
+# Shared slow query log for every statement run through db.py
+slow_query_log = SlowQueryLog(Config.SLOW_QUERY_THRESHOLD, Config.SLOW_QUERY_LOG_SIZE, Config.SLOW_QUERY_EXPLAIN)
+
+# The log holds every user's statements, so its routes are for operators
+# holding SLOW_QUERY_ADMIN_TOKEN, not for any logged-in planner. The other
+# operator stats routes (admission, warehouses) check the same token.
+def admin_denied():
+    if not Config.SLOW_QUERY_ADMIN_TOKEN:
+        return jsonify({"success": False, "message": "Operator routes are disabled"}), 403
+    token = request.headers.get('X-Admin-Token', '')
+    if not hmac.compare_digest(token.encode(), Config.SLOW_QUERY_ADMIN_TOKEN.encode()):
+        return jsonify({"success": False, "message": "Admin token required"}), 403
+    return None
+
+# Route to get recent slow queries and a summary per fingerprint
+@slow_queries_bp.route('/slow_queries', methods=['GET'])
+def slow_queries():
+    denied = admin_denied()
+    if denied:
+        return denied
+
+    return jsonify({"success": True, "stats": slow_query_log.stats()})
+
+# Route to empty the slow query log
+@slow_queries_bp.route('/slow_queries/clear', methods=['POST'])
+def clear_slow_queries():
+    denied = admin_denied()
+    if denied:
+        return denied
+
+    slow_query_log.clear()
+    return jsonify({"success": True})
@@ -0,0 +1,64 @@
+// Live change feed: subscribes to the server's /events stream for a set of
+// tables (optionally only one parent key, e.g. the cluster a page shows) and
+// hands batches of row-level change events to onChanges, so open pages stay
+// current without polling. EventSource reconnects by itself when the server
+// ends a stream and resumes from the last event it received. When the server
+// refuses a stream (too many open), the feed is reopened after retryDelay.
+function subscribeChanges({ tables, parent = null, onChanges, delay = 200, retryDelay = 10000 }) {
+    const query = new URLSearchParams({ tables: tables.join(',') });
+    if (parent !== null && parent !== '') {
+        query.set('parent', parent);
+    }
+    let events = null;
+    let lastEventId = '';
+    let reopenTimer = null;
+    let closed = false;
+    let batch = [];
+    let timer = null;
+
+    // Changes often arrive in bursts (bulk adds), so apply them together
+    function onChange(event) {
+        lastEventId = event.lastEventId || lastEventId;
+        batch.push(JSON.parse(event.data));
+        if (timer === null) {
+            timer = setTimeout(() => {
+                const changes = batch;
+                batch = [];
+                timer = null;
+                onChanges(changes);
+            }, delay);
+        }
+    }
+
+    function open() {
+        if (lastEventId) {
+            query.set('lastEventId', lastEventId);
+        }
+        events = new EventSource(`/events?${query}`);
+        events.addEventListener('change', onChange);
+        events.addEventListener('error', () => {
+            // CLOSED means the browser gave up (an error response), not a dropped stream
+            if (events.readyState === EventSource.CLOSED && !closed) {
+                reopenTimer = setTimeout(open, retryDelay);
+            }
+        });
+    }
+
+    open();
+    return {
+        close: () => {
+            closed = true;
+            clearTimeout(reopenTimer);
+            events.close();
+        }
+    };
+}
+
+// Apply a batch of changes to a virtual table: rows deleted from the given
+// table are removed locally; anything else reloads the visible rows.
+function patchVirtualTable(virtualTable, changes, table) {
+    const deletes = changes.every(change => change.table === table && change.op === 'delete' && change.key !== null);
+    if (!deletes || !changes.every(change => virtualTable.remove(change.key))) {
+        virtualTable.reload();
+    }
+}
@@ -48,39 +48,54 @@ document.addEventListener('DOMContentLoaded', async () => {
         }
     });
 
-    // Fetch and populate items
+    // Build a table row from a JSON list row
+    const renderRow = row => buildItemRow([buildLink(`/stfloorplan?storeId=${row[0]}`, row[0], 'store-link'), row[1], row[2], row[3]], row[0], [['delete-button', 'Delete']]);
+
+    // Render only the visible rows, loading pages from the list endpoint as the table scrolls
+    const virtualTable = createVirtualTable({
+        viewport: document.getElementById('tableViewport'),
+        table: itemsContainer,
+        renderRow,
+        source: listSource('/clstore/list', { clusterId: currentClusterId }),
+        pageSize: Number(itemsContainer.dataset.pageSize),
+        total: Number(itemsContainer.dataset.total),
+        onError: error => showMessage('error', error.message)
+    });
+
+    // Filter and sort on the server; each change restarts the table from the top
+    createListQuery({
+        table: itemsContainer,
+        input: filterInput,
+        onChange: params => virtualTable.reload(listSource('/clstore/list', { ...params, clusterId: currentClusterId }))
+    });
+
+    // Reload the visible rows after a change, keeping the current filter and sort
     async function fetchItems() {
-        try {
-            const response = await fetch(`/clstore?clusterId=${currentClusterId}`);
-            const data = await response.text();
-            console.log('Fetched HTML:', data); // Log the fetched HTML for inspection
-            const parser = new DOMParser();
-            const doc = parser.parseFromString(data, 'text/html');
-            const newTbody = doc.querySelector('#itemsContainer tbody').innerHTML;
-            console.log('New TBody content:', newTbody); // Log the new table body content
-            itemsContainer.querySelector('tbody').innerHTML = newTbody;
-        } catch (error) {
-            console.error('Error fetching cluster store data:', error);
-            showMessage('error', 'Failed to load cluster store data.');
-        }
+        virtualTable.reload();
     }
 
-    await fetchItems();
+    // Apply changes made in other tabs: removals are patched in place
+    subscribeChanges({
+        tables: ['cluster_store', 'store'],
+        parent: currentClusterId,
+        onChanges: changes => patchVirtualTable(virtualTable, changes, 'cluster_store')
+    });
 
-    // Filter items
-    filterInput.addEventListener('input', () => {
-        const filterText = filterInput.value.toLowerCase();
-        const items = itemsContainer.querySelectorAll('.item');
-        items.forEach(item => {
-            const text = item.textContent.toLowerCase();
-            item.style.display = text.includes(filterText) ? '' : 'none';
-        });
+    // Store picker loads its choices on demand
+    const storePicker = attachTypeahead({
+        input: document.getElementById('storeSearch'),
+        select: document.getElementById('storeSelect'),
+        url: '/stores/typeahead',
+        value: item => item.id,
+        label: item => item.label
     });
 
     // Show floating form
     addButton.addEventListener('click', () => {
         document.getElementById('formTitle').textContent = 'Add Store to Cluster';
         storeForm.reset();
+        storePicker.clear();
+        storePicker.load();
         floatingFormContainer.style.display = 'flex';
     });
 
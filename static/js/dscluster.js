@@ -39,31 +39,40 @@ document.addEventListener('DOMContentLoaded', async () => {
         }
     });
 
-    // Fetch and populate items
+    // Build a table row from a JSON list row
+    const renderRow = row => buildItemRow([buildLink(`/clstore?clusterId=${row[0]}`, row[0], 'cluster-link'), row[1]], row[0]);
+
+    // Unfiltered rows come from the cached reference dataset, revalidated once per page load
+    const clusterSource = referenceSource('cluster', '/dscluster/data');
+
+    // Render only the visible rows, loading pages as the table scrolls
+    const virtualTable = createVirtualTable({
+        viewport: document.getElementById('tableViewport'),
+        table: itemsContainer,
+        renderRow,
+        source: clusterSource,
+        pageSize: Number(itemsContainer.dataset.pageSize),
+        total: Number(itemsContainer.dataset.total),
+        onError: error => showMessage('error', error.message)
+    });
+
+    // Filter and sort on the server; each change restarts the table from the top
+    createListQuery({
+        table: itemsContainer,
+        input: filterInput,
+        onChange: params => virtualTable.reload(Object.keys(params).length ? listSource('/dscluster/list', params) : clusterSource)
+    });
+
+    // Reload the visible rows after a change, keeping the current filter and sort
     async function fetchItems() {
-        try {
-            const response = await fetch('/dscluster');
-            const data = await response.text();
-            const parser = new DOMParser();
-            const doc = parser.parseFromString(data, 'text/html');
-            const newTbody = doc.querySelector('#itemsContainer tbody').innerHTML;
-            itemsContainer.querySelector('tbody').innerHTML = newTbody;
-        } catch (error) {
-            console.error('Error fetching cluster data:', error);
-            showMessage('error', 'Failed to load cluster data.');
-        }
+        clusterSource.refresh();
+        virtualTable.reload();
     }
 
-    await fetchItems();
-
-    // Filter items
-    filterInput.addEventListener('input', () => {
-        const filterText = filterInput.value.toLowerCase();
-        const items = itemsContainer.querySelectorAll('.item');
-        items.forEach(item => {
-            const text = item.textContent.toLowerCase();
-            item.style.display = text.includes(filterText) ? '' : 'none';
-        });
+    // Pull in changes made in other tabs as deltas from the cached dataset
+    subscribeChanges({
+        tables: ['cluster'],
+        onChanges: () => fetchItems()
     });
 
     // Show floating form
@@ -39,33 +39,32 @@ document.addEventListener('DOMContentLoaded', async () => {
         }
     });
 
-    // Fetch and display performance items
-    async function fetchItems() {
-        try {
-            const response = await fetch('/dsperformance');
-            const data = await response.text();
-            const parser = new DOMParser();
-            const doc = parser.parseFromString(data, 'text/html');
-            const newTbody = doc.querySelector('#itemsContainer tbody').innerHTML;
-            itemsContainer.querySelector('tbody').innerHTML = newTbody;
-        } catch (error) {
-            console.error('Error fetching performance data:', error);
-            showMessage('error', 'Failed to load performance data.');
-        }
-    }
-
-    await fetchItems();
+    // Build a table row from a JSON list row
+    const renderRow = row => buildItemRow(row, row[0]);
+
+    // Render only the visible rows, loading pages from the list endpoint as the table scrolls
+    const virtualTable = createVirtualTable({
+        viewport: document.getElementById('tableViewport'),
+        table: itemsContainer,
+        renderRow,
+        source: listSource('/dsperformance/list'),
+        pageSize: Number(itemsContainer.dataset.pageSize),
+        total: Number(itemsContainer.dataset.total),
+        onError: error => showMessage('error', error.message)
+    });
 
-    // Filter items based on search input
-    filterInput.addEventListener('input', () => {
-        const filterText = filterInput.value.toLowerCase();
-        const items = itemsContainer.querySelectorAll('.item');
-        items.forEach(item => {
-            const text = item.textContent.toLowerCase();
-            item.style.display = text.includes(filterText) ? '' : 'none';
-        });
+    // Filter and sort on the server; each change restarts the table from the top
+    createListQuery({
+        table: itemsContainer,
+        input: filterInput,
+        onChange: params => virtualTable.reload(listSource('/dsperformance/list', params))
     });
 
+    // Reload the visible rows after a change, keeping the current filter and sort
+    async function fetchItems() {
+        virtualTable.reload();
+    }
+
     // Show form for adding new performance record
     addButton.addEventListener('click', () => {
         document.getElementById('formTitle').textContent = 'Add Performance';
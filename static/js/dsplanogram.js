@@ -39,31 +39,46 @@ document.addEventListener('DOMContentLoaded', async () => {
         }
     });
 
-    // Fetch and display items
-    async function fetchItems() {
-        try {
-            const response = await fetch('/dsplanogram');
-            const data = await response.text();
-            const parser = new DOMParser();
-            const doc = parser.parseFromString(data, 'text/html');
-            const newTbody = doc.querySelector('#itemsContainer tbody').innerHTML;
-            itemsContainer.querySelector('tbody').innerHTML = newTbody;
-        } catch (error) {
-            console.error('Error fetching planogram data:', error);
-            showMessage('error', 'Failed to load planogram data.');
+    // Build a table row from a JSON list row
+    const renderRow = row => {
+        let pdfCell = 'No PDF available';
+        if (row[3] !== null) {
+            pdfCell = buildLink(`/dsplanogram/view_pdf/${row[3]}`, 'View PDF', null, '_blank');
         }
-    }
+        return buildItemRow([buildLink(`/plproduct?planogramId=${row[0]}`, row[0], 'planogram-link'), row[1], row[2], pdfCell], row[0]);
+    };
 
-    await fetchItems();
+    // Unfiltered rows come from the cached reference dataset, revalidated once per page load
+    const planogramSource = referenceSource('planogram', '/dsplanogram/data');
+
+    // Render only the visible rows, loading pages as the table scrolls
+    const virtualTable = createVirtualTable({
+        viewport: document.getElementById('tableViewport'),
+        table: itemsContainer,
+        renderRow,
+        source: planogramSource,
+        pageSize: Number(itemsContainer.dataset.pageSize),
+        total: Number(itemsContainer.dataset.total),
+        onError: error => showMessage('error', error.message)
+    });
+
+    // Filter and sort on the server; each change restarts the table from the top
+    createListQuery({
+        table: itemsContainer,
+        input: filterInput,
+        onChange: params => virtualTable.reload(Object.keys(params).length ? listSource('/dsplanogram/list', params) : planogramSource)
+    });
+
+    // Reload the visible rows after a change, keeping the current filter and sort
+    async function fetchItems() {
+        planogramSource.refresh();
+        virtualTable.reload();
+    }
 
-    // Filter items based on search input
-    filterInput.addEventListener('input', () => {
-        const filterText = filterInput.value.toLowerCase();
-        const items = itemsContainer.querySelectorAll('.item');
-        items.forEach(item => {
-            const text = item.textContent.toLowerCase();
-            item.style.display = text.includes(filterText) ? '' : 'none';
-        });
+    // Pull in changes made in other tabs as deltas from the cached dataset
+    subscribeChanges({
+        tables: ['planogram'],
+        onChanges: () => fetchItems()
     });
 
     // Show form for adding new planogram record
@@ -37,29 +37,40 @@ document.addEventListener('DOMContentLoaded', async () => {
         }
     });
 
+    // Build a table row from a JSON list row
+    const renderRow = row => buildItemRow([buildLink(`/stfloorplan?storeId=${row[0]}`, row[0], 'store-link'), row[1], row[2], row[3]], row[0]);
+
+    // Unfiltered rows come from the cached reference dataset, revalidated once per page load
+    const storeSource = referenceSource('store', '/dsstore/data');
+
+    // Render only the visible rows, loading pages as the table scrolls
+    const virtualTable = createVirtualTable({
+        viewport: document.getElementById('tableViewport'),
+        table: itemsContainer,
+        renderRow,
+        source: storeSource,
+        pageSize: Number(itemsContainer.dataset.pageSize),
+        total: Number(itemsContainer.dataset.total),
+        onError: error => showMessage('error', error.message)
+    });
+
+    // Filter and sort on the server; each change restarts the table from the top
+    createListQuery({
+        table: itemsContainer,
+        input: filterInput,
+        onChange: params => virtualTable.reload(Object.keys(params).length ? listSource('/dsstore/list', params) : storeSource)
+    });
+
+    // Reload the visible rows after a change, keeping the current filter and sort
     async function fetchItems() {
-        try {
-            const response = await fetch('/dsstore');
-            const data = await response.text();
-            const parser = new DOMParser();
-            const doc = parser.parseFromString(data, 'text/html');
-            const newTbody = doc.querySelector('#itemsContainer tbody').innerHTML;
-            itemsContainer.querySelector('tbody').innerHTML = newTbody;
-        } catch (error) {
-            console.error('Error fetching store data:', error);
-            showMessage('error', 'Failed to load store data.');
-        }
+        storeSource.refresh();
+        virtualTable.reload();
     }
 
-    await fetchItems();
-
-    filterInput.addEventListener('input', () => {
-        const filterText = filterInput.value.toLowerCase();
-        const items = itemsContainer.querySelectorAll('.item');
-        items.forEach(item => {
-            const text = item.textContent.toLowerCase();
-            item.style.display = text.includes(filterText) ? '' : 'none';
-        });
+    // Pull in changes made in other tabs as deltas from the cached dataset
+    subscribeChanges({
+        tables: ['store'],
+        onChanges: () => fetchItems()
     });
 
     addButton.addEventListener('click', () => {
@@ -53,38 +53,59 @@ document.addEventListener('DOMContentLoaded', async () => {
         }
     });
 
-    // Fetch and populate items
+    // Build a table row from a JSON list row
+    const renderRow = row => {
+        const pdfCell = row[3] !== null
+            ? buildLink(`/flplanogram/view_pdf/${row[3]}`, 'View PDF', null, '_blank')
+            : 'No PDF Available';
+        return buildItemRow([buildLink(`/plproduct?planogramId=${row[0]}`, row[0], 'planogram-link'), row[1], row[2], pdfCell], row[0], [['delete-button', 'Delete']]);
+    };
+
+    // Render only the visible rows, loading pages from the list endpoint as the table scrolls
+    const virtualTable = createVirtualTable({
+        viewport: document.getElementById('tableViewport'),
+        table: itemsContainer,
+        renderRow,
+        source: listSource('/flplanogram/list', { floorplanId: currentFloorplanId }),
+        pageSize: Number(itemsContainer.dataset.pageSize),
+        total: Number(itemsContainer.dataset.total),
+        onError: error => showMessage('error', error.message)
+    });
+
+    // Filter and sort on the server; each change restarts the table from the top
+    createListQuery({
+        table: itemsContainer,
+        input: filterInput,
+        onChange: params => virtualTable.reload(listSource('/flplanogram/list', { ...params, floorplanId: currentFloorplanId }))
+    });
+
+    // Reload the visible rows after a change, keeping the current filter and sort
     async function fetchItems() {
-        try {
-            const response = await fetch(`/flplanogram?floorplanId=${currentFloorplanId}`);
-            const data = await response.text();
-            console.log(data); // Log the raw HTML response for inspection
-            const parser = new DOMParser();
-            const doc = parser.parseFromString(data, 'text/html');
-            const newTbody = doc.querySelector('#itemsContainer tbody').innerHTML;
-            itemsContainer.querySelector('tbody').innerHTML = newTbody;
-        } catch (error) {
-            console.error('Error fetching floorplan planogram data:', error);
-            showMessage('error', 'Failed to load floorplan planogram data.');
-        }
-    }    
-
-    await fetchItems();
-
-    // Filter items based on search input
-    filterInput.addEventListener('input', () => {
-        const filterText = filterInput.value.toLowerCase();
-        const items = itemsContainer.querySelectorAll('.item');
-        items.forEach(item => {
-            const text = item.textContent.toLowerCase();
-            item.style.display = text.includes(filterText) ? '' : 'none';
-        });
+        virtualTable.reload();
+    }
+
+    // Apply changes made in other tabs; planogram links live in the performance table
+    subscribeChanges({
+        tables: ['performance', 'planogram'],
+        parent: currentFloorplanId,
+        onChanges: changes => patchVirtualTable(virtualTable, changes, 'performance')
+    });
+
+    // Planogram picker loads its choices on demand
+    const planogramPicker = attachTypeahead({
+        input: document.getElementById('planogramSearch'),
+        select: document.getElementById('planogramSelect'),
+        url: '/planograms/typeahead',
+        value: item => item.id,
+        label: item => item.label
     });
 
     // Show form to add a planogram
     addButton.addEventListener('click', () => {
         document.getElementById('formTitle').textContent = 'Add Planogram to Floorplan';
         planogramForm.reset();
+        planogramPicker.clear();
+        planogramPicker.load();
         floatingFormContainer.style.display = 'flex';
     });
 
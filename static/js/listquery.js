@@ -0,0 +1,101 @@
+// Shared filter and sort controls for list pages. The filter text (debounced)
+// and the sort column picked from the table headers are turned into list
+// endpoint parameters and handed to onChange, so filtering and sorting
+// happen in SQL instead of scanning the DOM.
+function createListQuery({ table, input, onChange, delay = 250 }) {
+    const headers = table.querySelectorAll('th[data-sort]');
+    let sort = null;
+    let direction = 'asc';
+    let timer = null;
+
+    function params() {
+        const result = {};
+        const text = input.value.trim();
+        if (text) {
+            result.q = text;
+        }
+        if (sort) {
+            result.sort = sort;
+            result.dir = direction;
+        }
+        return result;
+    }
+
+    function changed() {
+        clearTimeout(timer);
+        onChange(params());
+    }
+
+    // Clicking a sortable header cycles ascending, descending, unsorted
+    headers.forEach(th => {
+        th.classList.add('sortable');
+        th.addEventListener('click', () => {
+            if (sort !== th.dataset.sort) {
+                sort = th.dataset.sort;
+                direction = 'asc';
+            } else if (direction === 'asc') {
+                direction = 'desc';
+            } else {
+                sort = null;
+            }
+            headers.forEach(other => {
+                other.classList.remove('sort-asc', 'sort-desc');
+                other.removeAttribute('aria-sort');
+            });
+            if (sort) {
+                th.classList.add(`sort-${direction}`);
+                th.setAttribute('aria-sort', direction === 'asc' ? 'ascending' : 'descending');
+            }
+            changed();
+        });
+    });
+
+    input.addEventListener('input', () => {
+        clearTimeout(timer);
+        timer = setTimeout(changed, delay);
+    });
+
+    return { params };
+}
+
+// Build a list row: one cell per value, then one button per action for the given id.
+// Values may be strings or DOM nodes (for links).
+function buildItemRow(values, id, actions = [['edit-button', 'Edit'], ['delete-button', 'Delete']]) {
+    const tr = document.createElement('tr');
+    tr.className = 'item';
+    values.forEach(value => {
+        const td = document.createElement('td');
+        if (value instanceof Node) {
+            td.appendChild(value);
+        } else {
+            td.textContent = value === null || value === undefined ? 'None' : String(value);
+        }
+        tr.appendChild(td);
+    });
+
+    const cell = document.createElement('td');
+    actions.forEach(([className, text]) => {
+        const button = document.createElement('button');
+        button.className = `${className} custom-style`;
+        button.dataset.id = id;
+        button.textContent = text;
+        cell.appendChild(button);
+        cell.appendChild(document.createTextNode(' '));
+    });
+    tr.appendChild(cell);
+    return tr;
+}
+
+// Build a link element for use as a row cell
+function buildLink(href, text, className, target) {
+    const link = document.createElement('a');
+    link.href = href;
+    link.textContent = text;
+    if (className) {
+        link.className = className;
+    }
+    if (target) {
+        link.target = target;
+    }
+    return link;
+}
@@ -77,10 +77,22 @@ document.addEventListener('DOMContentLoaded', async () => {
         });
     });
 
+    // Product picker loads its choices on demand
+    const productPicker = attachTypeahead({
+        input: document.getElementById('productSearch'),
+        select: document.getElementById('productSelect'),
+        url: '/products/search',
+        itemsKey: 'products',
+        value: item => item.dbKey,
+        label: item => `${item.productName} (${item.upc})`
+    });
+
     // Show floating form
     addButton.addEventListener('click', () => {
         document.getElementById('formTitle').textContent = 'Add Product to Planogram';
         productForm.reset();
+        productPicker.clear();
+        productPicker.load();
         floatingFormContainer.style.display = 'flex';
     });
 
@@ -0,0 +1,113 @@
+// Versioned client-side cache of reference datasets (stores, clusters, floor
+// plans, planograms) in IndexedDB. Each dataset is stored with the table
+// version the server issued for it. Revalidating is one conditional request
+// to the table's /<page>/data endpoint: the server answers 304 when the
+// version is unchanged, or sends only the rows changed since that version.
+// Each user gets their own database, since users may see different rows.
+const REFERENCE_DB_NAME = 'reference-cache';
+const REFERENCE_STORE = 'datasets';
+
+let referenceDb = null;
+
+function currentUser() {
+    const match = document.cookie.match(/(?:^|;\s*)snowflake_username=([^;]*)/);
+    return match ? decodeURIComponent(match[1].replace(/^"|"$/g, '')) : '';
+}
+
+function openReferenceDb() {
+    if (!referenceDb) {
+        referenceDb = new Promise((resolve, reject) => {
+            if (!window.indexedDB) {
+                reject(new Error('IndexedDB is not available.'));
+                return;
+            }
+            const request = indexedDB.open(`${REFERENCE_DB_NAME}:${currentUser()}`, 1);
+            request.onupgradeneeded = (event) => {
+                request.result.createObjectStore(REFERENCE_STORE, { keyPath: 'name' });
+                // First open of this user's database: drop the one earlier
+                // versions shared between users, once rather than every load
+                if (event.oldVersion === 0) {
+                    indexedDB.deleteDatabase(REFERENCE_DB_NAME);
+                }
+            };
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+    return referenceDb;
+}
+
+async function readDataset(name) {
+    try {
+        const db = await openReferenceDb();
+        return await new Promise((resolve, reject) => {
+            const request = db.transaction(REFERENCE_STORE).objectStore(REFERENCE_STORE).get(name);
+            request.onsuccess = () => resolve(request.result || null);
+            request.onerror = () => reject(request.error);
+        });
+    } catch (error) {
+        // Without IndexedDB every load is a full download
+        return null;
+    }
+}
+
+async function writeDataset(dataset) {
+    try {
+        const db = await openReferenceDb();
+        await new Promise((resolve, reject) => {
+            const transaction = db.transaction(REFERENCE_STORE, 'readwrite');
+            transaction.objectStore(REFERENCE_STORE).put(dataset);
+            transaction.oncomplete = () => resolve();
+            transaction.onerror = () => reject(transaction.error);
+        });
+    } catch (error) {
+        console.error('Error caching reference data:', error);
+    }
+}
+
+// Order rows by key the way the list endpoints do
+function compareKeys(a, b) {
+    return typeof a === 'number' && typeof b === 'number' ? a - b : String(a).localeCompare(String(b));
+}
+
+// Return the current rows of a reference dataset, downloading only what
+// changed since the cached version
+async function loadReferenceData(name, url, keyOf = row => row[0]) {
+    const cached = await readDataset(name);
+    const query = cached ? `?since=${encodeURIComponent(cached.version)}` : '';
+    const headers = cached && cached.etag ? { 'If-None-Match': cached.etag } : {};
+    const response = await fetch(`${url}${query}`, { headers });
+    if (response.status === 304 && cached) {
+        return cached.rows;
+    }
+    const result = await response.json();
+    if (!response.ok) {
+        throw new Error(result.message || 'Failed to load reference data.');
+    }
+
+    let rows = result.rows;
+    if (cached && !result.full) {
+        const byKey = new Map(cached.rows.map(row => [String(keyOf(row)), row]));
+        result.deleted.forEach(key => byKey.delete(String(key)));
+        result.rows.forEach(row => byKey.set(String(keyOf(row)), row));
+        rows = Array.from(byKey.values());
+    }
+    rows.sort((a, b) => compareKeys(keyOf(a), keyOf(b)));
+
+    await writeDataset({ name, version: result.version, etag: response.headers.get('ETag'), rows });
+    return rows;
+}
+
+// Virtual table page source served from a cached reference dataset.
+// refresh() revalidates it after the page changes the table.
+function referenceSource(name, url) {
+    let rows = loadReferenceData(name, url);
+    const source = async (offset, limit) => {
+        const all = await rows;
+        return { rows: all.slice(offset, offset + limit), total: all.length };
+    };
+    source.refresh = () => {
+        rows = loadReferenceData(name, url);
+    };
+    return source;
+}
@@ -48,37 +48,54 @@ document.addEventListener('DOMContentLoaded', async () => {
         }
     });
 
-    // Fetch and populate items
+    // Build a table row from a JSON list row
+    const renderRow = row => buildItemRow([buildLink(`/flplanogram?floorplanId=${row[0]}`, row[0], 'floorplan-link'), row[1], row[2]], row[0], [['delete-button', 'Remove']]);
+
+    // Render only the visible rows, loading pages from the list endpoint as the table scrolls
+    const virtualTable = createVirtualTable({
+        viewport: document.getElementById('tableViewport'),
+        table: itemsContainer,
+        renderRow,
+        source: listSource('/stfloorplan/list', { storeId: currentStoreId }),
+        pageSize: Number(itemsContainer.dataset.pageSize),
+        total: Number(itemsContainer.dataset.total),
+        onError: error => showMessage('error', error.message)
+    });
+
+    // Filter and sort on the server; each change restarts the table from the top
+    createListQuery({
+        table: itemsContainer,
+        input: filterInput,
+        onChange: params => virtualTable.reload(listSource('/stfloorplan/list', { ...params, storeId: currentStoreId }))
+    });
+
+    // Reload the visible rows after a change, keeping the current filter and sort
     async function fetchItems() {
-        try {
-            const response = await fetch(`/stfloorplan?storeId=${currentStoreId}`);
-            const data = await response.text(); // Assuming HTML response
-            const parser = new DOMParser();
-            const doc = parser.parseFromString(data, 'text/html');
-            const newTbody = doc.querySelector('#itemsContainer tbody').innerHTML;
-            itemsContainer.querySelector('tbody').innerHTML = newTbody;
-        } catch (error) {
-            console.error('Error fetching store floor plan data:', error);
-            showMessage('error', 'Failed to load store floor plan data.');
-        }
+        virtualTable.reload();
     }
 
-    await fetchItems();
+    // Apply changes made in other tabs: removals are patched in place
+    subscribeChanges({
+        tables: ['store_floorplan', 'floorplan'],
+        parent: currentStoreId,
+        onChanges: changes => patchVirtualTable(virtualTable, changes, 'store_floorplan')
+    });
 
-    // Filter items
-    filterInput.addEventListener('input', () => {
-        const filterText = filterInput.value.toLowerCase();
-        const items = itemsContainer.querySelectorAll('.item');
-        items.forEach(item => {
-            const text = item.textContent.toLowerCase();
-            item.style.display = text.includes(filterText) ? '' : 'none';
-        });
+    // Floorplan picker loads its choices on demand
+    const floorplanPicker = attachTypeahead({
+        input: document.getElementById('floorplanSearch'),
+        select: document.getElementById('floorplanSelect'),
+        url: '/floorplans/typeahead',
+        value: item => item.id,
+        label: item => item.label
     });
 
     // Show floating form
     addButton.addEventListener('click', () => {
         document.getElementById('formTitle').textContent = 'Add Store to Floor Plan';
         storeForm.reset();
+        floorplanPicker.clear();
+        floorplanPicker.load();
         floatingFormContainer.style.display = 'flex';
     });
 
@@ -0,0 +1,51 @@
+// Shared typeahead helper: fills a <select> with matches fetched on demand
+// from a JSON endpoint instead of shipping the whole reference table in the page.
+function attachTypeahead({ input, select, url, itemsKey = 'results', value, label, limit = 20, delay = 200 }) {
+    let timer = null;
+    let controller = null;
+
+    async function load() {
+        // Cancel a request that is still in flight for an older query
+        if (controller) {
+            controller.abort();
+        }
+        controller = new AbortController();
+
+        const params = new URLSearchParams({ q: input.value.trim(), limit: String(limit) });
+        try {
+            const response = await fetch(`${url}?${params}`, { signal: controller.signal });
+            const result = await response.json();
+            if (!response.ok) {
+                throw new Error(result.message || 'Failed to load choices.');
+            }
+
+            select.innerHTML = '';
+            (result[itemsKey] || []).forEach(item => {
+                const option = document.createElement('option');
+                option.value = value(item);
+                option.textContent = label(item);
+                select.appendChild(option);
+            });
+            if (select.options.length) {
+                select.selectedIndex = 0;
+            }
+        } catch (error) {
+            if (error.name !== 'AbortError') {
+                console.error('Error loading typeahead choices:', error);
+            }
+        }
+    }
+
+    input.addEventListener('input', () => {
+        clearTimeout(timer);
+        timer = setTimeout(load, delay);
+    });
+
+    return {
+        load,
+        clear() {
+            input.value = '';
+            select.innerHTML = '';
+        }
+    };
+}
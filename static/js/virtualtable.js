@@ -0,0 +1,252 @@
+// Shared windowed table: renders only the rows inside the scroll viewport
+// (plus a small overscan) from a paged JSON data source, so the DOM stays the
+// same size however many rows the source holds. Pages are fetched on demand,
+// the next page in the scroll direction is prefetched, and a bounded number
+// of rendered pages is kept for scrolling back.
+//
+// Browsers cap element heights, so very tall tables are scaled down to
+// MAX_SCROLL_HEIGHT; past that each pixel of scrolling moves proportionally
+// more rows.
+const MAX_SCROLL_HEIGHT = 8000000;
+
+function createVirtualTable({
+    viewport,
+    table,
+    renderRow,
+    keyOf = row => row[0],
+    source,
+    pageSize = 200,
+    total = null,
+    overscan = 10,
+    cachedPages = 20,
+    onError = error => console.error(error)
+}) {
+    const tbody = table.querySelector('tbody');
+    const columns = table.querySelectorAll('thead th').length;
+    const pages = new Map(); // page index -> rendered rows, least recently used first
+    const pending = new Map(); // page index -> AbortController
+    let rowHeight = 0;
+    let generation = 0;
+    let lastScrollTop = 0;
+    let frame = null;
+
+    function fillerRow(className, text) {
+        const tr = document.createElement('tr');
+        tr.className = className;
+        const td = document.createElement('td');
+        td.colSpan = columns;
+        if (text) {
+            td.textContent = text;
+        }
+        tr.appendChild(td);
+        return tr;
+    }
+
+    const topSpacer = fillerRow('spacer');
+    const bottomSpacer = fillerRow('spacer');
+
+    // Server-rendered rows become the first page
+    const initialRows = Array.from(tbody.querySelectorAll('tr.item'));
+    if (initialRows.length) {
+        rowHeight = initialRows[0].getBoundingClientRect().height;
+        pages.set(0, initialRows);
+    }
+    if (total === null && initialRows.length && initialRows.length < pageSize) {
+        total = initialRows.length;
+    }
+
+    function touch(page) {
+        const rows = pages.get(page);
+        pages.delete(page);
+        pages.set(page, rows);
+        return rows;
+    }
+
+    function evict(keepFrom, keepTo) {
+        for (const page of pages.keys()) {
+            if (pages.size <= cachedPages) {
+                break;
+            }
+            if (page < keepFrom || page > keepTo) {
+                pages.delete(page);
+            }
+        }
+    }
+
+    function request(page) {
+        if (page < 0 || pages.has(page) || pending.has(page)) {
+            return;
+        }
+        if (total !== null && page * pageSize >= total) {
+            return;
+        }
+        const current = generation;
+        const controller = new AbortController();
+        pending.set(page, controller);
+        source(page * pageSize, pageSize, controller.signal)
+            .then(result => {
+                if (current !== generation) {
+                    return;
+                }
+                pending.delete(page);
+                pages.set(page, result.rows.map(row => {
+                    const tr = renderRow(row);
+                    tr.dataset.key = String(keyOf(row));
+                    return tr;
+                }));
+                if (result.total !== null && result.total !== undefined) {
+                    total = result.total;
+                } else if (total === null) {
+                    total = page * pageSize + result.rows.length;
+                }
+                schedule();
+            })
+            .catch(error => {
+                if (current === generation) {
+                    pending.delete(page);
+                }
+                if (error.name !== 'AbortError') {
+                    onError(error);
+                }
+            });
+    }
+
+    function render() {
+        frame = null;
+        if (total === null) {
+            // Keep showing the current rows until the first page of a new source arrives
+            request(0);
+            return;
+        }
+
+        const height = rowHeight || 32;
+        const fullHeight = total * height;
+        const scrollHeight = Math.min(fullHeight, MAX_SCROLL_HEIGHT);
+        const viewportHeight = viewport.clientHeight;
+        const scale = fullHeight > scrollHeight && scrollHeight > viewportHeight
+            ? (fullHeight - viewportHeight) / (scrollHeight - viewportHeight)
+            : 1;
+        const scrollTop = Math.min(viewport.scrollTop, Math.max(scrollHeight - viewportHeight, 0));
+        const virtualTop = scrollTop * scale;
+        const first = Math.max(Math.floor(virtualTop / height) - overscan, 0);
+        const last = Math.min(Math.ceil((virtualTop + viewportHeight) / height) + overscan, total);
+
+        const rows = [];
+        for (let index = first; index < last; index++) {
+            const page = Math.floor(index / pageSize);
+            const cached = pages.has(page) ? touch(page) : null;
+            const row = cached ? cached[index - page * pageSize] : null;
+            if (!cached) {
+                request(page);
+            }
+            rows.push(row || fillerRow('placeholder', cached ? '' : 'Loading…'));
+        }
+
+        const top = Math.max(scrollTop - (virtualTop - first * height), 0);
+        topSpacer.firstChild.style.height = `${top}px`;
+        bottomSpacer.firstChild.style.height = `${Math.max(scrollHeight - top - rows.length * height, 0)}px`;
+        tbody.replaceChildren(topSpacer, ...rows, bottomSpacer);
+
+        if (!rowHeight) {
+            const measured = rows.find(tr => tr.classList.contains('item'));
+            if (measured) {
+                rowHeight = measured.getBoundingClientRect().height;
+                schedule();
+            }
+        }
+
+        // Prefetch the next page in the direction of travel
+        const firstPage = Math.floor(first / pageSize);
+        const lastPage = Math.floor(Math.max(last - 1, 0) / pageSize);
+        request(scrollTop >= lastScrollTop ? lastPage + 1 : firstPage - 1);
+        lastScrollTop = scrollTop;
+        evict(firstPage - 1, lastPage + 1);
+    }
+
+    function schedule() {
+        if (frame === null) {
+            frame = requestAnimationFrame(render);
+        }
+    }
+
+    // Drop every loaded page and start again, optionally from a new source
+    function reload(newSource) {
+        generation++;
+        pending.forEach(controller => controller.abort());
+        pending.clear();
+        pages.clear();
+        total = null;
+        if (newSource) {
+            source = newSource;
+            viewport.scrollTop = 0;
+        }
+        schedule();
+    }
+
+    // Remove one row without refetching. Rows after it move up: each following
+    // cached page passes its first row back, and the first gap in the run of
+    // cached pages ends it. Returns false when the row is not loaded.
+    function remove(key) {
+        key = String(key);
+        let page = null;
+        for (const [index, rows] of pages) {
+            const position = rows.findIndex(tr => tr.dataset.key === key);
+            if (position !== -1) {
+                rows.splice(position, 1);
+                page = index;
+                break;
+            }
+        }
+        if (page === null) {
+            return false;
+        }
+
+        // Requests in flight were made against the old offsets
+        generation++;
+        pending.forEach(controller => controller.abort());
+        pending.clear();
+
+        while (pages.has(page + 1) && pages.get(page + 1).length) {
+            pages.get(page).push(pages.get(page + 1).shift());
+            page++;
+        }
+        if (total !== null) {
+            total = Math.max(total - 1, 0);
+        }
+        const isLast = total !== null && (page + 1) * pageSize >= total;
+        for (const index of Array.from(pages.keys())) {
+            if (index > page || (index === page && !isLast)) {
+                pages.delete(index);
+            }
+        }
+        schedule();
+        return true;
+    }
+
+    viewport.addEventListener('scroll', schedule, { passive: true });
+    window.addEventListener('resize', schedule);
+    schedule();
+
+    return {
+        reload,
+        remove,
+        get total() {
+            return total;
+        }
+    };
+}
+
+// Page source backed by a /<page>/list endpoint
+function listSource(url, params = {}) {
+    return async (offset, limit, signal) => {
+        const query = new URLSearchParams(params);
+        query.set('offset', offset);
+        query.set('limit', limit);
+        const response = await fetch(`${url}?${query}`, { signal });
+        const result = await response.json();
+        if (!response.ok) {
+            throw new Error(result.message || 'Failed to load data.');
+        }
+        return result;
+    };
+}
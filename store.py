@@ -1,19 +1,16 @@
-import snowflake.connector
+import json
 from flask import Blueprint, render_template, request, jsonify
 from config import Config
+from db import connect
+from query_utils import clamp_limit, typeahead_query, parse_list_args, list_query, list_payload
+from changes import change_log, delta_response, conditional
+from fragment_cache import render_table_body
 
 store_bp = Blueprint('store', __name__)
 
 # Helper function to establish a Snowflake connection
 def get_snowflake_connection(user, password):
-    return snowflake.connector.connect(
-        user=user,
-        password=password,
-        account=Config.SNOWFLAKE_ACCOUNT,
-        warehouse=Config.SNOWFLAKE_WAREHOUSE,
-        database=Config.SNOWFLAKE_DATABASE,
-        schema=Config.SNOWFLAKE_SCHEMA
-    )
+    return connect(user, password)
 
 # Helper function to execute a query and fetch results
 def execute_query(user, password, query, params=None, fetchone=False):
@@ -32,19 +29,62 @@ def fetch_store_by_id(user, password, store_id):
     query = "SELECT DBKEY, STORENAME, DESCRIPTIVO1, DBSTATUS FROM NEWCKB.PUBLIC.IX_STR_STORE WHERE DBKEY = %s"
     return execute_query(user, password, query, (store_id,), fetchone=True)
 
+# Fetch stores by a list of IDs
+def fetch_stores_by_ids(user, password, store_ids):
+    query = """
+        SELECT DBKEY, STORENAME, DESCRIPTIVO1, DBSTATUS FROM NEWCKB.PUBLIC.IX_STR_STORE
+        WHERE DBKEY IN (SELECT VALUE::INT FROM TABLE(FLATTEN(INPUT => PARSE_JSON(%s))))
+    """
+    return execute_query(user, password, query, (json.dumps([int(store_id) for store_id in store_ids]),))
+
+# Search stores by name or ID for pickers
+def search_stores(user, password, text, limit):
+    query, params = typeahead_query(
+        "NEWCKB.PUBLIC.IX_STR_STORE", "DBKEY", "STORENAME",
+        ["DBKEY", "STORENAME", "DESCRIPTIVO1", "DBSTATUS"], text, limit
+    )
+    return execute_query(user, password, query, params)
+
+# Store list columns that can be filtered and sorted, by API name
+STORE_LIST_COLUMNS = {
+    "storeId": "S.DBKEY",
+    "storeName": "S.STORENAME",
+    "descriptivo1": "S.DESCRIPTIVO1",
+    "dbStatus": "S.DBSTATUS"
+}
+
+# Fetch one filtered, sorted page of stores, optionally only those in a cluster
+def fetch_store_page(user, password, list_args, cluster_id=None):
+    from_clause = "NEWCKB.PUBLIC.IX_STR_STORE S"
+    where, where_params = None, ()
+    if cluster_id is not None:
+        from_clause += " JOIN NEWCKB.PUBLIC.IX_EIA_CLUSTER_STORE CS ON S.DBKEY = CS.DBSTOREPARENTKEY"
+        where, where_params = "CS.DBCLUSTERPARENTKEY = %s", (cluster_id,)
+    query, params = list_query(
+        list(STORE_LIST_COLUMNS.values()), from_clause, STORE_LIST_COLUMNS, "S.DBKEY",
+        list_args, where, where_params
+    )
+    return execute_query(user, password, query, params)
+
 # Fetch the maximum store ID
 def fetch_max_store_id(user, password):
     query = "SELECT MAX(DBKEY) FROM NEWCKB.PUBLIC.IX_STR_STORE"
     result = execute_query(user, password, query, fetchone=True)
     return result[0] if result and result[0] is not None else 0
 
-# Insert a new store
+# Insert a new store and return its ID
 def insert_store(user, password, store_name, descriptivo1, dbstatus):
     query = """
         INSERT INTO NEWCKB.PUBLIC.IX_STR_STORE (STORENAME, DESCRIPTIVO1, DBSTATUS)
         VALUES (%s, %s, %s)
     """
-    execute_query(user, password, query, (store_name, descriptivo1, dbstatus))
+    with get_snowflake_connection(user, password) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(query, (store_name, descriptivo1, dbstatus))
+            # Store names are unique, so read the new key back by name
+            cursor.execute("SELECT DBKEY FROM NEWCKB.PUBLIC.IX_STR_STORE WHERE STORENAME = %s", (store_name,))
+            result = cursor.fetchone()
+            return result[0] if result else None
     # Commit is handled by the context manager
 
 # Update an existing store
@@ -65,6 +105,7 @@ def delete_store(user, password, store_id):
 
 # Route to display all stores
 @store_bp.route('/dsstore')
+@conditional('store')
 def dsstore():
     user = request.cookies.get('snowflake_username')
     password = request.cookies.get('snowflake_password')
@@ -73,13 +114,63 @@ def dsstore():
         return "Error: Missing credentials", 401
 
     try:
-        stores = fetch_stores(user, password)
-        return render_template('dsstore.html', stores=stores)
+        version = change_log.token('store')
+        # Only the first page is rendered; the table loads the rest as it scrolls
+        list_args = parse_list_args({}, STORE_LIST_COLUMNS, Config.LIST_PAGE_SIZE, Config.LIST_MAX_PAGE_SIZE)
+        table_body, total = render_table_body(
+            'store', version, user, password, list_args, 'dsstore.html', 'stores',
+            lambda: fetch_store_page(user, password, list_args)
+        )
+        return render_template(
+            'dsstore.html', table_body=table_body, total=total,
+            page_size=list_args.limit, version=version
+        )
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+# Route to get stores changed since a version token
+@store_bp.route('/dsstore/data', methods=['GET'])
+def dsstore_data():
+    user = request.cookies.get('snowflake_username')
+    password = request.cookies.get('snowflake_password')
+
+    if not user or not password:
+        return jsonify({"success": False, "message": "Missing credentials"}), 401
+
+    try:
+        return delta_response(
+            'store',
+            lambda: fetch_stores(user, password),
+            lambda store_ids: fetch_stores_by_ids(user, password, store_ids)
+        )
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+# Route to get one filtered, sorted page of stores
+@store_bp.route('/dsstore/list', methods=['GET'])
+@conditional('store')
+def dsstore_list():
+    user = request.cookies.get('snowflake_username')
+    password = request.cookies.get('snowflake_password')
+
+    if not user or not password:
+        return jsonify({"success": False, "message": "Missing credentials"}), 401
+
+    try:
+        list_args = parse_list_args(request.args, STORE_LIST_COLUMNS, Config.LIST_PAGE_SIZE, Config.LIST_MAX_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    try:
+        version = change_log.token('store')
+        stores = fetch_store_page(user, password, list_args)
+        return jsonify({"success": True, "version": version, **list_payload(stores, list_args)})
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
 # Route to get a store by ID
 @store_bp.route('/get_store', methods=['GET'])
+@conditional('store')
 def get_store():
     user = request.cookies.get('snowflake_username')
     password = request.cookies.get('snowflake_password')
@@ -108,6 +199,33 @@ def get_store():
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
+# Route to search stores for typeahead pickers
+@store_bp.route('/stores/typeahead', methods=['GET'])
+@conditional('store')
+def stores_typeahead():
+    user = request.cookies.get('snowflake_username')
+    password = request.cookies.get('snowflake_password')
+
+    if not user or not password:
+        return jsonify({"success": False, "message": "Missing credentials"}), 401
+
+    try:
+        limit = clamp_limit(request.args.get('limit'))
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    try:
+        stores = search_stores(user, password, request.args.get('q', ''), limit)
+        return jsonify({
+            "success": True,
+            "results": [
+                {"id": store[0], "label": store[1], "description": store[2], "dbStatus": store[3]}
+                for store in stores
+            ]
+        })
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
 # Route to add a new store
 @store_bp.route('/dsstore/add', methods=['POST'])
 def add_store():
@@ -126,7 +244,8 @@ def add_store():
         return jsonify({"success": False, "message": "All fields are required"}), 400
 
     try:
-        insert_store(user, password, store_name, descriptivo1, dbstatus)
+        store_id = insert_store(user, password, store_name, descriptivo1, dbstatus)
+        change_log.record('store', 'insert', store_id)
         return jsonify({"success": True}), 200
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
@@ -151,6 +270,7 @@ def update_store_route():
 
     try:
         update_store(user, password, store_id, store_name, descriptivo1, dbstatus)
+        change_log.record('store', 'update', store_id)
         return jsonify({"success": True}), 200
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
@@ -172,12 +292,14 @@ def delete_store_route():
 
     try:
         delete_store(user, password, store_id)
+        change_log.record('store', 'delete', store_id)
         return jsonify({"success": True}), 200
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
 # Route to display stores in a cluster
 @store_bp.route('/clstore')
+@conditional('store', 'cluster', 'cluster_store')
 def clstore():
     user = request.cookies.get('snowflake_username')
     password = request.cookies.get('snowflake_password')
@@ -190,27 +312,43 @@ def clstore():
         return "Error: Cluster ID is required", 400
 
     try:
-        # Fetch stores in the cluster and all stores
-        query_stores_in_cluster = """
-            SELECT S.DBKEY, S.STORENAME, S.DESCRIPTIVO1, S.DBSTATUS
-            FROM NEWCKB.PUBLIC.IX_STR_STORE S
-            JOIN NEWCKB.PUBLIC.IX_EIA_CLUSTER_STORE CS
-            ON S.DBKEY = CS.DBSTOREPARENTKEY
-            WHERE CS.DBCLUSTERPARENTKEY = %s
-        """
-        query_all_stores = "SELECT DBKEY, STORENAME, DESCRIPTIVO1, DBSTATUS FROM NEWCKB.PUBLIC.IX_STR_STORE"
-
-        with get_snowflake_connection(user, password) as conn:
-            with conn.cursor() as cursor:
-                cursor.execute(query_stores_in_cluster, (cluster_id,))
-                stores = cursor.fetchall()
-                cursor.execute(query_all_stores)
-                all_stores = cursor.fetchall()
-
-        return render_template('clstore.html', stores=stores, all_stores=all_stores, cluster_id=cluster_id)
+        # Fetch the first page of stores in the cluster; the table loads the rest as it
+        # scrolls and the store picker loads its choices on demand
+        list_args = parse_list_args({}, STORE_LIST_COLUMNS, Config.LIST_PAGE_SIZE, Config.LIST_MAX_PAGE_SIZE)
+        first_page = list_payload(fetch_store_page(user, password, list_args, cluster_id), list_args)
+
+        return render_template(
+            'clstore.html', stores=first_page["rows"], total=first_page["total"],
+            page_size=list_args.limit, cluster_id=cluster_id
+        )
     except Exception as e:
         return f"Error: {str(e)}", 500
 
+# Route to get one filtered, sorted page of the stores in a cluster
+@store_bp.route('/clstore/list', methods=['GET'])
+@conditional('store', 'cluster', 'cluster_store')
+def clstore_list():
+    user = request.cookies.get('snowflake_username')
+    password = request.cookies.get('snowflake_password')
+
+    if not user or not password:
+        return jsonify({"success": False, "message": "Missing credentials"}), 401
+
+    cluster_id = request.args.get('clusterId')
+    if not cluster_id:
+        return jsonify({"success": False, "message": "Cluster ID is required"}), 400
+
+    try:
+        list_args = parse_list_args(request.args, STORE_LIST_COLUMNS, Config.LIST_PAGE_SIZE, Config.LIST_MAX_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    try:
+        stores = fetch_store_page(user, password, list_args, cluster_id)
+        return jsonify({"success": True, **list_payload(stores, list_args)})
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
 # Route to add a store to a cluster
 @store_bp.route('/clstore/add_store', methods=['POST'])
 def add_store_to_cluster():
@@ -229,6 +367,7 @@ def add_store_to_cluster():
 
     try:
         insert_store_to_cluster(user, password, cluster_id, store_id)
+        change_log.record('cluster_store', 'insert', store_id, cluster_id)
         return jsonify({"success": True}), 200
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
@@ -251,6 +390,7 @@ def delete_store_from_cluster_route():
 
     try:
         delete_store_from_cluster(user, password, cluster_id, store_id)
+        change_log.record('cluster_store', 'delete', store_id, cluster_id)
         return jsonify({"success": True}), 200
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
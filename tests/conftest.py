@@ -0,0 +1,70 @@
+import os
+import tempfile
+import pytest
+
+# Job state goes to a scratch directory; set before config.py is imported
+SCRATCH = tempfile.mkdtemp(prefix='planogram-tests-')
+os.environ.setdefault('JOB_DB_PATH', os.path.join(SCRATCH, 'jobs.sqlite3'))
+
+import db
+import localdb
+import simulation
+from fragment_cache import fragment_cache
+from product_index import product_facet_index, product_search_index
+from upc_resolver import upc_resolver
+
+USER = 'planner'
+PASSWORD = 'secret'
+OTHER_USER = 'buyer'
+OTHER_PASSWORD = 'hunter2'
+
+@pytest.fixture(scope='session')
+def plan():
+    """Seed a small local database that only accepts the two test logins."""
+    path = os.path.join(SCRATCH, 'planogram.sqlite3')
+    plan = localdb.seed(path, 1000, pdf_bytes=1024)
+    uninstall = localdb.LocalDatabase(path, users={USER: PASSWORD, OTHER_USER: OTHER_PASSWORD}).install(db)
+    yield plan
+    uninstall()
+
+@pytest.fixture(scope='session')
+def app(plan):
+    from app import create_app
+    return create_app()
+
+@pytest.fixture(autouse=True)
+def reset_caches():
+    """Start every test with cold process-wide caches."""
+    for index in (product_search_index, product_facet_index):
+        index.loaded = False
+        index._clear()
+    simulation._models.clear()
+    db._verified.clear()
+    fragment_cache.clear()
+    upc_resolver.invalidate()
+    yield
+
+def login(client, user=USER, password=PASSWORD):
+    client.set_cookie('snowflake_username', user)
+    client.set_cookie('snowflake_password', password)
+    return client
+
+def assert_rejects_intruder(client, intruder, method, url, **kwargs):
+    """Serve url to the real login first (warming any cache), then refuse the wrong password."""
+    assert client.open(url, method=method, **kwargs).status_code == 200, url
+    response = intruder.open(url, method=method, **kwargs)
+    assert response.status_code == 401, url
+    assert not response.get_json()["success"]
+    return response
+
+@pytest.fixture
+def client(app):
+    return login(app.test_client())
+
+@pytest.fixture
+def colleague(app):
+    return login(app.test_client(), OTHER_USER, OTHER_PASSWORD)
+
+@pytest.fixture
+def intruder(app):
+    return login(app.test_client(), password='wrong')
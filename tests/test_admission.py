@@ -0,0 +1,85 @@
+import threading
+import time
+import pytest
+from admission import ANALYTIC, INTERACTIVE, AdmissionController, Overloaded, admission_controller
+from config import Config
+
+def controller(global_limit=1, user_limit=4, analytic_limit=1, queue_limit=10):
+    return AdmissionController(global_limit, user_limit, analytic_limit, queue_limit)
+
+# Queue acquire(user, workload) on a thread, recording the order slots are granted in
+def enqueue(admission, granted, user, workload):
+    waiting = sum(admission.stats()["waiting"].values())
+    thread = threading.Thread(target=lambda: admission.acquire(user, workload) and granted.append((user, workload)))
+    thread.start()
+    while sum(admission.stats()["waiting"].values()) == waiting:
+        time.sleep(0.001)
+    return thread
+
+def test_interactive_queries_are_admitted_ahead_of_analytic():
+    admission = controller()
+    assert admission.acquire('a', INTERACTIVE)
+    granted = []
+    threads = [enqueue(admission, granted, 'b', ANALYTIC), enqueue(admission, granted, 'c', INTERACTIVE)]
+
+    admission.release('a', INTERACTIVE, 0.1)
+    threads[1].join(1)
+    assert granted == [('c', INTERACTIVE)]
+    admission.release('c', INTERACTIVE, 0.1)
+    threads[0].join(1)
+    assert granted == [('c', INTERACTIVE), ('b', ANALYTIC)]
+
+def test_user_with_fewer_running_queries_goes_first():
+    admission = controller(global_limit=2)
+    assert admission.acquire('busy', INTERACTIVE)
+    assert admission.acquire('busy', INTERACTIVE)
+    granted = []
+    threads = [enqueue(admission, granted, 'busy', INTERACTIVE), enqueue(admission, granted, 'quiet', INTERACTIVE)]
+
+    admission.release('busy', INTERACTIVE, 0.1)
+    threads[1].join(1)
+    assert granted == [('quiet', INTERACTIVE)]
+    admission.release('busy', INTERACTIVE, 0.1)
+    threads[0].join(1)
+    assert granted[-1] == ('busy', INTERACTIVE)
+
+def test_analytic_queries_leave_slots_for_interactive():
+    admission = controller(global_limit=2, analytic_limit=1)
+    assert admission.acquire('a', ANALYTIC)
+    assert not admission.acquire('b', ANALYTIC, deadline=time.monotonic() + 0.05)
+    assert admission.acquire('c', INTERACTIVE, deadline=time.monotonic() + 0.05)
+    assert admission.stats()["timedOut"] == 1
+
+def test_deep_queue_is_overloaded():
+    admission = controller(queue_limit=1)
+    assert admission.acquire('a', INTERACTIVE)
+    granted = []
+    thread = enqueue(admission, granted, 'b', ANALYTIC)
+
+    with pytest.raises(Overloaded) as overloaded:
+        admission.check(ANALYTIC)
+    assert overloaded.value.retry_after >= 1
+    # Interactive requests only count their own class against the limit
+    admission.check(INTERACTIVE)
+
+    admission.release('a', INTERACTIVE, 0.1)
+    thread.join(1)
+    assert granted == [('b', ANALYTIC)]
+
+def test_overloaded_requests_get_429_with_retry_after(client, monkeypatch):
+    monkeypatch.setattr(Config, 'ADMISSION_ENABLED', True)
+    monkeypatch.setattr(admission_controller, 'queue_limit', 0)
+    response = client.get('/get_position?positionId=1')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert not response.get_json()["success"]
+
+def test_stats_need_the_admin_token(client, monkeypatch):
+    monkeypatch.setattr(Config, 'SLOW_QUERY_ADMIN_TOKEN', 'operator-token')
+    assert client.get('/admission/stats').status_code == 403
+    response = client.get('/admission/stats', headers={'X-Admin-Token': 'operator-token'})
+    assert response.status_code == 200
+    assert "running" in response.get_json()["stats"]
+
+    monkeypatch.setattr(Config, 'SLOW_QUERY_ADMIN_TOKEN', '')
+    assert client.get('/admission/stats', headers={'X-Admin-Token': ''}).status_code == 403
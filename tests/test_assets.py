@@ -0,0 +1,61 @@
+import gzip
+import json
+import os
+import re
+from assets import build_assets, fingerprint
+
+def test_fingerprint_goes_before_the_extension():
+    assert fingerprint('js/dsstore.js', 'abc123') == 'js/dsstore.abc123.js'
+
+def test_build_hashes_content_and_writes_variants(tmp_path):
+    (tmp_path / 'js').mkdir()
+    (tmp_path / 'js' / 'app.js').write_text('console.log("planogram");\n' * 50)
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'css' / 'tiny.css').write_text('a{}')
+
+    manifest = build_assets(str(tmp_path))
+    hashed = manifest['js/app.js']
+    assert re.fullmatch(r'js/app\.[0-9a-f]{12}\.js', hashed)
+    built = tmp_path / 'dist' / hashed
+    assert built.read_bytes() == (tmp_path / 'js' / 'app.js').read_bytes()
+    assert gzip.decompress((tmp_path / 'dist' / (hashed + '.gz')).read_bytes()) == built.read_bytes()
+    # A variant that would not be smaller is not written
+    assert not os.path.exists(tmp_path / 'dist' / (manifest['css/tiny.css'] + '.gz'))
+    assert json.loads((tmp_path / 'dist' / 'manifest.json').read_text()) == manifest
+
+def test_changed_content_gets_a_new_name_and_the_old_one_stays(tmp_path):
+    (tmp_path / 'js').mkdir()
+    source = tmp_path / 'js' / 'app.js'
+    source.write_text('var version = 1;')
+    first = build_assets(str(tmp_path))['js/app.js']
+    source.write_text('var version = 2;')
+    second = build_assets(str(tmp_path))['js/app.js']
+
+    assert first != second
+    assert (tmp_path / 'dist' / first).exists()
+    assert (tmp_path / 'dist' / second).exists()
+
+def asset_url(client):
+    page = client.get('/dsstore').get_data(as_text=True)
+    match = re.search(r'/static/dist/js/refcache\.[0-9a-f]{12}\.js', page)
+    assert match, "page should link the fingerprinted script"
+    return match.group(0)
+
+def test_pages_link_fingerprinted_assets_served_immutable(client):
+    with client.get(asset_url(client), headers={'Accept-Encoding': 'identity'}) as response:
+        assert response.status_code == 200
+        assert 'immutable' in response.headers['Cache-Control']
+        assert 'Content-Encoding' not in response.headers
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert b'openReferenceDb' in response.get_data()
+
+def test_precompressed_variant_when_accepted(client):
+    url = asset_url(client)
+    with client.get(url, headers={'Accept-Encoding': 'identity'}) as response:
+        plain = response.get_data()
+    with client.get(url, headers={'Accept-Encoding': 'gzip'}) as response:
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(response.get_data()) == plain
+
+def test_paths_outside_the_build_are_refused(client):
+    assert client.get('/static/dist/../../config.py').status_code == 404
@@ -0,0 +1,23 @@
+import db
+from conftest import PASSWORD, USER
+
+def test_login_sets_cookies(app):
+    response = app.test_client().post('/login', data={"username": USER, "password": PASSWORD})
+    assert response.status_code == 302
+    cookies = response.headers.getlist('Set-Cookie')
+    assert any(cookie.startswith('snowflake_username=') for cookie in cookies)
+
+def test_rejected_login(app):
+    response = app.test_client().post('/login', data={"username": USER, "password": "wrong"})
+    assert response.status_code == 400
+    assert 'Set-Cookie' not in response.headers
+
+def test_warehouse_error_is_not_reported_as_bad_credentials(app, monkeypatch):
+    def unavailable(**kwargs):
+        raise OSError("warehouse unreachable")
+    monkeypatch.setattr(db, 'Connection', unavailable)
+    response = app.test_client().post('/login', data={"username": USER, "password": PASSWORD})
+    assert response.status_code == 500
+
+def test_missing_fields(app):
+    assert app.test_client().post('/login', data={"username": USER}).status_code == 400
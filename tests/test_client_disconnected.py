@@ -0,0 +1,75 @@
+import socket
+import ssl
+import pytest
+from db import client_disconnected
+
+class TLSStandIn:
+    """An SSLSocket-like wrapper: pending() and no recv flags."""
+
+    def __init__(self, sock, pending=0):
+        self._sock = sock
+        self._pending = pending
+        self.family = sock.family
+        self.type = sock.type
+
+    def pending(self):
+        return self._pending
+
+    def fileno(self):
+        return self._sock.fileno()
+
+    def recv(self, size, flags=0):
+        if flags:
+            raise ValueError("non-zero flags not allowed in calls to recv() on <class 'ssl.SSLSocket'>")
+        return self._sock.recv(size)
+
+@pytest.fixture
+def pair():
+    server, client = socket.socketpair()
+    yield server, client
+    server.close()
+    client.close()
+
+def disconnected(app, sock):
+    with app.test_request_context(environ_base={'werkzeug.socket': sock}):
+        return client_disconnected()
+
+def test_plain_socket(app, pair):
+    server, client = pair
+    assert not disconnected(app, server)
+    client.sendall(b'x')
+    assert not disconnected(app, server)
+    client.close()
+    server.recv(1)
+    assert disconnected(app, server)
+
+def test_tls_socket_open_and_closed(app, pair):
+    server, client = pair
+    assert not disconnected(app, TLSStandIn(server))
+    client.close()
+    assert disconnected(app, TLSStandIn(server))
+
+def test_tls_socket_with_buffered_data_is_connected(app, pair):
+    server, client = pair
+    client.close()
+    assert not disconnected(app, TLSStandIn(server, pending=5))
+
+def test_real_ssl_socket_does_not_raise(app, pair):
+    server, _ = pair
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    wrapped = context.wrap_socket(server, do_handshake_on_connect=False)
+    try:
+        assert not disconnected(app, wrapped)
+    finally:
+        wrapped.detach()
+
+def test_errors_count_as_connected(app):
+    class Broken:
+        def fileno(self):
+            raise OSError("bad file descriptor")
+    assert not disconnected(app, Broken())
+
+def test_no_socket(app):
+    assert not disconnected(app, None)
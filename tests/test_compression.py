@@ -0,0 +1,100 @@
+import gzip
+import zlib
+import pytest
+from flask import Flask, Response, jsonify
+from werkzeug.datastructures import Accept
+import compression
+from compression import _GzipEncoder, compress_response, negotiate_encoding
+from config import Config
+
+BIG = "shelf " * 2000
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.after_request(compress_response)
+
+    @app.route('/big')
+    def big():
+        return jsonify({"text": BIG})
+
+    @app.route('/small')
+    def small():
+        return jsonify({"text": "short"})
+
+    @app.route('/pdf')
+    def pdf():
+        return Response(b'%PDF' + b'0' * 4096, mimetype='application/pdf')
+
+    @app.route('/stream')
+    def stream():
+        return Response((f"line {n}\n" * 100 for n in range(100)), mimetype='text/plain')
+
+    @app.route('/events')
+    def events():
+        return Response((f"data: {n}\n\n" for n in range(3)), mimetype='text/event-stream')
+
+    return app
+
+@pytest.fixture
+def only_gzip(monkeypatch):
+    monkeypatch.setattr(compression, 'available_encoders', lambda: {'gzip': _GzipEncoder})
+
+def test_client_preference_wins_then_server_order():
+    encoders = {'br': None, 'zstd': None, 'gzip': None}
+    assert negotiate_encoding(Accept([('gzip', 1), ('br', 0.5)]), encoders) == 'gzip'
+    assert negotiate_encoding(Accept([('gzip', 1), ('br', 1)]), encoders) == 'br'
+    assert negotiate_encoding(Accept([('*', 1)]), encoders) == 'br'
+    assert negotiate_encoding(Accept([('deflate', 1)]), encoders) is None
+    assert negotiate_encoding(Accept([('gzip', 0)]), encoders) is None
+
+def test_large_json_is_compressed(app, only_gzip):
+    response = app.test_client().get('/big', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert BIG in gzip.decompress(response.get_data()).decode()
+
+def test_below_minimum_size_is_sent_as_is(app, only_gzip):
+    response = app.test_client().get('/small', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_json() == {"text": "short"}
+
+def test_minimum_size_is_configurable(app, only_gzip, monkeypatch):
+    monkeypatch.setattr(Config, 'COMPRESSION_MIN_SIZE', 1)
+    response = app.test_client().get('/small', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+
+def test_no_accepted_encoding(app, only_gzip):
+    response = app.test_client().get('/big', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+def test_already_compressed_types_are_skipped(app, only_gzip):
+    response = app.test_client().get('/pdf', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+
+def test_streamed_body_is_compressed_incrementally(app, only_gzip):
+    response = app.test_client().get('/stream', headers={'Accept-Encoding': 'gzip'}, buffered=False)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    chunks = list(response.response)
+    response.close()
+    # Blocks are flushed as the view yields, not only once at the end
+    assert len([chunk for chunk in chunks if chunk]) > 1
+    expected = "".join(f"line {n}\n" * 100 for n in range(100))
+    assert zlib.decompress(b"".join(chunks), 31).decode() == expected
+
+def test_event_streams_are_left_alone(app, only_gzip):
+    response = app.test_client().get('/events', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_data(as_text=True) == "data: 0\n\ndata: 1\n\ndata: 2\n\n"
+
+def test_strong_etag_is_weakened(app, only_gzip):
+    @app.route('/tagged')
+    def tagged():
+        response = jsonify({"text": BIG})
+        response.set_etag('v1')
+        return response
+
+    response = app.test_client().get('/tagged', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['ETag'] == 'W/"v1"'
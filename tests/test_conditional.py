@@ -0,0 +1,32 @@
+import changes
+from config import Config
+
+def test_unchanged_route_revalidates_with_304(client):
+    first = client.get('/get_position?positionId=1')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert 'Last-Modified' not in first.headers
+
+    again = client.get('/get_position?positionId=1', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+
+def test_if_modified_since_alone_is_not_trusted(client):
+    response = client.get('/get_position?positionId=1', headers={'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'})
+    assert response.status_code == 200
+
+def test_write_in_the_same_second_changes_the_etag(client):
+    etag = client.get('/get_position?positionId=1').headers['ETag']
+    changes.change_log.record('position', 'update', 1)
+    assert client.get('/get_position?positionId=1', headers={'If-None-Match': etag}).status_code == 200
+
+def test_validator_expires_after_the_version_ttl(client, monkeypatch):
+    etag = client.get('/get_position?positionId=1').headers['ETag']
+    now = changes.time.time()
+    monkeypatch.setattr(changes.time, 'time', lambda: now + Config.CONDITIONAL_VERSION_TTL)
+    response = client.get('/get_position?positionId=1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+def test_bad_credentials_do_not_revalidate_another_login(client, intruder):
+    etag = client.get('/get_position?positionId=1').headers['ETag']
+    assert intruder.get('/get_position?positionId=1', headers={'If-None-Match': etag}).status_code != 304
@@ -0,0 +1,46 @@
+import changes
+from config import Config
+
+def test_unchanged_table_revalidates_with_304(client):
+    first = client.get('/dsstore/data')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+
+    again = client.get('/dsstore/data', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.headers['ETag'] == etag
+
+def test_etag_is_per_login(client, colleague):
+    etag = client.get('/dsstore/data').headers['ETag']
+
+    response = colleague.get('/dsstore/data', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert 'Cookie' in response.headers['Vary']
+
+def test_write_changes_the_etag(client):
+    etag = client.get('/dsstore/data').headers['ETag']
+    assert client.post('/dsstore/add', json={"storeName": "Delta Store", "descriptivo1": "test", "dbStatus": 1}).status_code == 200
+
+    response = client.get('/dsstore/data', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+def test_delta_since_a_current_version(client):
+    version = client.get('/dsstore/data').get_json()["version"]
+    assert client.post('/dsstore/add', json={"storeName": "Delta Since", "descriptivo1": "test", "dbStatus": 1}).status_code == 200
+
+    body = client.get('/dsstore/data', query_string={'since': version}).get_json()
+    assert not body["full"]
+    assert [row[1] for row in body["rows"]] == ["Delta Since"]
+
+def test_copies_from_an_earlier_period_are_resent(client, monkeypatch):
+    first = client.get('/dsstore/data')
+    version, etag = first.get_json()["version"], first.headers['ETag']
+    now = changes.time.time()
+    monkeypatch.setattr(changes.time, 'time', lambda: now + Config.CONDITIONAL_VERSION_TTL)
+
+    response = client.get('/dsstore/data', query_string={'since': version}, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.get_json()["full"]
@@ -0,0 +1,36 @@
+import events
+from changes import change_log
+from config import Config
+
+def test_bad_credentials_cannot_open_a_stream(intruder):
+    response = intruder.get('/events?tables=store')
+    assert response.status_code == 401
+
+def test_unknown_table(client):
+    assert client.get('/events?tables=secrets').status_code == 400
+
+def test_stream_resumes_and_ends_after_max_lifetime(client, monkeypatch):
+    monkeypatch.setattr(Config, 'EVENTS_MAX_STREAM_SECONDS', 0.2)
+    event_id = events.format_event_id({'store': change_log.version('store')})
+    change_log.record('store', 'update', 42)
+
+    response = client.get(f'/events?tables=store&lastEventId={event_id}')
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    response.close()
+    assert body.startswith('retry: 3000')
+    assert '"key": "42"' in body
+
+def test_open_streams_are_capped(client, monkeypatch):
+    monkeypatch.setattr(Config, 'EVENTS_MAX_STREAMS', 1)
+    first = client.get('/events?tables=store')
+    assert first.status_code == 200
+
+    refused = client.get('/events?tables=store')
+    assert refused.status_code == 503
+    assert refused.headers['Retry-After']
+
+    first.close()
+    again = client.get('/events?tables=store')
+    assert again.status_code == 200
+    again.close()
@@ -0,0 +1,54 @@
+import fragment_cache as fragments
+from conftest import assert_rejects_intruder
+from fragment_cache import FragmentCache, fragment_cache
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(fragments.time, 'monotonic', lambda: now[0])
+    cache = FragmentCache(1024, ttl=10)
+    cache.put('key', '<tr></tr>', 3)
+
+    now[0] += 9
+    assert cache.get('key') == ('<tr></tr>', 3)
+    now[0] += 2
+    assert cache.get('key') is None
+    assert cache.stats()["entries"] == 0
+
+def test_least_recently_used_is_evicted_by_size():
+    cache = FragmentCache(10, ttl=60)
+    cache.put('a', 'aaaa')
+    cache.put('b', 'bbbb')
+    assert cache.get('a') == ('aaaa', None)
+    cache.put('c', 'cccc')
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.stats()["bytes"] == 8
+    assert cache.stats()["evictions"] == 1
+
+def test_oversized_fragments_are_not_cached():
+    cache = FragmentCache(4, ttl=60)
+    cache.put('big', 'too long')
+    assert cache.get('big') is None
+
+def test_rendering_is_reused_per_login(client, colleague):
+    assert client.get('/dsstore').status_code == 200
+    assert fragment_cache.stats()["entries"] == 1
+    hits = fragment_cache.stats()["hits"]
+
+    assert client.get('/dsstore').status_code == 200
+    assert fragment_cache.stats()["hits"] == hits + 1
+
+    # Another login renders its own copy rather than reading this one
+    assert colleague.get('/dsstore').status_code == 200
+    assert fragment_cache.stats()["entries"] == 2
+    assert fragment_cache.stats()["hits"] == hits + 1
+
+def test_cached_rendering_is_not_served_to_bad_credentials(client, intruder):
+    assert client.get('/dsstore').status_code == 200
+    assert b'Store 1' not in intruder.get('/dsstore').get_data()
+
+def test_stats_check_credentials(client, intruder):
+    body = assert_rejects_intruder(client, intruder, 'GET', '/fragment_cache/stats')
+    assert body.get_json()["message"] == "Invalid credentials"
+    assert client.get('/fragment_cache/stats').get_json()["maxBytes"] == fragment_cache.max_bytes
@@ -0,0 +1,45 @@
+import threading
+import db
+from cluster import insert_cluster
+from conftest import PASSWORD, USER
+from position import insert_position
+from query_utils import next_key
+
+def cluster_name(key):
+    with db.connect(USER, PASSWORD) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT CLUSTERNAME FROM NEWCKB.PUBLIC.IX_EIA_CLUSTER WHERE DBKEY = %s", (key,))
+            return cursor.fetchone()[0]
+
+def test_cluster_key_is_its_own_row(plan):
+    first = insert_cluster(USER, PASSWORD, "Readback North")
+    # Same name from another session, and a row that takes AUTOINCREMENT's key
+    second = insert_cluster(USER, PASSWORD, "Readback North")
+    with db.connect(USER, PASSWORD) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("INSERT INTO NEWCKB.PUBLIC.IX_EIA_CLUSTER (CLUSTERNAME) VALUES (%s)", ("Readback East",))
+    third = insert_cluster(USER, PASSWORD, "Readback South")
+
+    assert first < second < third
+    assert cluster_name(first) == cluster_name(second) == "Readback North"
+    assert cluster_name(third) == "Readback South"
+
+def test_concurrent_key_draws_are_unique(plan):
+    keys = []
+    def draw():
+        with db.connect(USER, PASSWORD) as conn:
+            with conn.cursor() as cursor:
+                for _ in range(20):
+                    keys.append(next_key(cursor, "NEWCKB.PUBLIC.IX_SPC_POSITION"))
+    threads = [threading.Thread(target=draw) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(keys)) == 80
+
+def test_position_key_matches_inserted_row(client):
+    position_id = insert_position(USER, PASSWORD, 1, 2, 3, 1, 1, 1)
+    insert_position(USER, PASSWORD, 1, 2, 3, 1, 1, 1)
+    position = client.get(f'/get_position?positionId={position_id}').get_json()["position"]
+    assert (position["dbProductParentKey"], position["dbPlanogramParentKey"], position["dbFixtureParentKey"]) == (1, 2, 3)
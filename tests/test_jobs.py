@@ -0,0 +1,75 @@
+import os
+import time
+import pytest
+from conftest import assert_rejects_intruder
+from db import LoginFailed
+from jobs import JobQueue, PermanentJobError, job_task
+
+attempts = []
+
+@job_task('test_permanent')
+def permanent_task(job, user, password):
+    attempts.append('permanent')
+    raise PermanentJobError("cannot be fixed by retrying")
+
+@job_task('test_login')
+def login_task(job, user, password):
+    attempts.append('login')
+    raise LoginFailed("Incorrect username or password")
+
+@pytest.fixture
+def path(tmp_path):
+    return os.path.join(tmp_path, 'jobs.sqlite3')
+
+def wait_for(queue, job_id, owner, statuses=('succeeded', 'failed')):
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        job = queue.get(job_id, owner)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} stayed {job['status']}")
+
+def test_starting_a_second_process_leaves_live_jobs_alone(path):
+    first = JobQueue(path, 0, 3, 0.01)
+    job_id = first.submit('test_permanent', 'planner', 'secret')
+
+    second = JobQueue(path, 1, 3, 0.01)
+    second.start()
+    assert second.get(job_id, 'planner')["status"] == 'queued'
+
+def test_expired_leases_are_failed(path):
+    first = JobQueue(path, 0, 3, 0.01, lease_seconds=0.01)
+    job_id = first.submit('test_permanent', 'planner', 'secret')
+    time.sleep(0.02)
+
+    second = JobQueue(path, 0, 3, 0.01)
+    second.expire_leases()
+    job = second.get(job_id, 'planner')
+    assert job["status"] == 'failed'
+    assert 'stopped' in job["error"]
+
+def test_renewed_leases_survive(path):
+    first = JobQueue(path, 0, 3, 0.01, lease_seconds=0.5)
+    job_id = first.submit('test_permanent', 'planner', 'secret')
+    time.sleep(0.3)
+    first.renew_leases()
+    time.sleep(0.3)
+    JobQueue(path, 0, 3, 0.01).expire_leases()
+    assert first.get(job_id, 'planner')["status"] == 'queued'
+
+@pytest.mark.parametrize('kind', ['test_permanent', 'test_login'])
+def test_permanent_failures_are_not_retried(path, kind):
+    attempts.clear()
+    queue = JobQueue(path, 1, 3, 0.01)
+    queue.start()
+    job = wait_for(queue, queue.submit(kind, 'planner', 'secret'), 'planner')
+    assert job["status"] == 'failed'
+    assert job["attempts"] == 1
+    assert len(attempts) == 1
+
+def test_job_routes_check_credentials(client, intruder):
+    assert_rejects_intruder(client, intruder, 'GET', '/jobs')
+
+    job_id = client.post('/planogram/add_bulk', json={"planogramId": 1, "upcs": ["UPC000000001"]}).get_json()["jobId"]
+    assert_rejects_intruder(client, intruder, 'GET', f'/jobs/{job_id}')
@@ -0,0 +1,70 @@
+import re
+from metrics import Counter, Gauge, Histogram, fingerprint, normalize_statement
+
+# One exposition sample line: name, optional {labels}, value
+SAMPLE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_]\w*="(?:[^"\\]|\\.)*",?)*\})? (-?[0-9.e+-]+|\+Inf|NaN)$')
+
+def test_counter_and_gauge_exposition():
+    counter = Counter('test_events_total', "Events seen.", ('kind',))
+    counter.inc('a')
+    counter.inc('b "quoted"\n', amount=2)
+    gauge = Gauge('test_open', "Open things.")
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+
+    assert counter.render() == [
+        '# HELP test_events_total Events seen.',
+        '# TYPE test_events_total counter',
+        'test_events_total{kind="a"} 1',
+        'test_events_total{kind="b \\"quoted\\"\\n"} 2'
+    ]
+    assert gauge.render()[-1] == 'test_open 1'
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('test_seconds', "Durations.", ('route',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 5.0):
+        histogram.observe(value, 'r')
+
+    lines = histogram.render()
+    assert lines[2:] == [
+        'test_seconds_bucket{route="r",le="0.1"} 2',
+        'test_seconds_bucket{route="r",le="1.0"} 3',
+        'test_seconds_bucket{route="r",le="+Inf"} 4',
+        'test_seconds_sum{route="r"} 5.65',
+        'test_seconds_count{route="r"} 4'
+    ]
+
+def test_statements_differing_only_in_values_share_a_fingerprint():
+    assert normalize_statement("SELECT *  FROM T\n WHERE A = 'x''y' AND B = 12.5") == "SELECT * FROM T WHERE A = ? AND B = ?"
+    assert normalize_statement("SELECT * FROM T WHERE ID IN (%s, %s, %s)") == "SELECT * FROM T WHERE ID IN (?+)"
+    assert fingerprint("SELECT * FROM T WHERE ID IN (?, ?, ?)") == fingerprint("SELECT * FROM T WHERE ID IN (?,?)")
+    assert fingerprint("SELECT * FROM T WHERE ID = %s") == fingerprint("SELECT * FROM T WHERE ID = 42")
+    assert fingerprint("SELECT * FROM T WHERE ID = 1") != fingerprint("SELECT * FROM U WHERE ID = 1")
+    assert re.fullmatch(r'[0-9a-f]{12}', fingerprint("SELECT 1"))
+
+def test_scrape_is_valid_exposition(client):
+    client.get('/get_position?positionId=1')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert text.endswith('\n')
+
+    typed = set()
+    for line in text.splitlines():
+        if line.startswith('# HELP '):
+            continue
+        if line.startswith('# TYPE '):
+            name, kind = line.split()[2:]
+            assert kind in ('counter', 'gauge', 'histogram')
+            assert name not in typed, f"{name} declared twice"
+            typed.add(name)
+            continue
+        assert SAMPLE.match(line), line
+        name = re.match(r'[^{ ]+', line).group(0)
+        assert re.sub(r'_(bucket|sum|count)$', '', name) in typed or name in typed, line
+
+    assert 'planogram_http_request_duration_seconds_count{endpoint="position.get_position",method="GET",status="200"}' in text
+    assert 'planogram_cache_entries{cache="fragment"}' in text
+    assert 'planogram_jobs' in typed
@@ -0,0 +1,42 @@
+from conftest import assert_rejects_intruder
+from product_index import ProductFacetIndex
+
+ROWS = [
+    (1, 'UPC3', 'Cola', 'Drinks', 'Soda', 1),
+    (2, 'UPC1', 'Apple', 'Produce', 'Fruit', 1),
+    (3, 'UPC2', 'Bread', 'Bakery', 'Loaves', 2),
+    (4, 'UPC4', 'Apple', 'Produce', 'Fruit', 1)
+]
+
+def names(result):
+    return [(product["productName"], product["upc"]) for product in result["products"]]
+
+def test_query_pages_in_name_order():
+    index = ProductFacetIndex()
+    index.load(ROWS)
+    assert names(index.query(page_size=2)) == [('Apple', 'UPC1'), ('Apple', 'UPC4')]
+    assert names(index.query(page=2, page_size=2)) == [('Bread', 'UPC2'), ('Cola', 'UPC3')]
+    assert index.query()["total"] == 4
+
+def test_order_follows_upsert_and_remove():
+    index = ProductFacetIndex()
+    index.load(ROWS)
+    index.upsert(None, 'UPC3', 'Aardvark Crackers', 'Bakery', 'Crackers', 1)
+    index.remove('UPC1')
+    index.upsert(5, 'UPC5', 'Zucchini', 'Produce', 'Vegetables', 1)
+    assert names(index.query()) == [
+        ('Aardvark Crackers', 'UPC3'), ('Apple', 'UPC4'), ('Bread', 'UPC2'), ('Zucchini', 'UPC5')
+    ]
+    result = index.query(category='Bakery')
+    assert result["total"] == 2
+    assert names(result) == [('Aardvark Crackers', 'UPC3'), ('Bread', 'UPC2')]
+
+def test_facets_route(client):
+    response = client.get('/products/facets?pageSize=3')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert len(body["products"]) == 3
+    assert body["products"] == sorted(body["products"], key=lambda product: (product["productName"], product["upc"]))
+
+def test_warm_facets_reject_bad_credentials(client, intruder):
+    assert_rejects_intruder(client, intruder, 'GET', '/products/facets')
@@ -0,0 +1,21 @@
+from conftest import assert_rejects_intruder, login
+
+def test_search_finds_products(client):
+    response = client.get('/products/search?q=Product 1&limit=5')
+    assert response.status_code == 200
+    products = response.get_json()["products"]
+    assert products and len(products) <= 5
+
+def test_warm_index_rejects_bad_credentials(client, intruder):
+    assert_rejects_intruder(client, intruder, 'GET', '/products/search?q=UPC')
+
+def test_cold_index_rejects_bad_credentials(intruder):
+    assert intruder.get('/products/search?q=UPC').status_code == 401
+
+def test_missing_credentials(app):
+    assert app.test_client().get('/products/search?q=UPC').status_code == 401
+
+def test_unknown_user(app, client):
+    assert client.get('/products/search?q=UPC').status_code == 200
+    stranger = login(app.test_client(), user='stranger', password='secret')
+    assert stranger.get('/products/search?q=UPC').status_code == 401
@@ -0,0 +1,64 @@
+import pytest
+import db
+from admission import admission_controller
+from conftest import PASSWORD, USER
+from metrics import fingerprint, query_errors
+from slow_queries import slow_query_log
+
+def test_local_statements_take_admission_slots(client):
+    admitted = admission_controller.stats()["admitted"]
+    assert client.get('/get_position?positionId=2').status_code == 200
+    assert admission_controller.stats()["admitted"] > admitted
+
+def test_local_statements_are_slow_logged_with_a_plan(client, monkeypatch):
+    slow_query_log.clear()
+    monkeypatch.setattr(slow_query_log, 'threshold', 0)
+    monkeypatch.setattr(slow_query_log, 'explain', True)
+    assert client.get('/get_position?positionId=3').status_code == 200
+
+    stats = slow_query_log.stats()
+    assert stats["recent"][0]["queryId"]
+    assert stats["fingerprints"][0]["plan"]
+    slow_query_log.clear()
+
+def test_failed_statements_are_counted(plan):
+    statement = "SELECT NO_SUCH_COLUMN FROM NEWCKB.PUBLIC.IX_SPC_POSITION"
+    before = query_errors.render()
+    with db.connect(USER, PASSWORD) as conn:
+        with conn.cursor() as cursor:
+            with pytest.raises(Exception):
+                cursor.execute(statement)
+            assert cursor.fingerprint == fingerprint(statement)
+    assert query_errors.render() != before
+
+class StubConnection:
+    user = USER
+
+def test_async_reads_collect_results_without_reentering_execute(monkeypatch):
+    calls = []
+
+    def plain_execute(cursor, command, params=None, **kwargs):
+        calls.append((command, kwargs))
+        return cursor
+
+    monkeypatch.setattr(db.Config, 'ASYNC_QUERIES', True)
+    monkeypatch.setattr(db.SnowflakeCursor, 'execute', plain_execute)
+    monkeypatch.setattr(db.AsyncSubmitCursor, 'execute_async', lambda self, *a, **kw: {"queryId": "01-abc"})
+    monkeypatch.setattr(db.AsyncSubmitCursor, 'sfqid', None)
+    monkeypatch.setattr(db.AsyncSubmitCursor, 'connection', StubConnection())
+    monkeypatch.setattr(slow_query_log, 'threshold', 0)
+    monkeypatch.setattr(slow_query_log, 'explain', False)
+    monkeypatch.setattr(db, 'wait_for_query', lambda cursor, query_id: None)
+    cursor = db.AsyncSubmitCursor.__new__(db.AsyncSubmitCursor)
+    admitted = admission_controller.stats()["admitted"]
+    slow_query_log.clear()
+
+    cursor.execute("SELECT 1")
+
+    assert calls == [(
+        "select * from table(result_scan('01-abc'))",
+        {"_statement_params": {}}
+    )]
+    assert admission_controller.stats()["admitted"] == admitted + 1
+    assert slow_query_log.stats()["recent"][0]["queryId"] == "01-abc"
+    slow_query_log.clear()
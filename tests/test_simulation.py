@@ -0,0 +1,70 @@
+import pytest
+import simulation
+from conftest import assert_rejects_intruder
+
+def first_position(client):
+    response = client.get('/get_position?positionId=1')
+    assert response.status_code == 200
+    return response.get_json()["position"]
+
+def simulate(client, planogram_id, body):
+    return client.post(f'/simulation/{planogram_id}', json=body)
+
+def test_simulation_returns_scenario(client):
+    response = simulate(client, 1, {"changes": [{"positionId": 1, "hFacing": 2}]})
+    assert response.status_code == 200
+    assert response.get_json()["success"]
+
+def test_cached_model_rejects_bad_credentials(client, intruder):
+    assert_rejects_intruder(client, intruder, 'POST', '/simulation/1', json={"changes": []})
+    assert 1 in simulation._models
+
+def test_cold_model_rejects_bad_credentials(intruder):
+    assert simulate(intruder, 1, {"changes": []}).status_code == 401
+
+@pytest.mark.parametrize('body', [
+    {"changes": [5]},
+    {"changes": ["positionId"]},
+    {"changes": [{"positionId": 1, "hFacing": -1}]},
+    {"changes": [{"positionId": 1, "vFacing": 1.5}]},
+    {"changes": [{"positionId": "one", "hFacing": 1}]},
+    {"changes": [{"positionId": 1, "dFacing": True}]},
+    {"changes": {"positionId": 1}},
+    {"changes": [], "periodDays": "nan"},
+    {"changes": [], "periodDays": "inf"},
+    {"changes": [], "periodDays": 0},
+    {"changes": [], "elasticity": "nan"},
+    {"changes": [], "elasticity": "-inf"},
+    {"changes": [], "elasticity": "steep"},
+    [1, 2]
+])
+def test_invalid_payload_is_rejected(client, body):
+    response = simulate(client, 1, body)
+    assert response.status_code == 400
+    assert not response.get_json()["success"]
+
+def test_position_update_invalidates_model(client):
+    position = first_position(client)
+    planogram_id = position["dbPlanogramParentKey"]
+    assert simulate(client, planogram_id, {"changes": []}).status_code == 200
+    assert planogram_id in simulation._models
+
+    response = client.post('/dsposition/update_position', json={
+        "positionId": position["positionId"],
+        "dbProductParentKey": position["dbProductParentKey"],
+        "dbPlanogramParentKey": position["dbPlanogramParentKey"],
+        "dbFixtureParentKey": position["dbFixtureParentKey"],
+        "hFacing": position["hFacing"] + 1,
+        "vFacing": position["vFacing"],
+        "dFacing": position["dFacing"]
+    })
+    assert response.status_code == 200
+    assert planogram_id not in simulation._models
+
+    body = simulate(client, planogram_id, {"changes": [{"positionId": position["positionId"]}]}).get_json()
+    assert body["positions"][0]["before"]["hFacing"] == position["hFacing"] + 1
+
+def test_performance_delete_invalidates_models(client):
+    assert simulate(client, 1, {"changes": []}).status_code == 200
+    assert client.post('/dsperformance/delete_performance', json={"dbKey": 1}).status_code == 200
+    assert not simulation._models
@@ -0,0 +1,62 @@
+import pytest
+import localdb
+from admission import admission_controller
+from config import Config
+from slow_queries import SlowQueryLog, slow_query_log
+
+@pytest.fixture
+def slow_log(monkeypatch):
+    slow_query_log.clear()
+    monkeypatch.setattr(slow_query_log, 'threshold', 0)
+    monkeypatch.setattr(slow_query_log, 'explain', True)
+    yield slow_query_log
+    slow_query_log.clear()
+
+def test_routes_are_off_without_an_admin_token(client, monkeypatch):
+    monkeypatch.setattr(Config, 'SLOW_QUERY_ADMIN_TOKEN', '')
+    assert client.get('/slow_queries').status_code == 403
+    assert client.post('/slow_queries/clear').status_code == 403
+
+def test_logged_in_users_need_the_admin_token(client, monkeypatch):
+    monkeypatch.setattr(Config, 'SLOW_QUERY_ADMIN_TOKEN', 'operator-token')
+    assert client.get('/slow_queries').status_code == 403
+    assert client.get('/slow_queries', headers={'X-Admin-Token': 'guess'}).status_code == 403
+
+    response = client.get('/slow_queries', headers={'X-Admin-Token': 'operator-token'})
+    assert response.status_code == 200
+    assert client.post('/slow_queries/clear', headers={'X-Admin-Token': 'operator-token'}).status_code == 200
+
+def test_explain_runs_after_the_admission_slot_is_released(client, slow_log, monkeypatch):
+    running = []
+    original = localdb.LocalCursor._explain
+
+    def spy(cursor, command, params):
+        running.append(sum(admission_controller.stats()["running"].values()))
+        return original(cursor, command, params)
+
+    monkeypatch.setattr(localdb.LocalCursor, '_explain', spy)
+    assert client.get('/get_position?positionId=4').status_code == 200
+    assert running and running[0] == 0
+    assert slow_log.stats()["fingerprints"][0]["plan"]
+
+def test_plan_is_captured_once_a_fingerprint_has_none(monkeypatch):
+    log = SlowQueryLog(0, 10, True)
+    statement = "SELECT * FROM T WHERE ID = 1"
+
+    # A failed first execution still captures a plan
+    capture = log.record(statement, None, 1.0, 'q1', error=RuntimeError("timed out"), explain=lambda: "plan A")
+    assert capture is not None
+    # While that capture is pending, later executions do not start another
+    assert log.record(statement, None, 1.0, 'q2', explain=lambda: "plan B") is None
+    capture()
+    assert log.stats()["fingerprints"][0]["plan"] == "plan A"
+    assert log.record(statement, None, 1.0, 'q3', explain=lambda: "plan C") is None
+
+def test_plan_is_retried_when_explain_was_unavailable():
+    log = SlowQueryLog(0, 10, True)
+    statement = "SELECT * FROM T WHERE ID = 1"
+    assert log.record(statement, None, 1.0, 'q1') is None
+
+    capture = log.record(statement, None, 1.0, 'q2', explain=lambda: "plan")
+    capture()
+    assert log.stats()["fingerprints"][0]["plan"] == "plan"
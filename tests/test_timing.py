@@ -0,0 +1,40 @@
+import json
+import logging
+import re
+import pytest
+from timing import phase, record_query, server_timing
+
+def durations(header):
+    return {
+        entry.split(';')[0]: float(re.search(r'dur=([\d.]+)', entry).group(1))
+        for entry in header.split(', ')
+    }
+
+def test_header_lists_phases_in_order_with_the_query_count():
+    header = server_timing({'app': 0.002, 'execute': 0.0125, 'connect': 0.1, 'render': 0}, 3, 0.2)
+    assert header == 'connect;dur=100.0, execute;dur=12.5;desc="3 queries", app;dur=2.0, total;dur=200.0'
+
+def test_phase_outside_a_request_is_a_no_op():
+    with phase('execute'):
+        pass
+    record_query('01-abc')
+
+def test_page_reports_each_phase(client):
+    response = client.get('/dsstore')
+    assert response.status_code == 200
+    timings = durations(response.headers['Server-Timing'])
+    assert {'connect', 'execute', 'fetch', 'render', 'app', 'total'} <= set(timings)
+    assert sum(duration for name, duration in timings.items() if name != 'total') == pytest.approx(timings['total'], abs=0.5)
+    assert re.search(r'execute;dur=[\d.]+;desc="\d+ queries"', response.headers['Server-Timing'])
+
+def test_requests_without_queries_report_only_app_time(client):
+    response = client.get('/')
+    assert set(durations(response.headers['Server-Timing'])) <= {'render', 'app', 'total'}
+
+def test_log_line_carries_the_query_ids(client, caplog):
+    with caplog.at_level(logging.INFO, logger='timing'):
+        client.get('/get_position?positionId=1')
+    entry = json.loads(caplog.records[-1].getMessage())
+    assert entry["endpoint"] == 'position.get_position'
+    assert entry["status"] == 200
+    assert entry["queryIds"] and all(entry["queryIds"])
@@ -0,0 +1,53 @@
+import pytest
+
+def labels(response):
+    assert response.status_code == 200
+    return [result["label"] for result in response.get_json()["results"]]
+
+@pytest.mark.parametrize('url', [
+    '/stores/typeahead?q=Store 1',
+    '/floorplans/typeahead?q=Floorplan',
+    '/planograms/typeahead?q=Planogram 1'
+])
+def test_picker_typeahead_endpoints(client, url):
+    assert labels(client.get(url))
+
+def test_exact_then_prefix_then_substring(client):
+    assert client.post('/dsstore/add', json={"storeName": "Corner Store", "descriptivo1": "test", "dbStatus": 1}).status_code == 200
+
+    found = labels(client.get('/stores/typeahead?q=store 3&limit=100'))
+    assert found[0] == 'Store 3'
+
+    found = labels(client.get('/stores/typeahead?q=store&limit=100'))
+    prefix = [label for label in found if label.lower().startswith('store')]
+    assert found[:len(prefix)] == prefix
+    assert 'Corner Store' in found[len(prefix):]
+    assert [len(label) for label in prefix] == sorted(len(label) for label in prefix)
+
+def test_key_match_ranks_first(client):
+    results = client.get('/floorplans/typeahead?q=2').get_json()["results"]
+    assert results[0]["id"] == 2
+
+def test_empty_query_lists_by_name(client):
+    found = labels(client.get('/floorplans/typeahead?q=&limit=3'))
+    assert len(found) == 3
+    assert found == sorted(found)
+    assert labels(client.get('/floorplans/typeahead?limit=3')) == found
+
+def test_short_query_matches_substrings(client):
+    found = labels(client.get('/planograms/typeahead?q=g&limit=100'))
+    assert found and all('g' in label.lower() for label in found)
+
+def test_wildcards_match_literally(client):
+    assert labels(client.get('/stores/typeahead?q=%25')) == []
+    assert labels(client.get('/stores/typeahead?q=_')) == []
+
+def test_limit(client):
+    assert len(labels(client.get('/stores/typeahead?q=Store&limit=2'))) == 2
+    assert client.get('/stores/typeahead?q=Store&limit=many').status_code == 400
+
+def test_bad_credentials_get_no_results(client, intruder):
+    assert labels(client.get('/planograms/typeahead?q=Planogram'))
+    response = intruder.get('/planograms/typeahead?q=Planogram')
+    assert response.status_code != 200
+    assert not response.get_json()["success"]
@@ -0,0 +1,82 @@
+from upc_resolver import UpcResolver
+
+class Loader:
+    """Stand-in for the DBKEY queries; records every batch it is asked for."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    def __call__(self, upcs):
+        self.calls.append(list(upcs))
+        return [(upc, self.rows[upc]) for upc in upcs if upc in self.rows]
+
+def test_misses_are_loaded_in_one_batch_then_hit():
+    resolver = UpcResolver(10)
+    loader = Loader({'A': 1, 'B': 2})
+
+    assert resolver.resolve_many(['A', 'B', 'A', 'X'], loader) == {'A': 1, 'B': 2}
+    assert loader.calls == [['A', 'B', 'X']]
+
+    assert resolver.resolve_many(['B', 'A'], loader) == {'A': 1, 'B': 2}
+    assert len(loader.calls) == 1
+    assert resolver.stats()["hits"] == 2
+    assert resolver.stats()["misses"] == 3
+
+def test_unknown_upcs_are_not_cached():
+    resolver = UpcResolver(10)
+    loader = Loader({})
+    resolver.resolve_many(['X'], loader)
+    resolver.resolve_many(['X'], loader)
+    assert loader.calls == [['X'], ['X']]
+    assert resolver.get('X') is None
+
+def test_least_recently_used_is_evicted():
+    resolver = UpcResolver(2)
+    resolver.put('A', 1)
+    resolver.put('B', 2)
+    assert resolver.get('A') == 1
+    resolver.put('C', 3)
+
+    assert resolver.get('B') is None
+    assert resolver.upc_for(2) is None
+    assert resolver.get('A') == 1
+    assert resolver.get('C') == 3
+    assert resolver.stats()["evictions"] == 1
+
+def test_eviction_keeps_a_reassigned_dbkey():
+    resolver = UpcResolver(2)
+    resolver.put('OLD', 1)
+    resolver.put('NEW', 1)
+    resolver.put('OTHER', 2)
+
+    assert resolver.get('OLD') is None
+    assert resolver.upc_for(1) == 'NEW'
+
+def test_invalidate_one_and_all():
+    resolver = UpcResolver(10)
+    resolver.ensure_warm(lambda limit: [('A', 1), ('B', 2)])
+    assert resolver.warmed
+
+    resolver.invalidate('A')
+    assert resolver.get('A') is None
+    assert resolver.upc_for(1) is None
+    assert resolver.get('B') == 2
+
+    resolver.invalidate()
+    assert resolver.get('B') is None
+    assert resolver.stats()["size"] == 0
+    assert not resolver.warmed
+
+def test_ensure_warm_loads_once():
+    resolver = UpcResolver(3)
+    loads = []
+    resolver.ensure_warm(lambda limit: loads.append(limit) or [('A', 1)])
+    resolver.ensure_warm(lambda limit: loads.append(limit) or [('A', 1)])
+    assert loads == [3]
+
+def test_upcs_are_keyed_as_strings():
+    resolver = UpcResolver(10)
+    resolver.put(123, 7)
+    assert resolver.get('123') == 7
+    assert resolver.resolve_many([123], Loader({})) == {'123': 7}
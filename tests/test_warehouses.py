@@ -0,0 +1,34 @@
+import db
+from config import Config
+from conftest import PASSWORD, USER
+from warehouses import WarehouseRouter, warehouse_list, warehouse_router
+
+def test_each_class_rotates_over_its_own_warehouses():
+    router = WarehouseRouter({'interactive': ['CRUD_1', 'CRUD_2'], 'analytic': ['SCAN_1']}, 'DEFAULT_WH')
+    assert [router.pick('interactive') for _ in range(3)] == ['CRUD_1', 'CRUD_2', 'CRUD_1']
+    assert [router.pick('analytic') for _ in range(2)] == ['SCAN_1', 'SCAN_1']
+    assert router.stats() == {"routed": {
+        'interactive': {'CRUD_1': 2, 'CRUD_2': 1},
+        'analytic': {'SCAN_1': 2}
+    }}
+
+def test_unconfigured_classes_use_the_default():
+    router = WarehouseRouter({'interactive': [], 'analytic': ['SCAN_1']}, 'DEFAULT_WH')
+    assert router.pick('interactive') == 'DEFAULT_WH'
+
+def test_warehouse_list_parsing():
+    assert warehouse_list(' CRUD_1, ,CRUD_2 ') == ['CRUD_1', 'CRUD_2']
+    assert warehouse_list('') == []
+
+def test_background_connections_take_an_analytic_warehouse(plan, monkeypatch):
+    router = WarehouseRouter({'interactive': ['CRUD_1'], 'analytic': ['SCAN_1']}, 'DEFAULT_WH')
+    monkeypatch.setattr(db, 'warehouse_router', router)
+    with db.connect(USER, PASSWORD) as conn:
+        assert conn.warehouse == 'SCAN_1'
+
+def test_stats_need_the_admin_token(client, monkeypatch):
+    monkeypatch.setattr(Config, 'SLOW_QUERY_ADMIN_TOKEN', 'operator-token')
+    assert client.get('/warehouses/stats').status_code == 403
+    response = client.get('/warehouses/stats', headers={'X-Admin-Token': 'operator-token'})
+    assert response.status_code == 200
+    assert response.get_json()["stats"] == warehouse_router.stats()
@@ -0,0 +1,95 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+from flask import g, has_request_context, request, before_render_template, template_rendered
+from config import Config
+
+logger = logging.getLogger('timing')
+
+# Phases reported in Server-Timing, in display order. "app" is whatever the
+# request spent outside the others: Python transforms, routing, serialising.
+PHASES = ('connect', 'queue', 'execute', 'fetch', 'render', 'app')
+
+def _timings():
+    if not has_request_context() or 'timings' not in g:
+        return None
+    return g.timings
+
+@contextmanager
+def phase(name):
+    """Add the time spent in the block to the current request's phase total."""
+    timings = _timings()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - started
+
+def record_query(query_id):
+    """Note a Snowflake query id against the current request."""
+    if query_id and has_request_context() and 'query_ids' in g:
+        g.query_ids.append(query_id)
+
+# Server-Timing header value for a request's phases (durations in ms)
+def server_timing(timings, query_count, total):
+    entries = []
+    for name in PHASES:
+        if timings.get(name):
+            entry = f"{name};dur={timings[name] * 1000:.1f}"
+            if name == 'execute':
+                entry += f';desc="{query_count} queries"'
+            entries.append(entry)
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ', '.join(entries)
+
+def init_timing(app):
+    """Time each request's phases into a Server-Timing header and a log line."""
+    if not Config.SERVER_TIMING:
+        return
+
+    @app.before_request
+    def start_timing():
+        g.request_started = time.perf_counter()
+        g.timings = {}
+        g.query_ids = []
+
+    # Template rendering is timed from Flask's signals
+    def render_started(sender, template, context, **extra):
+        timings = _timings()
+        if timings is not None:
+            g.setdefault('render_stack', []).append(time.perf_counter())
+
+    def render_finished(sender, template, context, **extra):
+        timings = _timings()
+        if timings is not None and g.get('render_stack'):
+            elapsed = time.perf_counter() - g.render_stack.pop()
+            # Nested renders are already inside the outer one
+            if not g.render_stack:
+                timings['render'] = timings.get('render', 0.0) + elapsed
+
+    before_render_template.connect(render_started, app, weak=False)
+    template_rendered.connect(render_finished, app, weak=False)
+
+    @app.after_request
+    def add_server_timing(response):
+        timings = _timings()
+        if timings is None or 'request_started' not in g:
+            return response
+        total = time.perf_counter() - g.request_started
+        timings['app'] = max(total - sum(timings.values()), 0.0)
+        response.headers['Server-Timing'] = server_timing(timings, len(g.query_ids), total)
+        logger.info(json.dumps({
+            "requestId": g.get('request_id'),
+            "method": request.method,
+            "path": request.path,
+            "endpoint": request.endpoint,
+            "status": response.status_code,
+            "totalMs": round(total * 1000, 1),
+            "phasesMs": {name: round(timings[name] * 1000, 1) for name in PHASES if name in timings},
+            "queryIds": g.query_ids
+        }))
+        return response
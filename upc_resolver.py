@@ -0,0 +1,111 @@
+import threading
+from collections import OrderedDict
+from config import Config
+
+class UpcResolver:
+    """
+    Bounded, thread-safe UPC <-> DBKEY map with least-recently-used eviction.
+    Misses are resolved in a single batch through a caller-supplied loader.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._warm_lock = threading.Lock()
+        self._by_upc = OrderedDict()
+        self._by_dbkey = {}
+        self.warmed = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def ensure_warm(self, loader):
+        """Preload the map with loader(capacity) -> [(UPC, DBKEY), ...] on first use."""
+        if self.warmed:
+            return
+        with self._warm_lock:
+            if not self.warmed:
+                for upc, dbkey in loader(self.capacity):
+                    self.put(upc, dbkey)
+                self.warmed = True
+
+    def put(self, upc, dbkey):
+        with self._lock:
+            self._put(str(upc), dbkey)
+
+    def _put(self, upc, dbkey):
+        self._forget(upc, self._by_upc.pop(upc, None))
+        self._by_upc[upc] = dbkey
+        self._by_dbkey[dbkey] = upc
+        while len(self._by_upc) > self.capacity:
+            self._forget(*self._by_upc.popitem(last=False))
+            self.evictions += 1
+
+    # Drop the reverse entry for a removed UPC, unless its DBKEY has since
+    # been put under another UPC
+    def _forget(self, upc, dbkey):
+        if dbkey is not None and self._by_dbkey.get(dbkey) == upc:
+            del self._by_dbkey[dbkey]
+
+    def get(self, upc):
+        """Return the cached DBKEY for a UPC, or None."""
+        with self._lock:
+            dbkey = self._by_upc.get(str(upc))
+            if dbkey is not None:
+                self._by_upc.move_to_end(str(upc))
+            return dbkey
+
+    def upc_for(self, dbkey):
+        """Return the cached UPC for a DBKEY, or None."""
+        with self._lock:
+            return self._by_dbkey.get(dbkey)
+
+    def invalidate(self, upc=None):
+        """Forget one UPC, or everything when no UPC is given."""
+        with self._lock:
+            if upc is None:
+                self._by_upc.clear()
+                self._by_dbkey.clear()
+                self.warmed = False
+                return
+            self._forget(str(upc), self._by_upc.pop(str(upc), None))
+
+    def resolve_many(self, upcs, loader):
+        """
+        Map UPCs to DBKEYs. Cached UPCs are answered from memory and every miss
+        is fetched with one loader(missing) -> [(UPC, DBKEY), ...] call.
+        UPCs that do not exist are left out of the result.
+        """
+        resolved = {}
+        missing = []
+        with self._lock:
+            for upc in dict.fromkeys(str(upc) for upc in upcs):
+                dbkey = self._by_upc.get(upc)
+                if dbkey is None:
+                    missing.append(upc)
+                else:
+                    self._by_upc.move_to_end(upc)
+                    resolved[upc] = dbkey
+            self.hits += len(resolved)
+            self.misses += len(missing)
+
+        if missing:
+            rows = loader(missing)
+            with self._lock:
+                for upc, dbkey in rows:
+                    self._put(str(upc), dbkey)
+                    resolved[str(upc)] = dbkey
+        return resolved
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._by_upc),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+# Shared resolver used by the product routes
+upc_resolver = UpcResolver(Config.UPC_CACHE_SIZE)
@@ -0,0 +1,199 @@
+"""
+Report micro-partition pruning for the app's own queries on Snowflake.
+
+Drives the read routes through the Flask test client with real
+credentials, so the statements measured are exactly the ones the
+blueprints send. Each request's query ids come from the Server-Timing
+log line (timing.py); GET_QUERY_OPERATOR_STATS then gives partitions
+scanned and total for every table scan. Lookup keys are sampled from the
+tables themselves.
+
+    SNOWFLAKE_USER=planner python verify_pruning.py --output before.json
+    snowsql -o variable_substitution=true -D role=SYSADMIN -D warehouse=NEWCKB_WH \
+        -D database=NEWCKB -D schema=PUBLIC -f migrations/001_clustering_and_search_optimization.sql
+    SNOWFLAKE_USER=planner python verify_pruning.py --output after.json --clustering
+
+--database and --schema (default: SNOWFLAKE_DATABASE and SNOWFLAKE_SCHEMA)
+name the environment to sample keys from and report clustering for; the
+app's connections use them as their session database and schema too.
+
+Scans served from the result cache have no operator stats and show as
+"cached"; run as a user with USE_CACHED_RESULT = FALSE for a full picture.
+"""
+import argparse
+import getpass
+import json
+import logging
+import os
+import db
+from config import Config
+from fragment_cache import fragment_cache
+
+# Tables the migration clusters, for --clustering
+CLUSTERED_TABLES = (
+    'IX_SPC_POSITION',
+    'IX_SPC_PERFORMANCE',
+    'IX_FLR_PERFORMANCE',
+    'IX_EIA_CLUSTER_STORE',
+    'IX_STR_STORE_FLOORPLAN'
+)
+
+# One real row per access path, so every lookup hits data; {schema} is the
+# qualified database.schema
+SAMPLE_QUERIES = {
+    "position": "SELECT DBKEY, DBPlanogramParentKey, DBProductParentKey FROM {schema}.IX_SPC_POSITION SAMPLE (1 ROWS)",
+    "performance": "SELECT DBKEY FROM {schema}.IX_SPC_PERFORMANCE SAMPLE (1 ROWS)",
+    "floorplan": "SELECT DBFloorplanParentKey FROM {schema}.IX_FLR_PERFORMANCE SAMPLE (1 ROWS)",
+    "cluster": "SELECT DBClusterParentKey FROM {schema}.IX_EIA_CLUSTER_STORE SAMPLE (1 ROWS)",
+    "store": "SELECT DBStoreParentKey FROM {schema}.IX_STR_STORE_FLOORPLAN SAMPLE (1 ROWS)",
+    "product": "SELECT UPC FROM {schema}.ITX_SPC_PRODUCT SAMPLE (1 ROWS)",
+    "pdf": "SELECT DBKEY FROM {schema}.IX_SPC_PLANOGRAM_PDF SAMPLE (1 ROWS)"
+}
+
+OPERATOR_STATS_QUERY = """
+    SELECT
+        OPERATOR_ATTRIBUTES:table_name::STRING,
+        OPERATOR_STATISTICS:pruning:partitions_scanned::INT,
+        OPERATOR_STATISTICS:pruning:partitions_total::INT
+    FROM TABLE(GET_QUERY_OPERATOR_STATS(%s))
+    WHERE OPERATOR_TYPE = 'TableScan'
+"""
+
+def sample_keys(user, password, schema):
+    keys = {}
+    with db.connect(user, password) as conn:
+        with conn.cursor() as cursor:
+            for name, query in SAMPLE_QUERIES.items():
+                cursor.execute(query.format(schema=schema))
+                keys[name] = cursor.fetchone()
+    return keys
+
+# Read routes whose queries filter or join on a parent key or UPC
+def requests_for(keys):
+    position_id, planogram_id, product_id = keys["position"] or (1, 1, 1)
+    value = lambda name, default=1: keys[name][0] if keys[name] else default
+    return [
+        ('get_position', 'GET', f'/get_position?positionId={position_id}', None),
+        ('get_performance', 'GET', f'/get_performance?performanceId={value("performance")}', None),
+        ('get_product', 'GET', f'/get_product?upc={value("product", "")}', None),
+        ('planogram products', 'GET', f'/planogram/{planogram_id}', None),
+        ('simulation', 'POST', f'/simulation/{planogram_id}', {"changes": [{"productId": product_id, "hFacing": 1}]}),
+        ('flplanogram list', 'GET', f'/flplanogram/list?floorplanId={value("floorplan")}', None),
+        ('flplanogram page', 'GET', f'/flplanogram?floorplanId={value("floorplan")}', None),
+        ('flplanogram view_pdf', 'GET', f'/flplanogram/view_pdf/{value("pdf")}', None),
+        ('stfloorplan list', 'GET', f'/stfloorplan/list?storeId={value("store")}', None),
+        ('clstore list', 'GET', f'/clstore/list?clusterId={value("cluster")}', None),
+        ('dsposition list', 'GET', '/dsposition/list?limit=200', None),
+        ('dsperformance list', 'GET', '/dsperformance/list?limit=200', None)
+    ]
+
+class QueryIdCapture(logging.Handler):
+    """Collects the query ids from each request's timing log line."""
+
+    def __init__(self):
+        super().__init__()
+        self.query_ids = []
+
+    def emit(self, record):
+        self.query_ids = json.loads(record.getMessage()).get("queryIds", [])
+
+def table_scans(user, password, query_id):
+    with db.connect(user, password) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(OPERATOR_STATS_QUERY, (query_id,))
+            return [
+                {"table": table, "partitionsScanned": scanned, "partitionsTotal": total}
+                for table, scanned, total in cursor.fetchall()
+            ]
+
+def clustering_information(user, password, schema):
+    info = {}
+    with db.connect(user, password) as conn:
+        with conn.cursor() as cursor:
+            for table in CLUSTERED_TABLES:
+                try:
+                    cursor.execute("SELECT SYSTEM$CLUSTERING_INFORMATION(%s)", (f"{schema}.{table}",))
+                    details = json.loads(cursor.fetchone()[0])
+                    info[table] = {
+                        "clusterBy": details.get("cluster_by_keys"),
+                        "totalPartitions": details.get("total_partition_count"),
+                        "averageDepth": details.get("average_depth"),
+                        "averageOverlaps": details.get("average_overlaps")
+                    }
+                except Exception as e:
+                    info[table] = {"error": str(e)}
+    return info
+
+def pruned_share(scanned, total):
+    return round(1 - scanned / total, 4) if total else None
+
+def main():
+    parser = argparse.ArgumentParser(description="Report partition pruning for the app's queries")
+    parser.add_argument('--user', default=os.getenv('SNOWFLAKE_USER'), help="defaults to $SNOWFLAKE_USER")
+    parser.add_argument('--database', default=Config.SNOWFLAKE_DATABASE, help="defaults to $SNOWFLAKE_DATABASE")
+    parser.add_argument('--schema', default=Config.SNOWFLAKE_SCHEMA, help="defaults to $SNOWFLAKE_SCHEMA")
+    parser.add_argument('--clustering', action='store_true', help="also report clustering depth per clustered table")
+    parser.add_argument('--output', help="write results as JSON to this file")
+    args = parser.parse_args()
+    if not args.user:
+        parser.error("--user or SNOWFLAKE_USER is required")
+    password = os.getenv('SNOWFLAKE_PASSWORD') or getpass.getpass(f"Password for {args.user}: ")
+    schema = f"{args.database}.{args.schema}"
+    Config.SNOWFLAKE_DATABASE = args.database
+    Config.SNOWFLAKE_SCHEMA = args.schema
+
+    # Query ids come from the timing log; fragment caching would skip queries
+    Config.SERVER_TIMING = True
+    fragment_cache.max_bytes = 0
+    capture = QueryIdCapture()
+    logging.getLogger('timing').addHandler(capture)
+    logging.getLogger('timing').setLevel(logging.INFO)
+
+    from app import create_app
+    client = create_app().test_client()
+    client.set_cookie('snowflake_username', args.user)
+    client.set_cookie('snowflake_password', password)
+
+    keys = sample_keys(args.user, password, schema)
+    routes = {}
+    tables = {}
+    for name, method, path, body in requests_for(keys):
+        capture.query_ids = []
+        response = client.open(path, method=method, json=body)
+        scans = []
+        for query_id in capture.query_ids:
+            found = table_scans(args.user, password, query_id)
+            scans += [{"queryId": query_id, **scan} for scan in found] or [{"queryId": query_id, "cached": True}]
+        routes[name] = {"path": path, "status": response.status_code, "scans": scans}
+
+        print(f"{name} ({response.status_code})", flush=True)
+        for scan in scans:
+            if scan.get("cached"):
+                print(f"  {scan['queryId']}  cached")
+                continue
+            scanned, total = scan["partitionsScanned"] or 0, scan["partitionsTotal"] or 0
+            share = pruned_share(scanned, total)
+            print(f"  {scan['table']:<28} {scanned:>8} / {total:<8} partitions  "
+                  f"pruned {'-' if share is None else f'{share:.1%}'}")
+            totals = tables.setdefault(scan["table"], {"partitionsScanned": 0, "partitionsTotal": 0})
+            totals["partitionsScanned"] += scanned
+            totals["partitionsTotal"] += total
+
+    print("by table")
+    for table, totals in sorted(tables.items()):
+        totals["prunedShare"] = pruned_share(totals["partitionsScanned"], totals["partitionsTotal"])
+        share = totals["prunedShare"]
+        print(f"  {table:<28} pruned {'-' if share is None else f'{share:.1%}'}")
+
+    report = {"schema": schema, "keys": keys, "routes": routes, "tables": tables}
+    if args.clustering:
+        report["clustering"] = clustering_information(args.user, password, schema)
+        for table, info in report["clustering"].items():
+            print(f"  {table:<28} depth {info.get('averageDepth')}  partitions {info.get('totalPartitions')}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+import itertools
+import threading
+from flask import Blueprint, jsonify
+from config import Config
+
+warehouses_bp = Blueprint('warehouses', __name__)
+
+class WarehouseRouter:
+    """
+    Picks the warehouse for a new connection from its workload class.
+
+    Each class maps to one or more warehouses; with several, connections
+    rotate round-robin across them. Counts of connections routed per class
+    and warehouse are kept for the stats route.
+    """
+
+    def __init__(self, routes, default):
+        self.default = default
+        self._cycles = {workload: itertools.cycle(names) for workload, names in routes.items() if names}
+        self._lock = threading.Lock()
+        self.routed = {}
+
+    def pick(self, workload):
+        with self._lock:
+            cycle = self._cycles.get(workload)
+            warehouse = next(cycle) if cycle else self.default
+            key = (workload, warehouse)
+            self.routed[key] = self.routed.get(key, 0) + 1
+        return warehouse
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.routed)
+        routed = {}
+        for (workload, warehouse), count in counts.items():
+            routed.setdefault(workload, {})[warehouse] = count
+        return {"routed": routed}
+
+# Comma-separated warehouse names from a config value
+def warehouse_list(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+# Shared router for every connection opened through db.connect
+warehouse_router = WarehouseRouter(
+    {
+        'interactive': warehouse_list(Config.SNOWFLAKE_WAREHOUSE_INTERACTIVE),
+        'analytic': warehouse_list(Config.SNOWFLAKE_WAREHOUSE_ANALYTIC)
+    },
+    Config.SNOWFLAKE_WAREHOUSE
+)
+
+# Route to get how many connections went to each warehouse
+@warehouses_bp.route('/warehouses/stats', methods=['GET'])
+def warehouse_stats():
+    # slow_queries imports this module (through metrics), so import it here
+    from slow_queries import admin_denied
+
+    denied = admin_denied()
+    if denied:
+        return denied
+
+    return jsonify({"success": True, "stats": warehouse_router.stats()})